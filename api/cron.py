@@ -13,11 +13,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # Import the main app and email functions
-from api.index import app, query_oracle, ORACLE_CONFIG, COMPANY_INFO
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from flask import jsonify
+from api.index import (app, get_due_reminders, enqueue_reminders,
+                       run_outbox_drain, COMPANY_INFO)
+from flask import jsonify, request
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,91 +24,18 @@ logger = logging.getLogger(__name__)
 def get_licenses_needing_reminders():
     """Get licenses that need reminders today"""
     try:
-        schema = ORACLE_CONFIG['schema']
-        
-        # Get licenses that need reminders
-        licenses = query_oracle(f"""
-            SELECT 
-                l.LIC_ID as id,
-                l.LIC_NAME as lic_name,
-                l.LIC_TYPE as lic_type,
-                l.LIC_STATE as lic_state,
-                l.LIC_NO as lic_no,
-                l.EXPIRATION_DATE as expiration_date,
-                l.LIC_NOTIFY_NAMES as lic_notify_names,
-                TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration,
-                CASE 
-                    WHEN TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) <= 10 THEN '10_days'
-                    WHEN TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) <= 15 THEN '15_days'
-                    WHEN TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) <= 30 THEN '30_days'
-                    ELSE 'custom'
-                END as reminder_type
-            FROM "{schema}".LICENSES l
-            WHERE l.EXPIRATION_DATE IS NOT NULL
-            AND l.LIC_NOTIFY_NAMES IS NOT NULL
-            AND NVL(l.EMAIL_ENABLED, 1) = 1
-            AND (
-                -- 30-day reminder
-                (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 30 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '30_days'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
-                ))
-                -- 15-day reminder
-                OR (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 15 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '15_days'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
-                ))
-                -- 10-day reminder
-                OR (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 10 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '10_days'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
-                ))
-                -- 7-day critical reminder
-                OR (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 7 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '7_days'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
-                ))
-                -- 1-day urgent reminder
-                OR (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 1 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '1_day'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 1
-                ))
-                -- Overdue reminder (sent once per week)
-                OR (TRUNC(l.EXPIRATION_DATE) < TRUNC(SYSDATE) AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = 'overdue'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
-                ))
-            )
-        """)
+        # Licenses whose NEXT_REMINDER_DATE is due (see api/reminder_schedule.py)
+        licenses = get_due_reminders()
         
         return licenses
     except Exception as e:
         logger.error(f"Error getting licenses needing reminders: {e}")
         return []
 
-def send_reminder_email(license):
-    """Send reminder email for a license"""
+def render_reminder_email(license):
+    """Render a license's reminder as an EMAIL_OUTBOX message (None on error)"""
     try:
-        schema = ORACLE_CONFIG['schema']
-        
-        # Get SMTP configuration
-        smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('SMTP_PORT', 587))
-        smtp_username = os.getenv('SMTP_USERNAME')
-        smtp_password = os.getenv('SMTP_PASSWORD')
-        sender_email = os.getenv('SENDER_EMAIL', smtp_username)
+        sender_email = os.getenv('SENDER_EMAIL', os.getenv('SMTP_USERNAME'))
         
         # Prepare email details
         days_left = license.get('days_until_expiration', 0)
@@ -194,84 +119,26 @@ def send_reminder_email(license):
         </html>
         """
         
-        # Determine reminder type for logging
-        if days_left < 0:
-            reminder_type = 'overdue'
-        elif days_left == 1:
-            reminder_type = '1_day'
-        elif days_left == 7:
-            reminder_type = '7_days'
-        elif days_left == 10:
-            reminder_type = '10_days'
-        elif days_left == 15:
-            reminder_type = '15_days'
-        elif days_left == 30:
-            reminder_type = '30_days'
-        else:
-            reminder_type = 'custom'
-        
-        # Try to send email
-        email_status = 'failed'
-        
-        try:
-            if smtp_username and smtp_password:
-                msg = MIMEMultipart('alternative')
-                msg['From'] = f"{COMPANY_INFO['name']} <{sender_email}>"
-                msg['To'] = email_to
-                msg['Subject'] = email_subject
-                msg.attach(MIMEText(email_body, 'html'))
-                
-                with smtplib.SMTP(smtp_server, smtp_port) as server:
-                    server.starttls()
-                    server.login(smtp_username, smtp_password)
-                    server.send_message(msg)
-                
-                email_status = 'sent'
-                logger.info(f"Email sent successfully for license {license['id']}")
-            else:
-                logger.warning(f"SMTP not configured, marking as failed for license {license['id']}")
-                
-        except Exception as e:
-            logger.error(f"Failed to send email for license {license['id']}: {e}")
-        
-        # Always log to EMAIL_REMINDERS table
-        query_oracle(f"""
-            INSERT INTO "{schema}".EMAIL_REMINDERS (
-                LICENSE_ID,
-                REMINDER_TYPE,
-                EMAIL_TO,
-                EMAIL_SUBJECT,
-                EMAIL_BODY,
-                STATUS,
-                SENT_DATE
-            ) VALUES (
-                :license_id,
-                :reminder_type,
-                :email_to,
-                :email_subject,
-                :email_body,
-                :status,
-                SYSDATE
-            )
-        """, {
+        # Reminder type and date were stored with the due date
+        return {
             'license_id': license['id'],
-            'reminder_type': reminder_type,
+            'reminder_type': license['reminder_type'],
+            'reminder_date': license['reminder_date'],
+            'email_from': f"{COMPANY_INFO['name']} <{sender_email}>",
             'email_to': email_to,
             'email_subject': email_subject,
             'email_body': email_body,
-            'status': email_status
-        })
-        
-        return email_status == 'sent'
+            'body_type': 'html'
+        }
         
     except Exception as e:
-        logger.error(f"Error in send_reminder_email: {e}")
-        return False
+        logger.error(f"Error rendering reminder for license {license.get('id')}: {e}")
+        return None
 
 @app.route('/api/cron/check-reminders')
 def cron_check_reminders():
     """
-    Cron job endpoint to check and send license reminders
+    Cron job endpoint to queue due license reminders and start sending them
     This should be called daily by Vercel Cron
     """
     try:
@@ -287,36 +154,23 @@ def cron_check_reminders():
         # Get licenses needing reminders
         licenses = get_licenses_needing_reminders()
         
-        if not licenses:
-            logger.info("No licenses need reminders today")
-            return jsonify({
-                'success': True,
-                'message': 'No licenses need reminders',
-                'checked_at': datetime.now().isoformat(),
-                'licenses_checked': 0,
-                'emails_sent': 0,
-                'emails_failed': 0
-            })
-        
-        sent_count = 0
-        failed_count = 0
-        
-        # Send reminders for each license
-        for license in licenses:
-            if send_reminder_email(license):
-                sent_count += 1
-            else:
-                failed_count += 1
+        # Queue every due reminder in one bulk insert, then send as many queued
+        # messages as fit in this run; /api/cron/drain-outbox sends the rest
+        messages = [render_reminder_email(license) for license in licenses]
+        queued = enqueue_reminders([message for message in messages if message])
+        totals = run_outbox_drain() or {}
         
-        logger.info(f"Reminder check complete: {sent_count} sent, {failed_count} failed")
+        logger.info(f"Reminder check complete: {len(licenses)} due, {queued} queued, "
+                    f"{totals.get('sent', 0)} sent, {totals.get('failed', 0)} failed")
         
         return jsonify({
             'success': True,
             'message': f'Processed {len(licenses)} licenses',
             'checked_at': datetime.now().isoformat(),
             'licenses_checked': len(licenses),
-            'emails_sent': sent_count,
-            'emails_failed': failed_count
+            'emails_queued': queued,
+            'emails_sent': totals.get('sent', 0),
+            'emails_failed': totals.get('failed', 0)
         })
         
     except Exception as e:
@@ -4,12 +4,17 @@ Flask-based web interface for viewing and managing license data
 """
 
 import os
+import time
+import base64
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
 from dotenv import load_dotenv
 import oracledb
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import json
@@ -28,6 +33,14 @@ logger = logging.getLogger(__name__)
 import sys
 from pathlib import Path
 
+# Make the api package importable when this file is loaded as the entry point
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from api.reminder_schedule import next_reminder_update_sql
+from api.unit_of_work import UnitOfWork as BaseUnitOfWork
+from api.mail_transport import SMTPSenderPool
+from api.outbox import enqueue_messages, drain_outbox, OUTBOX_DRAIN_SECONDS
+from api.reminder_log import ReminderLogBuffer, insert_reminder_rows, REMINDER_LOG_FLUSH_SIZE
+
 # Get the correct path for templates
 if os.path.exists('/var/task/templates'):
     # Vercel production
@@ -65,21 +78,124 @@ COMPANY_INFO = {
 }
 
 
+# Connection pool configuration
+POOL_CONFIG = {
+    'min': int(os.getenv('ORACLE_POOL_MIN', 1)),
+    'max': int(os.getenv('ORACLE_POOL_MAX', 4)),
+    'increment': int(os.getenv('ORACLE_POOL_INCREMENT', 1)),
+    'ping_interval': int(os.getenv('ORACLE_POOL_PING_INTERVAL', 60)),
+    'wait_timeout': int(os.getenv('ORACLE_POOL_WAIT_TIMEOUT', 10000)),
+    'stmtcachesize': int(os.getenv('ORACLE_STMT_CACHE_SIZE', 50))
+}
+
+# Fetch tuning for streamed result sets
+STREAM_ARRAYSIZE = int(os.getenv('ORACLE_STREAM_ARRAYSIZE', 500))
+
+# Keyset pagination for list pages and endpoints
+PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE', 100))
+PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 500))
+
+# Bulk license operations: IDs per request and the fields a patch may set
+BULK_MAX_IDS = int(os.getenv('BULK_MAX_IDS', 1000))
+BULK_PATCH_FIELDS = {
+    'lic_name': 'LIC_NAME',
+    'lic_state': 'LIC_STATE',
+    'lic_type': 'LIC_TYPE',
+    'lic_no': 'LIC_NO',
+    'ascem_no': 'ASCEM_NO',
+    'first_issue_date': 'FIRST_ISSUE_DATE',
+    'expiration_date': 'EXPIRATION_DATE',
+    'lic_notify_names': 'LIC_NOTIFY_NAMES',
+    'lic_comments': 'LIC_COMMENTS'
+}
+BULK_DATE_FIELDS = {'first_issue_date', 'expiration_date'}
+
+# Session date formats matching datetime.isoformat(), so the driver can hand
+# dates back as ready-to-serialize strings when stream_oracle() asks for them
+SESSION_NLS_FORMATS = {
+    'NLS_DATE_FORMAT': 'YYYY-MM-DD"T"HH24:MI:SS',
+    'NLS_TIMESTAMP_FORMAT': 'YYYY-MM-DD"T"HH24:MI:SS.FF6'
+}
+
+# Process-wide pool, created lazily on first checkout
+_oracle_pool = None
+_pool_lock = threading.Lock()
+_pool_wait_stats = {
+    'checkouts': 0,
+    'total_wait_ms': 0.0,
+    'max_wait_ms': 0.0
+}
+
+
+def init_oracle_session(connection, requested_tag):
+    """Pool session callback: set ISO date formats on each newly created session"""
+    cursor = connection.cursor()
+    cursor.execute(
+        "ALTER SESSION SET " + " ".join(
+            f"{name} = '{fmt}'" for name, fmt in SESSION_NLS_FORMATS.items()
+        )
+    )
+    cursor.close()
+
+
+def get_oracle_pool():
+    """Create (once per process) and return the shared Oracle connection pool"""
+    global _oracle_pool
+    
+    if _oracle_pool is None:
+        with _pool_lock:
+            if _oracle_pool is None:
+                try:
+                    dsn = oracledb.makedsn(
+                        ORACLE_CONFIG['host'],
+                        ORACLE_CONFIG['port'],
+                        service_name=ORACLE_CONFIG['service']
+                    )
+                    
+                    # ping_interval makes acquire() ping connections that have been
+                    # idle longer than that many seconds, so dead sessions are
+                    # replaced transparently instead of failing the query
+                    _oracle_pool = oracledb.create_pool(
+                        user=ORACLE_CONFIG['user'],
+                        password=ORACLE_CONFIG['password'],
+                        dsn=dsn,
+                        mode=oracledb.AUTH_MODE_SYSDBA,
+                        min=POOL_CONFIG['min'],
+                        max=POOL_CONFIG['max'],
+                        increment=POOL_CONFIG['increment'],
+                        ping_interval=POOL_CONFIG['ping_interval'],
+                        getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                        wait_timeout=POOL_CONFIG['wait_timeout'],
+                        stmtcachesize=POOL_CONFIG['stmtcachesize'],
+                        session_callback=init_oracle_session
+                    )
+                    logger.info(
+                        f"Oracle pool created (min={POOL_CONFIG['min']}, "
+                        f"max={POOL_CONFIG['max']}, increment={POOL_CONFIG['increment']})"
+                    )
+                except oracledb.Error as e:
+                    logger.error(f"Oracle pool creation error: {e}")
+                    raise
+    
+    return _oracle_pool
+
+
 def get_oracle_connection():
-    """Create and return an Oracle database connection"""
+    """Check out a connection from the shared pool.
+    
+    Calling close() on the returned connection releases it back to the pool.
+    """
+    pool = get_oracle_pool()
+    
     try:
-        dsn = oracledb.makedsn(
-            ORACLE_CONFIG['host'],
-            ORACLE_CONFIG['port'],
-            service_name=ORACLE_CONFIG['service']
-        )
+        started = time.perf_counter()
+        connection = pool.acquire()
+        waited_ms = (time.perf_counter() - started) * 1000
         
-        connection = oracledb.connect(
-            user=ORACLE_CONFIG['user'],
-            password=ORACLE_CONFIG['password'],
-            dsn=dsn,
-            mode=oracledb.AUTH_MODE_SYSDBA
-        )
+        with _pool_lock:
+            _pool_wait_stats['checkouts'] += 1
+            _pool_wait_stats['total_wait_ms'] += waited_ms
+            _pool_wait_stats['max_wait_ms'] = max(_pool_wait_stats['max_wait_ms'], waited_ms)
         
         return connection
     except oracledb.Error as e:
@@ -87,52 +203,853 @@ def get_oracle_connection():
         raise
 
 
+def get_pool_stats():
+    """Return pool usage statistics, or None if the pool has not been created yet"""
+    if _oracle_pool is None:
+        return None
+    
+    with _pool_lock:
+        checkouts = _pool_wait_stats['checkouts']
+        total_wait_ms = _pool_wait_stats['total_wait_ms']
+        max_wait_ms = _pool_wait_stats['max_wait_ms']
+    
+    return {
+        'open': _oracle_pool.opened,
+        'busy': _oracle_pool.busy,
+        'min': _oracle_pool.min,
+        'max': _oracle_pool.max,
+        'checkouts': checkouts,
+        'avg_wait_ms': round(total_wait_ms / checkouts, 2) if checkouts else 0.0,
+        'max_wait_ms': round(max_wait_ms, 2)
+    }
+
+
+class UnitOfWork(BaseUnitOfWork):
+    """UnitOfWork on this app's connection pool"""
+    
+    def connect(self):
+        return get_oracle_connection()
+
+
 def query_oracle(query, params=None):
-    """Execute a query and return results as list of dictionaries"""
+    """Execute a single statement in its own unit of work.
+    
+    SELECTs return a list of dictionaries; INSERT, UPDATE and DELETE are
+    committed and return the affected row count.
+    """
+    try:
+        with UnitOfWork() as uow:
+            # Check if this is a SELECT query
+            if query.strip().upper().startswith('SELECT'):
+                return uow.query(query, params)
+            return uow.execute(query, params)
+    except Exception as e:
+        logger.error(f"Query error: {e}")
+        raise
+
+
+def refresh_next_reminder(license_id, uow=None):
+    """Recompute NEXT_REMINDER_DATE / NEXT_REMINDER_TYPE for one license"""
+    schema = ORACLE_CONFIG['schema']
+    query = next_reminder_update_sql(schema, where='l.LIC_ID = :lic_id')
+    if uow is None:
+        return query_oracle(query, {'lic_id': license_id})
+    return uow.execute(query, {'lic_id': license_id})
+
+
+@contextmanager
+def transaction_cursor():
+    """Cursor in its own UnitOfWork, as api/outbox.py and api/reminder_log.py expect"""
+    with UnitOfWork() as uow:
+        yield uow.cursor
+
+
+def reminder_log():
+    """Buffer that logs EMAIL_REMINDERS rows and reschedules their licenses in batches"""
+    schema = ORACLE_CONFIG['schema']
+    return ReminderLogBuffer(transaction_cursor,
+                             lambda cursor, rows: insert_reminder_rows(cursor, schema, rows))
+
+
+def enqueue_reminders(messages):
+    """Queue rendered reminders in EMAIL_OUTBOX; returns the number newly queued"""
+    with transaction_cursor() as cursor:
+        return enqueue_messages(cursor, ORACLE_CONFIG['schema'], messages)
+
+
+def run_outbox_drain(seconds=OUTBOX_DRAIN_SECONDS):
+    """Send queued reminders over parallel SMTP sessions for up to `seconds`.
+    
+    Returns counts by status, or None when SMTP isn't configured (the
+    messages stay queued until it is).
+    """
+    smtp_username = os.getenv('SMTP_USERNAME')
+    smtp_password = os.getenv('SMTP_PASSWORD')
+    if not (smtp_username and smtp_password):
+        logger.warning("SMTP not configured; leaving queued reminders in EMAIL_OUTBOX")
+        return None
+    
+    pool = SMTPSenderPool(os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
+                          int(os.getenv('SMTP_PORT', 587)), smtp_username, smtp_password)
+    totals = drain_outbox(transaction_cursor, ORACLE_CONFIG['schema'], pool,
+                          deadline=time.monotonic() + seconds)
+    invalidate_caches()
+    return totals
+
+
+def get_due_reminders():
+    """Get licenses whose next reminder is due today.
+    
+    The check is a range scan on the indexed NEXT_REMINDER_DATE column. Rows
+    whose reminder day passed without a run are first moved on to their next
+    scheduled reminder, so missed offsets are skipped as before; rows never
+    scheduled (new imports, edits made outside the app) are scheduled too.
+    """
+    schema = ORACLE_CONFIG['schema']
+    eligible = "l.LIC_NOTIFY_NAMES IS NOT NULL AND NVL(l.EMAIL_ENABLED, 1) = 1"
+    
+    with UnitOfWork() as uow:
+        uow.execute(next_reminder_update_sql(
+            schema, where=f"""(l.NEXT_REMINDER_DATE < TRUNC(SYSDATE)
+                   OR (l.NEXT_REMINDER_DATE IS NULL AND l.EXPIRATION_DATE IS NOT NULL))
+            AND {eligible}"""
+        ))
+        
+        return uow.query(f"""
+            SELECT 
+                l.LIC_ID as id,
+                l.LIC_NAME as lic_name,
+                l.LIC_TYPE as lic_type,
+                l.LIC_STATE as lic_state,
+                l.LIC_NO as lic_no,
+                l.EXPIRATION_DATE as expiration_date,
+                l.LIC_NOTIFY_NAMES as lic_notify_names,
+                TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration,
+                l.NEXT_REMINDER_TYPE as reminder_type,
+                TO_CHAR(l.NEXT_REMINDER_DATE, 'YYYY-MM-DD') as reminder_date
+            FROM "{schema}".LICENSES l
+            WHERE l.NEXT_REMINDER_DATE <= TRUNC(SYSDATE)
+            AND {eligible}
+            ORDER BY l.NEXT_REMINDER_DATE, l.LIC_ID
+        """)
+
+
+def get_dashboard_stats(upcoming_days, critical_days, warning_days):
+    """Get all dashboard counts in a single query using conditional aggregation"""
+    schema = ORACLE_CONFIG['schema']
+    
+    result = query_oracle(f"""
+        SELECT 
+            COUNT(*) as total_licenses,
+            COUNT(CASE WHEN EXPIRATION_DATE >= SYSDATE
+                        AND EXPIRATION_DATE <= SYSDATE + :upcoming THEN 1 END) as upcoming_count,
+            COUNT(CASE WHEN EXPIRATION_DATE >= SYSDATE
+                        AND EXPIRATION_DATE <= SYSDATE + :critical THEN 1 END) as critical_count,
+            COUNT(CASE WHEN EXPIRATION_DATE > SYSDATE + :critical
+                        AND EXPIRATION_DATE <= SYSDATE + :warning THEN 1 END) as warning_count,
+            COUNT(CASE WHEN EXPIRATION_DATE > SYSDATE + :warning
+                        AND EXPIRATION_DATE <= SYSDATE + :upcoming THEN 1 END) as normal_count,
+            COUNT(CASE WHEN EXPIRATION_DATE < SYSDATE THEN 1 END) as past_due_count,
+            (SELECT COUNT(*) FROM "{schema}".EMAIL_REMINDERS
+             WHERE SENT_DATE >= TRUNC(SYSDATE) AND SENT_DATE < TRUNC(SYSDATE) + 1) as reminders_sent_today
+        FROM "{schema}".LICENSES
+    """, {'upcoming': upcoming_days, 'critical': critical_days, 'warning': warning_days})
+    
+    row = result[0] if result else {}
+    
+    return {
+        'total_licenses': row.get('total_licenses', 0),
+        'expiring_soon': row.get('upcoming_count', 0),
+        'overdue': row.get('past_due_count', 0),
+        'past_due_count': row.get('past_due_count', 0),
+        'upcoming_expirations': row.get('upcoming_count', 0),
+        'reminders_sent_today': row.get('reminders_sent_today', 0),
+        'critical_count': row.get('critical_count', 0),
+        'warning_count': row.get('warning_count', 0),
+        'normal_count': row.get('normal_count', 0)
+    }
+
+
+def get_dashboard_buckets(upcoming_days, critical_days, warning_days):
+    """Get past due and upcoming licenses in one query and split them into buckets.
+    
+    Bucket membership is evaluated in SQL against the same SYSDATE for every row,
+    using the same predicates as get_dashboard_stats(), so list lengths match the
+    counts even when the filter windows overlap.
+    """
+    schema = ORACLE_CONFIG['schema']
+    
+    rows = query_oracle(f"""
+        SELECT 
+            LIC_ID as id,
+            LIC_NAME as lic_name,
+            LIC_TYPE as lic_type,
+            LIC_STATE as lic_state,
+            LIC_NO as lic_no,
+            EXPIRATION_DATE as expiration_date,
+            LIC_NOTIFY_NAMES as lic_notify_names,
+            TRUNC(EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration,
+            CASE WHEN EXPIRATION_DATE < SYSDATE THEN 1 ELSE 0 END as in_past_due,
+            CASE WHEN EXPIRATION_DATE >= SYSDATE
+                  AND EXPIRATION_DATE <= SYSDATE + :upcoming THEN 1 ELSE 0 END as in_upcoming,
+            CASE WHEN EXPIRATION_DATE >= SYSDATE
+                  AND EXPIRATION_DATE <= SYSDATE + :critical THEN 1 ELSE 0 END as in_critical,
+            CASE WHEN EXPIRATION_DATE > SYSDATE + :critical
+                  AND EXPIRATION_DATE <= SYSDATE + :warning THEN 1 ELSE 0 END as in_warning,
+            CASE WHEN EXPIRATION_DATE > SYSDATE + :warning
+                  AND EXPIRATION_DATE <= SYSDATE + :upcoming THEN 1 ELSE 0 END as in_normal
+        FROM "{schema}".LICENSES
+        WHERE EXPIRATION_DATE IS NOT NULL
+        AND EXPIRATION_DATE <= SYSDATE + GREATEST(:upcoming, :critical, :warning)
+        ORDER BY EXPIRATION_DATE
+    """, {'upcoming': upcoming_days, 'critical': critical_days, 'warning': warning_days})
+    
+    buckets = {
+        'past_due': [],
+        'critical': [],
+        'warning': [],
+        'normal': [],
+        'all_upcoming': []
+    }
+    flag_to_bucket = [
+        ('in_critical', 'critical'),
+        ('in_warning', 'warning'),
+        ('in_normal', 'normal'),
+        ('in_upcoming', 'all_upcoming')
+    ]
+    
+    for row in rows:
+        license = {k: v for k, v in row.items() if not k.startswith('in_')}
+        
+        if row['in_past_due']:
+            past_due_license = dict(license)
+            del past_due_license['days_until_expiration']
+            past_due_license['days_overdue'] = -license['days_until_expiration']
+            buckets['past_due'].append(past_due_license)
+            continue
+        
+        for flag, bucket in flag_to_bucket:
+            if row[flag]:
+                buckets[bucket].append(license)
+    
+    # Most recently expired first
+    buckets['past_due'].reverse()
+    
+    return buckets
+
+
+def load_dashboard(upcoming_days, critical_days, warning_days):
+    """Load everything the dashboard renders: (stats, buckets, recent_reminders)"""
+    schema = ORACLE_CONFIG['schema']
+    
+    # Get statistics (one round-trip via conditional aggregation)
+    stats = get_dashboard_stats(upcoming_days, critical_days, warning_days)
+    
+    # Get past due and upcoming licenses (one round-trip, split into buckets)
+    buckets = get_dashboard_buckets(upcoming_days, critical_days, warning_days)
+    
+    # Get recent reminders
+    recent_reminders = query_oracle(f"""
+        SELECT * FROM (
+            SELECT 
+                er.ID,
+                er.LICENSE_ID,
+                l.LIC_NAME,
+                er.REMINDER_TYPE,
+                er.SENT_DATE,
+                er.EMAIL_TO
+            FROM "{schema}".EMAIL_REMINDERS er
+            LEFT JOIN "{schema}".LICENSES l ON er.LICENSE_ID = l.LIC_ID
+            ORDER BY er.SENT_DATE DESC
+        ) WHERE ROWNUM <= 5
+    """)
+    
+    return stats, buckets, recent_reminders
+
+
+def stream_output_type_handler(cursor, metadata):
+    """Have the driver return dates as ISO strings and LOBs as str/bytes"""
+    if metadata.type_code in (oracledb.DB_TYPE_DATE, oracledb.DB_TYPE_TIMESTAMP):
+        return cursor.var(oracledb.DB_TYPE_VARCHAR, arraysize=cursor.arraysize)
+    if metadata.type_code is oracledb.DB_TYPE_CLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG, arraysize=cursor.arraysize)
+    if metadata.type_code is oracledb.DB_TYPE_NCLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG_NVARCHAR, arraysize=cursor.arraysize)
+    if metadata.type_code is oracledb.DB_TYPE_BLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG_RAW, arraysize=cursor.arraysize)
+
+
+def stream_oracle(query, params=None, arraysize=None):
+    """Execute a SELECT and return an iterator yielding rows as dictionaries.
+    
+    Unlike query_oracle(), the result set is never built up in memory and all
+    value conversion happens in the driver. The query is executed immediately so
+    errors surface to the caller; the pooled connection is released once the
+    iterator is exhausted or closed.
+    """
+    connection = get_oracle_connection()
+    
     try:
-        connection = get_oracle_connection()
         cursor = connection.cursor()
+        cursor.arraysize = arraysize or STREAM_ARRAYSIZE
+        cursor.prefetchrows = cursor.arraysize
+        cursor.outputtypehandler = stream_output_type_handler
         
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+        cursor.execute(query, params or {})
         
-        # Check if this is a SELECT query
-        if query.strip().upper().startswith('SELECT'):
-            columns = [col[0].lower() for col in cursor.description]
-            results = []
-            
-            for row in cursor:
-                result_dict = {}
-                for i, col in enumerate(columns):
-                    value = row[i]
-                    # Convert Oracle datetime to Python datetime string for JSON serialization
-                    if isinstance(value, datetime):
-                        value = value.isoformat()
-                    # Handle CLOB fields
-                    elif hasattr(value, 'read'):
-                        value = value.read() if value else None
-                    result_dict[col] = value
-                results.append(result_dict)
-            
-            cursor.close()
-            connection.close()
-            return results
-        else:
-            # For INSERT, UPDATE, DELETE
-            connection.commit()
-            affected_rows = cursor.rowcount
+        columns = [col[0].lower() for col in cursor.description]
+        cursor.rowfactory = lambda *row: dict(zip(columns, row))
+    except Exception as e:
+        logger.error(f"Stream query error: {e}")
+        connection.close()
+        raise
+    
+    def rows():
+        try:
+            yield from cursor
+        finally:
             cursor.close()
             connection.close()
-            return affected_rows
+    
+    return rows()
+
+
+# Fixed WHERE fragments for the /licenses filters, with the binds each one uses.
+# Every user-supplied value is bound, so each filter/search/sort combination
+# maps to one SQL text that Oracle parses once and the statement cache reuses.
+LICENSE_FILTERS = {
+    'expiring': ("""
+        EXPIRATION_DATE IS NOT NULL 
+        AND EXPIRATION_DATE >= SYSDATE 
+        AND EXPIRATION_DATE <= SYSDATE + :upcoming_days
+    """, ('upcoming_days',)),
+    'critical': ("""
+        EXPIRATION_DATE IS NOT NULL 
+        AND EXPIRATION_DATE >= SYSDATE 
+        AND EXPIRATION_DATE <= SYSDATE + :critical_days
+    """, ('critical_days',)),
+    'warning': ("""
+        EXPIRATION_DATE IS NOT NULL 
+        AND EXPIRATION_DATE > SYSDATE + :critical_days
+        AND EXPIRATION_DATE <= SYSDATE + :warning_days
+    """, ('critical_days', 'warning_days')),
+    'overdue': ("EXPIRATION_DATE < SYSDATE", ()),
+    'no-email': ("(LIC_NOTIFY_NAMES IS NULL OR TRIM(LIC_NOTIFY_NAMES) IS NULL)", ())
+}
+
+LICENSE_SEARCH_CONDITION = """
+    (UPPER(LIC_NAME) LIKE :search ESCAPE '\\'
+    OR UPPER(LIC_TYPE) LIKE :search ESCAPE '\\'
+    OR UPPER(LIC_STATE) LIKE :search ESCAPE '\\'
+    OR UPPER(LIC_NO) LIKE :search ESCAPE '\\')
+"""
+
+# Allowed sort keys for license lists. Each sorts on one column with LIC_ID
+# as the tie-breaker, which is also the keyset used for pagination.
+LICENSE_SORTS = {
+    'expiration': {'column': 'EXPIRATION_DATE', 'field': 'expiration_date', 'type': 'date'},
+    'name': {'column': 'LIC_NAME', 'field': 'lic_name', 'type': 'text'},
+    'type': {'column': 'LIC_TYPE', 'field': 'lic_type', 'type': 'text'},
+    'state': {'column': 'LIC_STATE', 'field': 'lic_state', 'type': 'text'}
+}
+
+# Allowed sort keys for reminder history, paginated on (SENT_DATE, ID)
+REMINDER_SORTS = {
+    'sent_date': {'column': 'er.SENT_DATE', 'field': 'sent_date', 'type': 'timestamp'}
+}
+
+
+def normalize_sort(sorts, sort, order, default_sort, default_order='asc'):
+    """Validate a sort key and direction against a whitelist, falling back to defaults"""
+    if sort not in sorts:
+        sort = default_sort
+    if order not in ('asc', 'desc'):
+        order = default_order
+    return sort, order
+
+
+def get_page_size():
+    """Read the requested page size, clamped to 1..PAGE_SIZE_MAX"""
+    page_size = request.args.get('page_size', PAGE_SIZE_DEFAULT, type=int)
+    return max(1, min(page_size or PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX))
+
+
+def encode_cursor(sort, order, value, row_id):
+    """Encode the last row of a page as an opaque keyset cursor"""
+    payload = json.dumps([sort, order, value, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token, sorts, sort, order):
+    """Decode a keyset cursor into (value, row_id).
+    
+    Raises ValueError if the token is malformed or was issued for a different
+    sort key or direction.
+    """
+    try:
+        cursor_sort, cursor_order, value, row_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except Exception:
+        raise ValueError("Invalid page cursor")
+    
+    if cursor_sort != sort or cursor_order != order:
+        raise ValueError("Page cursor does not match the requested sort order")
+    
+    try:
+        if isinstance(row_id, bool) or not isinstance(row_id, (int, float)):
+            raise TypeError(row_id)
+        if value is not None and sorts[sort]['type'] == 'date':
+            value = datetime.fromisoformat(value)
+        elif value is not None and sorts[sort]['type'] == 'timestamp':
+            # Bound as text and converted in SQL so fractional seconds survive
+            value = datetime.fromisoformat(value).strftime('%Y-%m-%dT%H:%M:%S.%f')
+    except (TypeError, ValueError):
+        raise ValueError("Invalid page cursor")
+    
+    return value, row_id
+
+
+def keyset_phases(sort_spec, id_column, order, cursor):
+    """Yield (condition, order_by, params) for the rows after cursor in
+    ORDER BY col NULLS LAST, id order.
+    
+    The non-null range comes first and the NULL tail second, each as its own
+    predicate a (col, id) index can range-scan, instead of one OR that makes
+    Oracle read and sort the whole table. A cursor on a NULL value starts in
+    the tail.
+    """
+    sort_column = sort_spec['column']
+    direction = order.upper()
+    op = '<' if order == 'desc' else '>'
+    
+    if cursor is None:
+        yield f"{sort_column} IS NOT NULL", f"{sort_column} {direction}, {id_column} {direction}", {}
+        yield f"{sort_column} IS NULL", f"{id_column} {direction}", {}
+        return
+    
+    cursor_value, cursor_id = cursor
+    if cursor_value is None:
+        yield (f"{sort_column} IS NULL AND {id_column} {op} :cursor_id",
+               f"{id_column} {direction}", {'cursor_id': cursor_id})
+        return
+    
+    value = ':cursor_value'
+    if sort_spec['type'] == 'timestamp':
+        value = """TO_TIMESTAMP(:cursor_value, 'YYYY-MM-DD"T"HH24:MI:SS.FF6')"""
+    
+    yield (f"{sort_column} {op}= {value} AND ({sort_column} {op} {value} OR {id_column} {op} :cursor_id)",
+           f"{sort_column} {direction}, {id_column} {direction}",
+           {'cursor_value': cursor_value, 'cursor_id': cursor_id})
+    yield f"{sort_column} IS NULL", f"{id_column} {direction}", {}
+
+
+def fetch_keyset_page(run, sort_spec, id_column, order, cursor, page_size):
+    """Fetch the page after cursor plus one look-ahead row (see split_page).
+    
+    run(condition, order_by, params) executes the caller's query with the
+    keyset condition ANDed in, the given ORDER BY and
+    FETCH FIRST :page_limit ROWS ONLY. Later phases only run while the
+    page is still short.
+    """
+    rows = []
+    for condition, order_by, params in keyset_phases(sort_spec, id_column, order, cursor):
+        rows += run(condition, order_by, dict(params, page_limit=page_size + 1 - len(rows)))
+        if len(rows) > page_size:
+            break
+    return rows
+
+
+def split_page(rows, page_size, sort, order, field):
+    """Drop the look-ahead row and return (rows, next_cursor or None)"""
+    if len(rows) <= page_size:
+        return rows, None
+    
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(sort, order, last[field], last['id'])
+
+
+def page_url(cursor):
+    """URL for the current view with the given page cursor (None for the first page)"""
+    args = request.args.to_dict()
+    args.pop('cursor', None)
+    if cursor:
+        args['cursor'] = cursor
+    return url_for(request.endpoint, **args)
+
+
+def like_pattern(text):
+    """Turn user search text into a bound LIKE pattern, escaping wildcards"""
+    escaped = text.upper().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def build_licenses_query(filter_type='all', search_query='', sort='expiration',
+                         order='asc', windows=None, keyset=None):
+    """Build the /licenses SELECT from fixed fragments and return (sql, params).
+    
+    Unknown filter types fall back to all licenses and unknown sort keys or
+    directions fall back to the default ordering, so no request value ever
+    reaches the SQL text. keyset is a (condition, order_by, params) phase from
+    keyset_phases(); its params carry the page_limit for FETCH FIRST.
+    """
+    schema = ORACLE_CONFIG['schema']
+    windows = windows or {}
+    sort, order = normalize_sort(LICENSE_SORTS, sort, order, 'expiration')
+    sort_column = LICENSE_SORTS[sort]['column']
+    
+    sql = f"""
+        SELECT 
+            LIC_ID as id,
+            LIC_NAME as lic_name,
+            LIC_STATE as lic_state,
+            LIC_TYPE as lic_type,
+            LIC_NO as lic_no,
+            ASCEM_NO as ascem_no,
+            FIRST_ISSUE_DATE as first_issue_date,
+            EXPIRATION_DATE as expiration_date,
+            LIC_NOTIFY_NAMES as lic_notify_names,
+            LIC_COMMENTS as lic_comments,
+            TRUNC(EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration
+        FROM "{schema}".LICENSES
+    """
+    
+    where_conditions = []
+    params = {}
+    
+    if filter_type in LICENSE_FILTERS:
+        condition, bind_names = LICENSE_FILTERS[filter_type]
+        where_conditions.append(condition)
+        for name in bind_names:
+            params[name] = windows[name]
+    
+    if search_query:
+        where_conditions.append(LICENSE_SEARCH_CONDITION)
+        params['search'] = like_pattern(search_query)
+    
+    if keyset:
+        condition, order_by, keyset_params = keyset
+        where_conditions.append(condition)
+        params.update(keyset_params)
+    
+    if where_conditions:
+        sql += " WHERE " + " AND ".join(where_conditions)
+    
+    if keyset:
+        sql += f" ORDER BY {order_by} FETCH FIRST :page_limit ROWS ONLY"
+    else:
+        direction = order.upper()
+        sql += f" ORDER BY {sort_column} {direction} NULLS LAST, LIC_ID {direction}"
+    
+    return sql, params
+
+
+class LicenseSearchIndex:
+    """In-process trigram index over license name, type, state and number.
+    
+    Built from LICENSES on first use and kept current incrementally: rows whose
+    NVL(UPDATED_AT, CREATED_AT) moved past the last seen watermark are
+    re-indexed, and an id set that no longer matches the table's (count, sum
+    and max of LIC_ID, so a delete is caught even when inserts offset it)
+    triggers a full rebuild. Refreshes happen at most every refresh_seconds,
+    on the search path.
+    """
+    
+    # Searchable fields and their ranking weights
+    FIELDS = {'lic_name': 3.0, 'lic_no': 2.0, 'lic_type': 1.0, 'lic_state': 1.0}
+    
+    def __init__(self, refresh_seconds=30):
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.normalized = {}
+        self.doc_grams = {}
+        self.postings = {}
+        self.watermark = None
+        self.built = False
+        self.last_refresh = 0.0
+    
+    @staticmethod
+    def trigrams(text):
+        """Return the set of 3-character substrings of text"""
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    
+    def rows_query(self, incremental):
+        """SELECT for the indexed columns, optionally limited to recently updated rows"""
+        schema = ORACLE_CONFIG['schema']
+        sql = f"""
+            SELECT 
+                LIC_ID as id,
+                LIC_NAME as lic_name,
+                LIC_TYPE as lic_type,
+                LIC_STATE as lic_state,
+                LIC_NO as lic_no,
+                EXPIRATION_DATE as expiration_date
+            FROM "{schema}".LICENSES
+        """
+        if incremental:
+            sql += " WHERE NVL(UPDATED_AT, CREATED_AT) >= :since"
+        return sql
+    
+    def add(self, row):
+        """Index (or re-index) one license row"""
+        lic_id = row['id']
+        self.remove(lic_id)
+        
+        normalized = {
+            field: str(row[field]).upper() if row.get(field) is not None else ''
+            for field in self.FIELDS
+        }
+        grams = set()
+        for value in normalized.values():
+            grams |= self.trigrams(value)
+        
+        self.documents[lic_id] = row
+        self.normalized[lic_id] = normalized
+        self.doc_grams[lic_id] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(lic_id)
+    
+    def remove(self, lic_id):
+        """Drop one license from the index if present"""
+        for gram in self.doc_grams.pop(lic_id, ()):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(lic_id)
+                if not ids:
+                    del self.postings[gram]
+        self.documents.pop(lic_id, None)
+        self.normalized.pop(lic_id, None)
+    
+    def rebuild(self):
+        """Rebuild the whole index from LICENSES"""
+        self.documents, self.normalized, self.doc_grams, self.postings = {}, {}, {}, {}
+        for row in stream_oracle(self.rows_query(incremental=False)):
+            self.add(row)
+        self.built = True
+        logger.info(f"Search index built with {len(self.documents)} licenses")
+    
+    def id_set(self):
+        """(count, sum, max) of the indexed license ids, as compared with LICENSES"""
+        return (len(self.documents), sum(self.documents), max(self.documents, default=None))
+    
+    def invalidate(self):
+        """Force a refresh check on the next search"""
+        self.last_refresh = 0.0
+    
+    def refresh(self):
+        """Bring the index up to date if the refresh interval has passed"""
+        if self.built and time.monotonic() - self.last_refresh < self.refresh_seconds:
+            return
         
-    except Exception as e:
-        logger.error(f"Query error: {e}")
-        if 'connection' in locals():
-            connection.rollback()
-            connection.close()
-        raise
+        schema = ORACLE_CONFIG['schema']
+        result = query_oracle(f"""
+            SELECT COUNT(*) as total, NVL(SUM(LIC_ID), 0) as id_sum, MAX(LIC_ID) as max_id,
+                   MAX(NVL(UPDATED_AT, CREATED_AT)) as max_updated
+            FROM "{schema}".LICENSES
+        """)
+        id_set = (result[0]['total'], result[0]['id_sum'], result[0]['max_id']) if result else (0, 0, None)
+        max_updated = result[0]['max_updated'] if result else None
+        
+        if not self.built:
+            self.rebuild()
+        elif max_updated and max_updated != self.watermark:
+            params = {'since': datetime.fromisoformat(self.watermark)} if self.watermark else None
+            query = self.rows_query(incremental=bool(params))
+            changed = 0
+            for row in stream_oracle(query, params):
+                self.add(row)
+                changed += 1
+            logger.info(f"Search index refreshed {changed} updated licenses")
+        
+        if self.id_set() != id_set:
+            self.rebuild()
+        
+        self.watermark = max_updated
+        self.last_refresh = time.monotonic()
+    
+    def search(self, query, limit=20):
+        """Return up to limit licenses containing query, best matches first.
+        
+        Matching is case-insensitive substring matching, as with the LIKE search
+        on /licenses. Name matches outrank number, type and state matches, and
+        prefix and exact matches get a bonus.
+        """
+        query = query.strip().upper()
+        if not query:
+            return []
+        
+        with self.lock:
+            self.refresh()
+            
+            if len(query) >= 3:
+                posting_sets = sorted(
+                    (self.postings.get(gram, set()) for gram in self.trigrams(query)),
+                    key=len
+                )
+                candidates = set.intersection(*posting_sets) if posting_sets else set()
+            else:
+                candidates = self.documents.keys()
+            
+            matches = []
+            for lic_id in candidates:
+                score = 0.0
+                for field, weight in self.FIELDS.items():
+                    value = self.normalized[lic_id][field]
+                    position = value.find(query)
+                    if position < 0:
+                        continue
+                    score += weight
+                    if position == 0:
+                        score += weight / 2
+                    if value == query:
+                        score += weight
+                if score:
+                    matches.append((score, self.documents[lic_id]))
+        
+        matches.sort(key=lambda match: (-match[0], match[1].get('lic_name') or ''))
+        return [dict(row, score=score) for score, row in matches[:limit]]
+
+
+search_index = LicenseSearchIndex(int(os.getenv('SEARCH_INDEX_REFRESH_SECONDS', 30)))
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries also expire after ttl seconds.
+    
+    Keys are extended with the current date, so date-relative results
+    (days until expiration, sent today) never survive a day rollover.
+    A value loaded while clear() ran is returned but not stored, since it
+    may predate the write that cleared the cache. A ttl of 0 disables caching.
+    """
+    
+    def __init__(self, ttl=60, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() on a miss"""
+        if self.ttl <= 0:
+            return loader()
+        
+        key = (datetime.now().date().isoformat(),) + tuple(key)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self.generation
+        
+        value = loader()
+        
+        with self.lock:
+            if generation != self.generation:
+                return value
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+    
+    def clear(self):
+        """Drop every cached entry (and any load already in flight)"""
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+    
+    def stats(self):
+        """Return entry and hit/miss counts"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+response_cache = TTLCache(int(os.getenv('CACHE_TTL_SECONDS', 60)),
+                          int(os.getenv('CACHE_MAX_ENTRIES', 256)))
+
+
+def invalidate_caches():
+    """Forget cached dashboard/API results after a write to LICENSES or EMAIL_REMINDERS"""
+    response_cache.clear()
+    search_index.invalidate()
+
+
+API_CACHE_CONTROL = (
+    f"public, max-age=0, s-maxage={int(os.getenv('API_CACHE_S_MAXAGE', 30))}, "
+    f"stale-while-revalidate={int(os.getenv('API_CACHE_STALE_WHILE_REVALIDATE', 300))}"
+)
+
+
+def get_data_fingerprint():
+    """Return (etag, last_modified) describing the current state of the data.
+    
+    Built from the DATA_VERSIONS change counters of LICENSES and
+    EMAIL_REMINDERS (bumped by triggers on every write statement, see
+    run_oracle_setup.py) plus the database's current date, so it changes on
+    any insert, update, delete or send and at midnight, without scanning
+    either table. last_modified is UTC.
+    """
+    schema = ORACLE_CONFIG['schema']
+    result = query_oracle(f"""
+        SELECT 
+            MAX(CASE WHEN TABLE_NAME = 'LICENSES' THEN VERSION END) as licenses_version,
+            MAX(CASE WHEN TABLE_NAME = 'LICENSES' THEN CHANGED_AT END) as licenses_updated,
+            MAX(CASE WHEN TABLE_NAME = 'EMAIL_REMINDERS' THEN VERSION END) as reminders_version,
+            MAX(CASE WHEN TABLE_NAME = 'EMAIL_REMINDERS' THEN CHANGED_AT END) as reminders_updated,
+            SYSDATE as db_now,
+            SYS_EXTRACT_UTC(SYSTIMESTAMP) as db_utc_now
+        FROM "{schema}".DATA_VERSIONS
+    """)[0]
+    
+    db_now = datetime.fromisoformat(result['db_now'])
+    today = db_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    fingerprint = '|'.join(str(result[key]) for key in (
+        'licenses_version', 'licenses_updated', 'reminders_version', 'reminders_updated'
+    ))
+    etag = hashlib.sha1(f"{today.date()}|{fingerprint}".encode()).hexdigest()[:20]
+    
+    # Latest change, or midnight if nothing changed today, converted to UTC
+    changes = [datetime.fromisoformat(result[key])
+               for key in ('licenses_updated', 'reminders_updated') if result[key]]
+    utc_offset = datetime.fromisoformat(result['db_utc_now']) - db_now
+    last_modified = (max(changes + [today]) + utc_offset).replace(microsecond=0, tzinfo=timezone.utc)
+    
+    return etag, last_modified
+
+
+def conditional_response(build_response):
+    """Answer a GET with 304 when the client's copy is current, else build_response().
+    
+    The fingerprint check is one cheap query, so unchanged data never runs the
+    route's own queries. Every response carries the ETag, Last-Modified and a
+    Cache-Control that lets the edge serve repeat polls.
+    """
+    etag, last_modified = get_data_fingerprint()
+    
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = build_response()
+    
+    if response.status_code in (200, 304):
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = API_CACHE_CONTROL
+        if response.status_code == 200:
+            response.make_conditional(request)
+    return response
 
 
 @app.route('/health')
@@ -143,6 +1060,8 @@ def health_check():
         'template_folder': app.template_folder,
         'templates_exist': os.path.exists(app.template_folder) if app.template_folder else False,
         'oracle_configured': bool(ORACLE_CONFIG.get('host')),
+        'oracle_pool': get_pool_stats(),
+        'cache': response_cache.stats(),
         'environment': 'vercel' if os.path.exists('/var/task') else 'local'
     })
 
@@ -150,188 +1069,21 @@ def health_check():
 def dashboard():
     """Main dashboard page"""
     try:
-        schema = ORACLE_CONFIG['schema']
-        
         # Get filter parameters with defaults
         filter_upcoming = int(request.args.get('upcoming_days', 60))
         filter_critical = int(request.args.get('critical_days', 7))  # Default to 7 days for critical
         filter_warning = int(request.args.get('warning_days', 30))
         
-        # Get statistics
-        stats = {
-            'total_licenses': 0,
-            'expiring_soon': 0,
-            'overdue': 0,
-            'past_due_count': 0,
-            'upcoming_expirations': 0,
-            'reminders_sent_today': 0,
-            'critical_count': 0,
-            'warning_count': 0,
-            'normal_count': 0
-        }
-        
-        # Total licenses
-        result = query_oracle(f'SELECT COUNT(*) as count FROM "{schema}".LICENSES')
-        if result:
-            stats['total_licenses'] = result[0]['count']
-        
-        # Expiring soon / Upcoming expirations (using filter parameter)
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE IS NOT NULL
-            AND EXPIRATION_DATE >= SYSDATE
-            AND EXPIRATION_DATE <= SYSDATE + :days
-        """, {'days': filter_upcoming})
-        if result:
-            stats['expiring_soon'] = result[0]['count']
-            stats['upcoming_expirations'] = result[0]['count']
-        
-        # Critical (using filter parameter)
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE >= SYSDATE
-            AND EXPIRATION_DATE <= SYSDATE + :days
-        """, {'days': filter_critical})
-        if result:
-            stats['critical_count'] = result[0]['count']
-        
-        # Warning (between critical and warning days)
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE > SYSDATE + :critical
-            AND EXPIRATION_DATE <= SYSDATE + :warning
-        """, {'critical': filter_critical, 'warning': filter_warning})
-        if result:
-            stats['warning_count'] = result[0]['count']
-        
-        # Normal (31-35 days by default)
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE > SYSDATE + :warning
-            AND EXPIRATION_DATE <= SYSDATE + :upcoming
-        """, {'warning': filter_warning, 'upcoming': filter_upcoming})
-        if result:
-            stats['normal_count'] = result[0]['count']
-        
-        # Overdue / Past Due
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE < SYSDATE
-            AND EXPIRATION_DATE IS NOT NULL
-        """)
-        if result:
-            stats['overdue'] = result[0]['count']
-            stats['past_due_count'] = result[0]['count']
-        
-        # Reminders sent today
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".EMAIL_REMINDERS
-            WHERE TRUNC(SENT_DATE) = TRUNC(SYSDATE)
-        """)
-        if result:
-            stats['reminders_sent_today'] = result[0]['count']
-        
-        # Get past due licenses (no limit for dashboard display)
-        past_due = query_oracle(f"""
-            SELECT 
-                LIC_ID as id,
-                LIC_NAME as lic_name,
-                LIC_TYPE as lic_type,
-                LIC_STATE as lic_state,
-                LIC_NO as lic_no,
-                EXPIRATION_DATE as expiration_date,
-                LIC_NOTIFY_NAMES as lic_notify_names,
-                TRUNC(SYSDATE) - TRUNC(EXPIRATION_DATE) as days_overdue
-            FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE < SYSDATE
-            AND EXPIRATION_DATE IS NOT NULL
-            ORDER BY EXPIRATION_DATE DESC
-        """)
-        
-        # Get critical licenses (0-7 days by default)
-        critical = query_oracle(f"""
-            SELECT 
-                LIC_ID as id,
-                LIC_NAME as lic_name,
-                LIC_TYPE as lic_type,
-                LIC_STATE as lic_state,
-                LIC_NO as lic_no,
-                EXPIRATION_DATE as expiration_date,
-                LIC_NOTIFY_NAMES as lic_notify_names,
-                TRUNC(EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration
-            FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE >= SYSDATE
-            AND EXPIRATION_DATE <= SYSDATE + :days
-            ORDER BY EXPIRATION_DATE
-        """, {'days': filter_critical})
-        
-        # Get warning licenses (8-30 days by default)
-        warning = query_oracle(f"""
-            SELECT 
-                LIC_ID as id,
-                LIC_NAME as lic_name,
-                LIC_TYPE as lic_type,
-                LIC_STATE as lic_state,
-                LIC_NO as lic_no,
-                EXPIRATION_DATE as expiration_date,
-                LIC_NOTIFY_NAMES as lic_notify_names,
-                TRUNC(EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration
-            FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE > SYSDATE + :critical
-            AND EXPIRATION_DATE <= SYSDATE + :warning
-            ORDER BY EXPIRATION_DATE
-        """, {'critical': filter_critical, 'warning': filter_warning})
-        
-        # Get normal upcoming licenses (31-35 days by default)
-        normal = query_oracle(f"""
-            SELECT 
-                LIC_ID as id,
-                LIC_NAME as lic_name,
-                LIC_TYPE as lic_type,
-                LIC_STATE as lic_state,
-                LIC_NO as lic_no,
-                EXPIRATION_DATE as expiration_date,
-                LIC_NOTIFY_NAMES as lic_notify_names,
-                TRUNC(EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration
-            FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE > SYSDATE + :warning
-            AND EXPIRATION_DATE <= SYSDATE + :upcoming
-            ORDER BY EXPIRATION_DATE
-        """, {'warning': filter_warning, 'upcoming': filter_upcoming})
-        
-        # Get ALL upcoming licenses (0-35 days) in one list
-        all_upcoming = query_oracle(f"""
-            SELECT 
-                LIC_ID as id,
-                LIC_NAME as lic_name,
-                LIC_TYPE as lic_type,
-                LIC_STATE as lic_state,
-                LIC_NO as lic_no,
-                EXPIRATION_DATE as expiration_date,
-                LIC_NOTIFY_NAMES as lic_notify_names,
-                TRUNC(EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration
-            FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE >= SYSDATE
-            AND EXPIRATION_DATE <= SYSDATE + :upcoming
-            ORDER BY EXPIRATION_DATE
-        """, {'upcoming': filter_upcoming})
-        
-        
-        # Get recent reminders
-        recent_reminders = query_oracle(f"""
-            SELECT * FROM (
-                SELECT 
-                    er.ID,
-                    er.LICENSE_ID,
-                    l.LIC_NAME,
-                    er.REMINDER_TYPE,
-                    er.SENT_DATE,
-                    er.EMAIL_TO
-                FROM "{schema}".EMAIL_REMINDERS er
-                LEFT JOIN "{schema}".LICENSES l ON er.LICENSE_ID = l.LIC_ID
-                ORDER BY er.SENT_DATE DESC
-            ) WHERE ROWNUM <= 5
-        """)
+        # Statistics, buckets and recent reminders are served from the cache on repeat views
+        stats, buckets, recent_reminders = response_cache.get_or_load(
+            ('dashboard', filter_upcoming, filter_critical, filter_warning),
+            lambda: load_dashboard(filter_upcoming, filter_critical, filter_warning)
+        )
+        past_due = buckets['past_due']
+        critical = buckets['critical']
+        warning = buckets['warning']
+        normal = buckets['normal']
+        all_upcoming = buckets['all_upcoming']
         
         return render_template('dashboard.html', 
                              stats=stats, 
@@ -380,65 +1132,33 @@ def licenses():
         critical_days = int(request.args.get('critical_days', 10))
         warning_days = int(request.args.get('warning_days', 30))
         
-        # Build base query
-        base_query = f"""
-            SELECT 
-                LIC_ID as id,
-                LIC_NAME as lic_name,
-                LIC_STATE as lic_state,
-                LIC_TYPE as lic_type,
-                LIC_NO as lic_no,
-                ASCEM_NO as ascem_no,
-                FIRST_ISSUE_DATE as first_issue_date,
-                EXPIRATION_DATE as expiration_date,
-                LIC_NOTIFY_NAMES as lic_notify_names,
-                LIC_COMMENTS as lic_comments,
-                TRUNC(EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration
-            FROM "{schema}".LICENSES
-        """
-        
-        where_conditions = []
-        
-        # Apply filters
-        if filter_type == 'expiring':
-            where_conditions.append(f"""
-                EXPIRATION_DATE IS NOT NULL 
-                AND EXPIRATION_DATE >= SYSDATE 
-                AND EXPIRATION_DATE <= SYSDATE + {upcoming_days}
-            """)
-        elif filter_type == 'critical':
-            where_conditions.append(f"""
-                EXPIRATION_DATE IS NOT NULL 
-                AND EXPIRATION_DATE >= SYSDATE 
-                AND EXPIRATION_DATE <= SYSDATE + {critical_days}
-            """)
-        elif filter_type == 'warning':
-            where_conditions.append(f"""
-                EXPIRATION_DATE IS NOT NULL 
-                AND EXPIRATION_DATE > SYSDATE + {critical_days}
-                AND EXPIRATION_DATE <= SYSDATE + {warning_days}
-            """)
-        elif filter_type == 'overdue':
-            where_conditions.append("EXPIRATION_DATE < SYSDATE")
-        elif filter_type == 'no-email':
-            where_conditions.append("(LIC_NOTIFY_NAMES IS NULL OR TRIM(LIC_NOTIFY_NAMES) IS NULL)")
-        
-        # Apply search
-        if search_query:
-            search_condition = f"""
-                (UPPER(LIC_NAME) LIKE UPPER('%{search_query}%')
-                OR UPPER(LIC_TYPE) LIKE UPPER('%{search_query}%')
-                OR UPPER(LIC_STATE) LIKE UPPER('%{search_query}%')
-                OR UPPER(LIC_NO) LIKE UPPER('%{search_query}%'))
-            """
-            where_conditions.append(search_condition)
-        
-        if where_conditions:
-            base_query += " WHERE " + " AND ".join(where_conditions)
+        # Get server-side sort and keyset pagination parameters
+        sort, order = normalize_sort(LICENSE_SORTS, request.args.get('sort'),
+                                     request.args.get('order'), 'expiration')
+        page_size = get_page_size()
+        cursor_token = request.args.get('cursor')
+        cursor = None
+        if cursor_token:
+            try:
+                cursor = decode_cursor(cursor_token, LICENSE_SORTS, sort, order)
+            except ValueError as e:
+                flash(f'{e}; showing the first page', 'warning')
+        
+        windows = {
+            'upcoming_days': upcoming_days,
+            'critical_days': critical_days,
+            'warning_days': warning_days
+        }
         
-        base_query += " ORDER BY EXPIRATION_DATE NULLS LAST, LIC_NAME"
+        def load_page(condition, order_by, params):
+            query, query_params = build_licenses_query(filter_type, search_query, sort, order,
+                                                       windows, keyset=(condition, order_by, params))
+            return query_oracle(query, query_params)
         
-        all_licenses = query_oracle(base_query)
+        all_licenses, next_cursor = split_page(
+            fetch_keyset_page(load_page, LICENSE_SORTS[sort], 'LIC_ID', order, cursor, page_size),
+            page_size, sort, order, LICENSE_SORTS[sort]['field']
+        )
         
         # Process licenses for display
         processed_licenses = []
@@ -494,6 +1214,8 @@ def licenses():
                              upcoming_days=upcoming_days,
                              critical_days=critical_days,
                              warning_days=warning_days,
+                             next_page_url=page_url(next_cursor) if next_cursor else None,
+                             first_page_url=page_url(None) if cursor else None,
                              company_info=COMPANY_INFO)
     except Exception as e:
         logger.error(f"Licenses page error: {e}")
@@ -571,26 +1293,31 @@ def edit_license(license_id):
             expiration_date = request.form.get('expiration_date')
             lic_notify_names = request.form.get('lic_notify_names')
             
-            # Update query
-            affected = query_oracle(f"""
-                UPDATE "{schema}".LICENSES
-                SET LIC_NAME = :lic_name,
-                    LIC_STATE = :lic_state,
-                    LIC_TYPE = :lic_type,
-                    LIC_NO = :lic_no,
-                    EXPIRATION_DATE = TO_DATE(:expiration_date, 'YYYY-MM-DD'),
-                    LIC_NOTIFY_NAMES = :lic_notify_names
-                WHERE LIC_ID = :id
-            """, {
-                'lic_name': lic_name,
-                'lic_state': lic_state,
-                'lic_type': lic_type,
-                'lic_no': lic_no,
-                'expiration_date': expiration_date if expiration_date else None,
-                'lic_notify_names': lic_notify_names,
-                'id': license_id
-            })
+            # Update the license and reschedule its next reminder in one transaction
+            with UnitOfWork() as uow:
+                affected = uow.execute(f"""
+                    UPDATE "{schema}".LICENSES
+                    SET LIC_NAME = :lic_name,
+                        LIC_STATE = :lic_state,
+                        LIC_TYPE = :lic_type,
+                        LIC_NO = :lic_no,
+                        EXPIRATION_DATE = TO_DATE(:expiration_date, 'YYYY-MM-DD'),
+                        LIC_NOTIFY_NAMES = :lic_notify_names,
+                        ROW_HASH = NULL,
+                        UPDATED_AT = SYSDATE
+                    WHERE LIC_ID = :id
+                """, {
+                    'lic_name': lic_name,
+                    'lic_state': lic_state,
+                    'lic_type': lic_type,
+                    'lic_no': lic_no,
+                    'expiration_date': expiration_date if expiration_date else None,
+                    'lic_notify_names': lic_notify_names,
+                    'id': license_id
+                })
+                refresh_next_reminder(license_id, uow)
             
+            invalidate_caches()
             flash('License updated successfully', 'success')
             return redirect(url_for('view_license', license_id=license_id))
             
@@ -606,17 +1333,24 @@ def delete_license(license_id):
     try:
         schema = ORACLE_CONFIG['schema']
         
-        # First delete related email reminders
-        query_oracle(f"""
-            DELETE FROM "{schema}".EMAIL_REMINDERS
-            WHERE LICENSE_ID = :id
-        """, {'id': license_id})
+        with UnitOfWork() as uow:
+            # First delete related email reminders and queued emails
+            uow.execute(f"""
+                DELETE FROM "{schema}".EMAIL_REMINDERS
+                WHERE LICENSE_ID = :id
+            """, {'id': license_id})
+            uow.execute(f"""
+                DELETE FROM "{schema}".EMAIL_OUTBOX
+                WHERE LICENSE_ID = :id
+            """, {'id': license_id})
+            
+            # Then delete the license
+            affected = uow.execute(f"""
+                DELETE FROM "{schema}".LICENSES
+                WHERE LIC_ID = :id
+            """, {'id': license_id})
         
-        # Then delete the license
-        affected = query_oracle(f"""
-            DELETE FROM "{schema}".LICENSES
-            WHERE LIC_ID = :id
-        """, {'id': license_id})
+        invalidate_caches()
         
         if affected > 0:
             flash('License deleted successfully', 'success')
@@ -637,8 +1371,22 @@ def reminders():
     try:
         schema = ORACLE_CONFIG['schema']
         
-        # Get reminder history with all necessary fields for the template
-        reminders = query_oracle(f"""
+        # Get server-side sort and keyset pagination parameters
+        sort, order = normalize_sort(REMINDER_SORTS, request.args.get('sort'),
+                                     request.args.get('order'), 'sent_date', 'desc')
+        page_size = get_page_size()
+        cursor_token = request.args.get('cursor')
+        cursor = None
+        if cursor_token:
+            try:
+                cursor = decode_cursor(cursor_token, REMINDER_SORTS, sort, order)
+            except ValueError as e:
+                flash(f'{e}; showing the first page', 'warning')
+        
+        # Get one page of reminder history metadata; the EMAIL_BODY CLOB is loaded
+        # on demand through /api/reminder/<id>/body when a row is expanded
+        def load_page(condition, order_by, params):
+            return query_oracle(f"""
             SELECT 
                 er.ID as id,
                 er.LICENSE_ID as license_id,
@@ -649,13 +1397,19 @@ def reminders():
                 er.SENT_DATE as sent_date,
                 er.EMAIL_TO as email_to,
                 er.EMAIL_SUBJECT as subject,
-                er.EMAIL_BODY as body,
                 er.STATUS as status,
                 NVL(l.EMAIL_ENABLED, 1) as email_enabled
             FROM "{schema}".EMAIL_REMINDERS er
             LEFT JOIN "{schema}".LICENSES l ON er.LICENSE_ID = l.LIC_ID
-            ORDER BY er.SENT_DATE DESC
-        """)
+            WHERE {condition}
+            ORDER BY {order_by}
+            FETCH FIRST :page_limit ROWS ONLY
+        """, params)
+        
+        reminders, next_cursor = split_page(
+            fetch_keyset_page(load_page, REMINDER_SORTS[sort], 'er.ID', order, cursor, page_size),
+            page_size, sort, order, REMINDER_SORTS[sort]['field']
+        )
         
         # Get licenses needing reminders
         pending_reminders = query_oracle(f"""
@@ -666,63 +1420,97 @@ def reminders():
         return render_template('reminders.html',
                              reminders=reminders,
                              pending_reminders=pending_reminders,
+                             next_page_url=page_url(next_cursor) if next_cursor else None,
+                             first_page_url=page_url(None) if cursor else None,
+                             company_info=COMPANY_INFO)
+    except Exception as e:
+        logger.error(f"Reminders page error: {e}")
+        flash(f'Error loading reminders: {str(e)}', 'danger')
+        return render_template('reminders.html',
+                             reminders=[],
+                             pending_reminders=[],
                              company_info=COMPANY_INFO)
+
+
+@app.route('/api/reminder/<int:reminder_id>/body')
+def api_reminder_body(reminder_id):
+    """API endpoint for the full content of a single sent reminder"""
+    try:
+        schema = ORACLE_CONFIG['schema']
+        
+        result = query_oracle(f"""
+            SELECT 
+                ID as id,
+                EMAIL_SUBJECT as subject,
+                EMAIL_BODY as body
+            FROM "{schema}".EMAIL_REMINDERS
+            WHERE ID = :id
+        """, {'id': reminder_id})
+        
+        if result:
+            return jsonify(result[0])
+        else:
+            return jsonify({'error': 'Reminder not found'}), 404
+            
     except Exception as e:
-        logger.error(f"Reminders page error: {e}")
-        flash(f'Error loading reminders: {str(e)}', 'danger')
-        return render_template('reminders.html',
-                             reminders=[],
-                             pending_reminders=[],
-                             company_info=COMPANY_INFO)
+        logger.error(f"API reminder body error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def get_api_stats():
+    """Run the /api/stats counts"""
+    schema = ORACLE_CONFIG['schema']
+    
+    stats = {}
+    
+    # Total licenses
+    result = query_oracle(f'SELECT COUNT(*) as count FROM "{schema}".LICENSES')
+    stats['total_licenses'] = result[0]['count'] if result else 0
+    
+    # Expiring soon
+    result = query_oracle(f"""
+        SELECT COUNT(*) as count FROM "{schema}".LICENSES
+        WHERE EXPIRATION_DATE IS NOT NULL
+        AND EXPIRATION_DATE >= SYSDATE
+        AND EXPIRATION_DATE <= SYSDATE + 30
+    """)
+    stats['expiring_soon'] = result[0]['count'] if result else 0
+    
+    # Overdue
+    result = query_oracle(f"""
+        SELECT COUNT(*) as count FROM "{schema}".LICENSES
+        WHERE EXPIRATION_DATE < SYSDATE
+    """)
+    stats['overdue'] = result[0]['count'] if result else 0
+    
+    # Reminders sent today
+    result = query_oracle(f"""
+        SELECT COUNT(*) as count FROM "{schema}".EMAIL_REMINDERS
+        WHERE SENT_DATE >= TRUNC(SYSDATE) AND SENT_DATE < TRUNC(SYSDATE) + 1
+    """)
+    stats['reminders_sent_today'] = result[0]['count'] if result else 0
+    
+    # Licenses with emails
+    result = query_oracle(f"""
+        SELECT COUNT(*) as count FROM "{schema}".LICENSES
+        WHERE LIC_NOTIFY_NAMES IS NOT NULL AND TRIM(LIC_NOTIFY_NAMES) IS NOT NULL
+    """)
+    stats['licenses_with_emails'] = result[0]['count'] if result else 0
+    
+    # Total reminders sent
+    result = query_oracle(f'SELECT COUNT(*) as count FROM "{schema}".EMAIL_REMINDERS')
+    stats['total_reminders'] = result[0]['count'] if result else 0
+    
+    return stats
 
 
 @app.route('/api/stats')
 def api_stats():
     """API endpoint for dashboard statistics"""
     try:
-        schema = ORACLE_CONFIG['schema']
-        
-        stats = {}
-        
-        # Total licenses
-        result = query_oracle(f'SELECT COUNT(*) as count FROM "{schema}".LICENSES')
-        stats['total_licenses'] = result[0]['count'] if result else 0
-        
-        # Expiring soon
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE IS NOT NULL
-            AND EXPIRATION_DATE >= SYSDATE
-            AND EXPIRATION_DATE <= SYSDATE + 30
-        """)
-        stats['expiring_soon'] = result[0]['count'] if result else 0
-        
-        # Overdue
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE < SYSDATE
-        """)
-        stats['overdue'] = result[0]['count'] if result else 0
-        
-        # Reminders sent today
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".EMAIL_REMINDERS
-            WHERE TRUNC(SENT_DATE) = TRUNC(SYSDATE)
-        """)
-        stats['reminders_sent_today'] = result[0]['count'] if result else 0
-        
-        # Licenses with emails
-        result = query_oracle(f"""
-            SELECT COUNT(*) as count FROM "{schema}".LICENSES
-            WHERE LIC_NOTIFY_NAMES IS NOT NULL AND TRIM(LIC_NOTIFY_NAMES) IS NOT NULL
-        """)
-        stats['licenses_with_emails'] = result[0]['count'] if result else 0
-        
-        # Total reminders sent
-        result = query_oracle(f'SELECT COUNT(*) as count FROM "{schema}".EMAIL_REMINDERS')
-        stats['total_reminders'] = result[0]['count'] if result else 0
-        
-        return jsonify(stats)
+        return conditional_response(
+            lambda: jsonify(response_cache.get_or_load(('api_stats',), get_api_stats))
+        )
     except Exception as e:
         logger.error(f"API stats error: {e}")
         return jsonify({'error': str(e)}), 500
@@ -735,28 +1523,84 @@ def api_upcoming():
         schema = ORACLE_CONFIG['schema']
         days = request.args.get('days', 90, type=int)
         
-        upcoming = query_oracle(f"""
-            SELECT 
-                LIC_ID as id,
-                LIC_NAME as lic_name,
-                LIC_TYPE as lic_type,
-                LIC_STATE as lic_state,
-                EXPIRATION_DATE as expiration_date,
-                LIC_NOTIFY_NAMES as lic_notify_names,
-                TRUNC(EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration
-            FROM "{schema}".LICENSES
-            WHERE EXPIRATION_DATE IS NOT NULL
-            AND EXPIRATION_DATE >= SYSDATE
-            AND EXPIRATION_DATE <= SYSDATE + :days
-            ORDER BY EXPIRATION_DATE
-        """, {'days': days})
+        sort, order = normalize_sort(LICENSE_SORTS, request.args.get('sort'),
+                                     request.args.get('order'), 'expiration')
+        page_size = get_page_size()
+        cursor_token = request.args.get('cursor')
+        cursor = None
+        if cursor_token:
+            try:
+                cursor = decode_cursor(cursor_token, LICENSE_SORTS, sort, order)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
-        return jsonify(upcoming)
+        def load_page(condition, order_by, params):
+            return list(stream_oracle(f"""
+                SELECT 
+                    LIC_ID as id,
+                    LIC_NAME as lic_name,
+                    LIC_TYPE as lic_type,
+                    LIC_STATE as lic_state,
+                    EXPIRATION_DATE as expiration_date,
+                    LIC_NOTIFY_NAMES as lic_notify_names,
+                    TRUNC(EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration
+                FROM "{schema}".LICENSES
+                WHERE EXPIRATION_DATE IS NOT NULL
+                AND EXPIRATION_DATE >= SYSDATE
+                AND EXPIRATION_DATE <= SYSDATE + :days
+                AND {condition}
+                ORDER BY {order_by}
+                FETCH FIRST :page_limit ROWS ONLY
+        """, dict(params, days=days), arraysize=page_size + 1))
+        
+        def load_upcoming():
+            return fetch_keyset_page(load_page, LICENSE_SORTS[sort], 'LIC_ID', order, cursor, page_size)
+        
+        def build_response():
+            upcoming = response_cache.get_or_load(
+                ('api_upcoming', days, sort, order, page_size, cursor_token), load_upcoming
+            )
+            upcoming, next_cursor = split_page(upcoming, page_size, sort, order,
+                                               LICENSE_SORTS[sort]['field'])
+            
+            # The body stays a plain array; the next page is advertised in headers
+            response = jsonify(upcoming)
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+                response.headers['Link'] = f'<{page_url(next_cursor)}>; rel="next"'
+            return response
+        
+        return conditional_response(build_response)
     except Exception as e:
         logger.error(f"API upcoming error: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/search')
+def api_search():
+    """API endpoint for ranked substring search over license name, type, state and number"""
+    try:
+        query = request.args.get('q', '').strip()
+        limit = max(1, min(request.args.get('limit', 20, type=int) or 20, PAGE_SIZE_MAX))
+        
+        if not query:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+        
+        started = time.perf_counter()
+        results = search_index.search(query, limit)
+        took_ms = (time.perf_counter() - started) * 1000
+        
+        return jsonify({
+            'query': query,
+            'count': len(results),
+            'took_ms': round(took_ms, 2),
+            'results': results
+        })
+    except Exception as e:
+        logger.error(f"API search error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/license', methods=['POST'])
 def api_create_license():
     """API endpoint for creating a new license"""
@@ -764,53 +1608,55 @@ def api_create_license():
         schema = ORACLE_CONFIG['schema']
         data = request.get_json()
         
-        # Get the next license ID
-        result = query_oracle(f"""
-            SELECT NVL(MAX(LIC_ID), 0) + 1 as next_id 
-            FROM "{schema}".LICENSES
-        """)
-        next_id = result[0]['next_id'] if result else 1
-        
-        # Insert new license
-        query_oracle(f"""
-            INSERT INTO "{schema}".LICENSES (
-                LIC_ID,
-                LIC_NAME,
-                LIC_STATE,
-                LIC_TYPE,
-                LIC_NO,
-                ASCEM_NO,
-                FIRST_ISSUE_DATE,
-                EXPIRATION_DATE,
-                LIC_NOTIFY_NAMES,
-                LIC_COMMENTS,
-                EMAIL_ENABLED
-            ) VALUES (
-                :lic_id,
-                :lic_name,
-                :lic_state,
-                :lic_type,
-                :lic_no,
-                :ascem_no,
-                CASE WHEN :first_issue_date IS NOT NULL THEN TO_DATE(:first_issue_date, 'YYYY-MM-DD') ELSE NULL END,
-                CASE WHEN :expiration_date IS NOT NULL THEN TO_DATE(:expiration_date, 'YYYY-MM-DD') ELSE NULL END,
-                :lic_notify_names,
-                :lic_comments,
-                1
-            )
-        """, {
-            'lic_id': next_id,
-            'lic_name': data.get('lic_name'),
-            'lic_state': data.get('lic_state'),
-            'lic_type': data.get('lic_type'),
-            'lic_no': data.get('lic_no'),
-            'ascem_no': data.get('ascem_no'),
-            'first_issue_date': data.get('first_issue_date'),
-            'expiration_date': data.get('expiration_date'),
-            'lic_notify_names': data.get('lic_notify_names'),
-            'lic_comments': data.get('lic_comments')
-        })
+        # Insert the license and schedule its first reminder in one transaction.
+        # LIC_ID is allocated by LICENSES_ID_SEQ (the column default).
+        with UnitOfWork() as uow:
+            new_id = uow.cursor.var(int)
+            uow.execute(f"""
+                INSERT INTO "{schema}".LICENSES (
+                    LIC_NAME,
+                    LIC_STATE,
+                    LIC_TYPE,
+                    LIC_NO,
+                    ASCEM_NO,
+                    FIRST_ISSUE_DATE,
+                    EXPIRATION_DATE,
+                    LIC_NOTIFY_NAMES,
+                    LIC_COMMENTS,
+                    EMAIL_ENABLED,
+                    CREATED_AT,
+                    UPDATED_AT
+                ) VALUES (
+                    :lic_name,
+                    :lic_state,
+                    :lic_type,
+                    :lic_no,
+                    :ascem_no,
+                    CASE WHEN :first_issue_date IS NOT NULL THEN TO_DATE(:first_issue_date, 'YYYY-MM-DD') ELSE NULL END,
+                    CASE WHEN :expiration_date IS NOT NULL THEN TO_DATE(:expiration_date, 'YYYY-MM-DD') ELSE NULL END,
+                    :lic_notify_names,
+                    :lic_comments,
+                    1,
+                    SYSDATE,
+                    SYSDATE
+                ) RETURNING LIC_ID INTO :new_id
+            """, {
+                'lic_name': data.get('lic_name'),
+                'lic_state': data.get('lic_state'),
+                'lic_type': data.get('lic_type'),
+                'lic_no': data.get('lic_no'),
+                'ascem_no': data.get('ascem_no'),
+                'first_issue_date': data.get('first_issue_date'),
+                'expiration_date': data.get('expiration_date'),
+                'lic_notify_names': data.get('lic_notify_names'),
+                'lic_comments': data.get('lic_comments'),
+                'new_id': new_id
+            })
+            # DML RETURNING yields one value per inserted row
+            next_id = new_id.getvalue()[0]
+            refresh_next_reminder(next_id, uow)
         
+        invalidate_caches()
         return jsonify({'success': True, 'id': next_id})
         
     except Exception as e:
@@ -825,27 +1671,32 @@ def api_license(license_id):
     
     if request.method == 'GET':
         try:
-            result = query_oracle(f"""
-                SELECT 
-                    LIC_ID,
-                    LIC_NAME,
-                    LIC_STATE,
-                    LIC_TYPE,
-                    LIC_NO,
-                    ASCEM_NO,
-                    FIRST_ISSUE_DATE,
-                    EXPIRATION_DATE,
-                    LIC_NOTIFY_NAMES,
-                    LIC_COMMENTS,
-                    EMAIL_ENABLED
-                FROM "{schema}".LICENSES
-                WHERE LIC_ID = :id
-            """, {'id': license_id})
+            def build_response():
+                result = query_oracle(f"""
+                    SELECT 
+                        LIC_ID,
+                        LIC_NAME,
+                        LIC_STATE,
+                        LIC_TYPE,
+                        LIC_NO,
+                        ASCEM_NO,
+                        FIRST_ISSUE_DATE,
+                        EXPIRATION_DATE,
+                        LIC_NOTIFY_NAMES,
+                        LIC_COMMENTS,
+                        EMAIL_ENABLED
+                    FROM "{schema}".LICENSES
+                    WHERE LIC_ID = :id
+                """, {'id': license_id})
+                
+                if result:
+                    return jsonify(result[0])
+                else:
+                    response = jsonify({'error': 'License not found'})
+                    response.status_code = 404
+                    return response
             
-            if result:
-                return jsonify(result[0])
-            else:
-                return jsonify({'error': 'License not found'}), 404
+            return conditional_response(build_response)
                 
         except Exception as e:
             logger.error(f"API get license error: {e}")
@@ -855,31 +1706,37 @@ def api_license(license_id):
         try:
             data = request.get_json()
             
-            affected = query_oracle(f"""
-                UPDATE "{schema}".LICENSES
-                SET LIC_NAME = :lic_name,
-                    LIC_STATE = :lic_state,
-                    LIC_TYPE = :lic_type,
-                    LIC_NO = :lic_no,
-                    ASCEM_NO = :ascem_no,
-                    FIRST_ISSUE_DATE = CASE WHEN :first_issue_date IS NOT NULL THEN TO_DATE(:first_issue_date, 'YYYY-MM-DD') ELSE NULL END,
-                    EXPIRATION_DATE = CASE WHEN :expiration_date IS NOT NULL THEN TO_DATE(:expiration_date, 'YYYY-MM-DD') ELSE NULL END,
-                    LIC_NOTIFY_NAMES = :lic_notify_names,
-                    LIC_COMMENTS = :lic_comments
-                WHERE LIC_ID = :id
-            """, {
-                'lic_name': data.get('lic_name'),
-                'lic_state': data.get('lic_state'),
-                'lic_type': data.get('lic_type'),
-                'lic_no': data.get('lic_no'),
-                'ascem_no': data.get('ascem_no'),
-                'first_issue_date': data.get('first_issue_date'),
-                'expiration_date': data.get('expiration_date'),
-                'lic_notify_names': data.get('lic_notify_names'),
-                'lic_comments': data.get('lic_comments'),
-                'id': license_id
-            })
+            # Update the license and reschedule its next reminder in one transaction
+            with UnitOfWork() as uow:
+                affected = uow.execute(f"""
+                    UPDATE "{schema}".LICENSES
+                    SET LIC_NAME = :lic_name,
+                        LIC_STATE = :lic_state,
+                        LIC_TYPE = :lic_type,
+                        LIC_NO = :lic_no,
+                        ASCEM_NO = :ascem_no,
+                        FIRST_ISSUE_DATE = CASE WHEN :first_issue_date IS NOT NULL THEN TO_DATE(:first_issue_date, 'YYYY-MM-DD') ELSE NULL END,
+                        EXPIRATION_DATE = CASE WHEN :expiration_date IS NOT NULL THEN TO_DATE(:expiration_date, 'YYYY-MM-DD') ELSE NULL END,
+                        LIC_NOTIFY_NAMES = :lic_notify_names,
+                        LIC_COMMENTS = :lic_comments,
+                        ROW_HASH = NULL,
+                        UPDATED_AT = SYSDATE
+                    WHERE LIC_ID = :id
+                """, {
+                    'lic_name': data.get('lic_name'),
+                    'lic_state': data.get('lic_state'),
+                    'lic_type': data.get('lic_type'),
+                    'lic_no': data.get('lic_no'),
+                    'ascem_no': data.get('ascem_no'),
+                    'first_issue_date': data.get('first_issue_date'),
+                    'expiration_date': data.get('expiration_date'),
+                    'lic_notify_names': data.get('lic_notify_names'),
+                    'lic_comments': data.get('lic_comments'),
+                    'id': license_id
+                })
+                refresh_next_reminder(license_id, uow)
             
+            invalidate_caches()
             return jsonify({'success': True, 'affected': affected})
             
         except Exception as e:
@@ -888,18 +1745,24 @@ def api_license(license_id):
     
     elif request.method == 'DELETE':
         try:
-            # Delete related reminders first
-            query_oracle(f"""
-                DELETE FROM "{schema}".EMAIL_REMINDERS
-                WHERE LICENSE_ID = :id
-            """, {'id': license_id})
-            
-            # Delete the license
-            affected = query_oracle(f"""
-                DELETE FROM "{schema}".LICENSES
-                WHERE LIC_ID = :id
-            """, {'id': license_id})
+            with UnitOfWork() as uow:
+                # Delete related reminders and queued emails first
+                uow.execute(f"""
+                    DELETE FROM "{schema}".EMAIL_REMINDERS
+                    WHERE LICENSE_ID = :id
+                """, {'id': license_id})
+                uow.execute(f"""
+                    DELETE FROM "{schema}".EMAIL_OUTBOX
+                    WHERE LICENSE_ID = :id
+                """, {'id': license_id})
+                
+                # Delete the license
+                affected = uow.execute(f"""
+                    DELETE FROM "{schema}".LICENSES
+                    WHERE LIC_ID = :id
+                """, {'id': license_id})
             
+            invalidate_caches()
             return jsonify({'success': True, 'affected': affected})
             
         except Exception as e:
@@ -913,16 +1776,19 @@ def api_license_types():
     try:
         schema = ORACLE_CONFIG['schema']
         
-        types = query_oracle(f"""
-            SELECT DISTINCT LIC_TYPE 
-            FROM "{schema}".LICENSES 
-            WHERE LIC_TYPE IS NOT NULL
-            ORDER BY LIC_TYPE
-        """)
+        def build_response():
+            types = query_oracle(f"""
+                SELECT DISTINCT LIC_TYPE 
+                FROM "{schema}".LICENSES 
+                WHERE LIC_TYPE IS NOT NULL
+                ORDER BY LIC_TYPE
+            """)
+            
+            # Extract just the type values
+            type_list = [t['lic_type'] for t in types if t['lic_type']]
+            return jsonify(type_list)
         
-        # Extract just the type values
-        type_list = [t['lic_type'] for t in types if t['lic_type']]
-        return jsonify(type_list)
+        return conditional_response(build_response)
     except Exception as e:
         logger.error(f"API license types error: {e}")
         return jsonify({'error': str(e)}), 500
@@ -934,16 +1800,19 @@ def api_license_states():
     try:
         schema = ORACLE_CONFIG['schema']
         
-        states = query_oracle(f"""
-            SELECT DISTINCT LIC_STATE 
-            FROM "{schema}".LICENSES 
-            WHERE LIC_STATE IS NOT NULL
-            ORDER BY LIC_STATE
-        """)
+        def build_response():
+            states = query_oracle(f"""
+                SELECT DISTINCT LIC_STATE 
+                FROM "{schema}".LICENSES 
+                WHERE LIC_STATE IS NOT NULL
+                ORDER BY LIC_STATE
+            """)
+            
+            # Extract just the state values
+            state_list = [s['lic_state'] for s in states if s['lic_state']]
+            return jsonify(state_list)
         
-        # Extract just the state values
-        state_list = [s['lic_state'] for s in states if s['lic_state']]
-        return jsonify(state_list)
+        return conditional_response(build_response)
     except Exception as e:
         logger.error(f"API license states error: {e}")
         return jsonify({'error': str(e)}), 500
@@ -955,26 +1824,31 @@ def api_toggle_emails(license_id):
     try:
         schema = ORACLE_CONFIG['schema']
         
-        # Check if license exists and get current email status
-        license = query_oracle(f"""
-            SELECT LIC_ID, LIC_NAME, EMAIL_ENABLED
-            FROM "{schema}".LICENSES
-            WHERE LIC_ID = :id
-        """, {'id': license_id})
-        
-        if not license:
-            return jsonify({'error': 'License not found'}), 404
-        
-        # Toggle the email_enabled status (default to true if not set)
-        current_status = license[0].get('email_enabled', 1)
-        new_status = 0 if current_status else 1
+        with UnitOfWork() as uow:
+            # Check if license exists and get current email status (locked until commit)
+            license = uow.query(f"""
+                SELECT LIC_ID, LIC_NAME, EMAIL_ENABLED
+                FROM "{schema}".LICENSES
+                WHERE LIC_ID = :id
+                FOR UPDATE
+            """, {'id': license_id})
+            
+            if not license:
+                return jsonify({'error': 'License not found'}), 404
+            
+            # Toggle the email_enabled status (default to true if not set)
+            current_status = license[0].get('email_enabled', 1)
+            new_status = 0 if current_status else 1
+            
+            # Update the license
+            uow.execute(f"""
+                UPDATE "{schema}".LICENSES
+                SET EMAIL_ENABLED = :status,
+                    UPDATED_AT = SYSDATE
+                WHERE LIC_ID = :id
+            """, {'status': new_status, 'id': license_id})
         
-        # Update the license
-        query_oracle(f"""
-            UPDATE "{schema}".LICENSES
-            SET EMAIL_ENABLED = :status
-            WHERE LIC_ID = :id
-        """, {'status': new_status, 'id': license_id})
+        invalidate_caches()
         
         status_text = "enabled" if new_status else "disabled"
         return jsonify({
@@ -988,6 +1862,124 @@ def api_toggle_emails(license_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/licenses/bulk', methods=['POST'])
+def api_bulk_licenses():
+    """API endpoint to delete, toggle emails for, or patch many licenses at once
+
+    Body: {"ids": [...], "operation": "delete" | "toggle_emails" |
+    "set_email_enabled" | "patch", "email_enabled": bool, "fields": {...}}.
+    Each statement is sent once with an array of binds and the whole
+    request commits or rolls back as one transaction.
+    """
+    try:
+        schema = ORACLE_CONFIG['schema']
+        data = request.get_json(silent=True) or {}
+        operation = data.get('operation')
+
+        try:
+            ids = sorted({int(i) for i in data.get('ids') or []})
+        except (TypeError, ValueError):
+            return jsonify({'error': 'ids must be a list of license IDs'}), 400
+        if not ids:
+            return jsonify({'error': 'No license IDs given'}), 400
+        if len(ids) > BULK_MAX_IDS:
+            return jsonify({'error': f'At most {BULK_MAX_IDS} licenses per request'}), 400
+
+        id_rows = [{'id': lic_id} for lic_id in ids]
+
+        with UnitOfWork() as uow:
+            if operation == 'delete':
+                # Delete related reminders and queued emails first
+                uow.executemany(f"""
+                    DELETE FROM "{schema}".EMAIL_REMINDERS
+                    WHERE LICENSE_ID = :id
+                """, id_rows)
+                uow.executemany(f"""
+                    DELETE FROM "{schema}".EMAIL_OUTBOX
+                    WHERE LICENSE_ID = :id
+                """, id_rows)
+                counts = uow.executemany(f"""
+                    DELETE FROM "{schema}".LICENSES
+                    WHERE LIC_ID = :id
+                """, id_rows)
+
+            elif operation == 'toggle_emails':
+                # Unset EMAIL_ENABLED counts as enabled, as in the reminder checks
+                counts = uow.executemany(f"""
+                    UPDATE "{schema}".LICENSES
+                    SET EMAIL_ENABLED = CASE WHEN NVL(EMAIL_ENABLED, 1) = 1 THEN 0 ELSE 1 END,
+                        UPDATED_AT = SYSDATE
+                    WHERE LIC_ID = :id
+                """, id_rows)
+
+            elif operation == 'set_email_enabled':
+                if not isinstance(data.get('email_enabled'), bool):
+                    return jsonify({'error': 'email_enabled must be true or false'}), 400
+                status = 1 if data['email_enabled'] else 0
+                counts = uow.executemany(f"""
+                    UPDATE "{schema}".LICENSES
+                    SET EMAIL_ENABLED = :status,
+                        UPDATED_AT = SYSDATE
+                    WHERE LIC_ID = :id
+                """, [{'id': lic_id, 'status': status} for lic_id in ids])
+
+            elif operation == 'patch':
+                fields = data.get('fields') or {}
+                unknown = sorted(set(fields) - set(BULK_PATCH_FIELDS))
+                if not fields or unknown:
+                    return jsonify({
+                        'error': 'fields must set one or more of: ' + ', '.join(BULK_PATCH_FIELDS),
+                        'unknown_fields': unknown
+                    }), 400
+
+                assignments = []
+                for field in fields:
+                    if field in BULK_DATE_FIELDS:
+                        assignments.append(
+                            f"{BULK_PATCH_FIELDS[field]} = CASE WHEN :{field} IS NOT NULL "
+                            f"THEN TO_DATE(:{field}, 'YYYY-MM-DD') ELSE NULL END"
+                        )
+                    else:
+                        assignments.append(f"{BULK_PATCH_FIELDS[field]} = :{field}")
+
+                # Edited Excel columns no longer match the imported row hash
+                if set(fields) - {'lic_comments'}:
+                    assignments.append("ROW_HASH = NULL")
+
+                counts = uow.executemany(f"""
+                    UPDATE "{schema}".LICENSES
+                    SET {', '.join(assignments)},
+                        UPDATED_AT = SYSDATE
+                    WHERE LIC_ID = :id
+                """, [dict(fields, id=lic_id) for lic_id in ids])
+
+                # A new expiration date moves the reminder schedule
+                if 'expiration_date' in fields:
+                    uow.executemany(
+                        next_reminder_update_sql(schema, where='l.LIC_ID = :lic_id'),
+                        [{'lic_id': lic_id} for lic_id in ids]
+                    )
+
+            else:
+                return jsonify({
+                    'error': 'operation must be one of: delete, toggle_emails, set_email_enabled, patch'
+                }), 400
+
+        invalidate_caches()
+
+        not_found = [lic_id for lic_id, count in zip(ids, counts) if not count]
+        return jsonify({
+            'success': True,
+            'operation': operation,
+            'affected': sum(counts),
+            'not_found': not_found
+        })
+
+    except Exception as e:
+        logger.error(f"API bulk licenses error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/cron/check-reminders')
 def cron_check_reminders():
     """
@@ -1005,94 +1997,14 @@ def cron_check_reminders():
         logger.info("Starting automatic reminder check...")
         schema = ORACLE_CONFIG['schema']
         
-        # Get licenses that need reminders today
-        licenses = query_oracle(f"""
-            SELECT 
-                l.LIC_ID as id,
-                l.LIC_NAME as lic_name,
-                l.LIC_TYPE as lic_type,
-                l.LIC_STATE as lic_state,
-                l.LIC_NO as lic_no,
-                l.EXPIRATION_DATE as expiration_date,
-                l.LIC_NOTIFY_NAMES as lic_notify_names,
-                TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration
-            FROM "{schema}".LICENSES l
-            WHERE l.EXPIRATION_DATE IS NOT NULL
-            AND l.LIC_NOTIFY_NAMES IS NOT NULL
-            AND NVL(l.EMAIL_ENABLED, 1) = 1
-            AND (
-                -- 30-day reminder
-                (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 30 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '30_days'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
-                ))
-                -- 15-day reminder
-                OR (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 15 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '15_days'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
-                ))
-                -- 10-day reminder
-                OR (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 10 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '10_days'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
-                ))
-                -- 7-day critical reminder
-                OR (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 7 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '7_days'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 1
-                ))
-                -- 1-day urgent reminder
-                OR (TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) = 1 AND NOT EXISTS (
-                    SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
-                    WHERE er.LICENSE_ID = l.LIC_ID
-                    AND er.REMINDER_TYPE = '1_day'
-                    AND TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 1
-                ))
-            )
-        """)
-        
-        if not licenses:
-            logger.info("No licenses need reminders today")
-            return jsonify({
-                'success': True,
-                'message': 'No licenses need reminders',
-                'checked_at': datetime.now().isoformat(),
-                'licenses_checked': 0,
-                'emails_sent': 0,
-                'emails_failed': 0
-            })
-        
-        sent_count = 0
-        failed_count = 0
+        # Get licenses whose next reminder is due today
+        licenses = get_due_reminders()
+        sender_email = os.getenv('SENDER_EMAIL', os.getenv('SMTP_USERNAME'))
         
-        # Process each license
-        for license in licenses:
-            # Use same email sending logic as manual send
+        # Render one license's reminder for the outbox
+        def render_license_reminder(license):
             days_left = license.get('days_until_expiration', 0)
             
-            # Determine reminder type
-            if days_left == 1:
-                reminder_type = '1_day'
-            elif days_left == 7:
-                reminder_type = '7_days'
-            elif days_left == 10:
-                reminder_type = '10_days'
-            elif days_left == 15:
-                reminder_type = '15_days'
-            elif days_left == 30:
-                reminder_type = '30_days'
-            else:
-                reminder_type = 'custom'
-            
-            # Send email using existing logic
             email_to = license.get('lic_notify_names') or ''
             email_to = email_to.strip() if email_to else ''
             if not email_to:
@@ -1118,77 +2030,34 @@ Best regards,
 {COMPANY_INFO['website']}
             """
             
-            # Try to send email
-            email_status = 'failed'
-            smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-            smtp_port = int(os.getenv('SMTP_PORT', 587))
-            smtp_username = os.getenv('SMTP_USERNAME')
-            smtp_password = os.getenv('SMTP_PASSWORD')
-            sender_email = os.getenv('SENDER_EMAIL', smtp_username)
-            
-            try:
-                if smtp_username and smtp_password:
-                    msg = MIMEMultipart()
-                    msg['From'] = sender_email
-                    msg['To'] = email_to
-                    msg['Subject'] = email_subject
-                    msg.attach(MIMEText(email_body, 'plain'))
-                    
-                    with smtplib.SMTP(smtp_server, smtp_port) as server:
-                        server.starttls()
-                        server.login(smtp_username, smtp_password)
-                        server.send_message(msg)
-                    
-                    email_status = 'sent'
-                    sent_count += 1
-                    logger.info(f"Cron: Email sent for license {license['id']}")
-                else:
-                    failed_count += 1
-                    logger.warning(f"Cron: SMTP not configured for license {license['id']}")
-            except Exception as e:
-                failed_count += 1
-                logger.error(f"Cron: Failed to send email for license {license['id']}: {e}")
-            
-            # Log to EMAIL_REMINDERS table
-            try:
-                query_oracle(f"""
-                    INSERT INTO "{schema}".EMAIL_REMINDERS (
-                        LICENSE_ID,
-                        REMINDER_TYPE,
-                        EMAIL_TO,
-                        EMAIL_SUBJECT,
-                        EMAIL_BODY,
-                        STATUS,
-                        SENT_DATE
-                    ) VALUES (
-                        :license_id,
-                        :reminder_type,
-                        :email_to,
-                        :email_subject,
-                        :email_body,
-                        :status,
-                        SYSDATE
-                    )
-                """, {
-                    'license_id': license['id'],
-                    'reminder_type': reminder_type,
-                    'email_to': email_to,
-                    'email_subject': email_subject,
-                    'email_body': email_body,
-                    'status': email_status
-                })
-            except Exception as e:
-                logger.error(f"Cron: Failed to log email history: {e}")
-        
-        logger.info(f"Cron job complete: {sent_count} sent, {failed_count} failed")
+            # Reminder type and date were stored with the due date
+            return {
+                'license_id': license['id'],
+                'reminder_type': license['reminder_type'],
+                'reminder_date': license['reminder_date'],
+                'email_from': sender_email,
+                'email_to': email_to,
+                'email_subject': email_subject,
+                'email_body': email_body,
+                'body_type': 'plain'
+            }
+        
+        # Queue every due reminder in one bulk insert, then send as many queued
+        # messages as fit in this run; /api/cron/drain-outbox sends the rest
+        queued = enqueue_reminders([render_license_reminder(license) for license in licenses])
+        totals = run_outbox_drain() or {}
+        
+        logger.info(f"Cron job complete: {len(licenses)} due, {queued} queued, "
+                    f"{totals.get('sent', 0)} sent, {totals.get('failed', 0)} failed")
         
         return jsonify({
             'success': True,
             'message': f'Processed {len(licenses)} licenses',
             'checked_at': datetime.now().isoformat(),
             'licenses_checked': len(licenses),
-            'emails_sent': sent_count,
-            'emails_failed': failed_count
+            'emails_queued': queued,
+            'emails_sent': totals.get('sent', 0),
+            'emails_failed': totals.get('failed', 0)
         })
         
     except Exception as e:
@@ -1200,6 +2069,40 @@ Best regards,
         }), 500
 
 
+@app.route('/api/cron/drain-outbox')
+def cron_drain_outbox():
+    """
+    Cron job endpoint that sends reminders still queued in EMAIL_OUTBOX
+    Safe to run from several invocations at once: each claims different rows
+    """
+    try:
+        cron_secret = os.getenv('CRON_SECRET')
+        if cron_secret:
+            request_secret = request.headers.get('Authorization')
+            if request_secret != f"Bearer {cron_secret}":
+                return jsonify({'error': 'Unauthorized'}), 401
+        
+        totals = run_outbox_drain()
+        if totals is None:
+            return jsonify({'success': False, 'error': 'SMTP not configured'}), 503
+        
+        return jsonify({
+            'success': True,
+            'checked_at': datetime.now().isoformat(),
+            'emails_sent': totals['sent'],
+            'emails_failed': totals['failed'],
+            'emails_retrying': totals['pending']
+        })
+        
+    except Exception as e:
+        logger.error(f"Outbox drain error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'checked_at': datetime.now().isoformat()
+        }), 500
+
+
 @app.route('/api/send-reminders', methods=['POST'])
 def api_send_reminders():
     """API endpoint to send email reminders for selected licenses"""
@@ -1211,8 +2114,6 @@ def api_send_reminders():
             return jsonify({'error': 'No licenses selected'}), 400
         
         schema = ORACLE_CONFIG['schema']
-        sent_count = 0
-        failed_count = 0
         
         # Get SMTP configuration
         smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
@@ -1239,7 +2140,12 @@ def api_send_reminders():
             WHERE LIC_ID IN ({placeholders})
         """, params)
         
-        for license in licenses:
+        # Parallel SMTP sessions for the whole batch; results are logged in batches
+        pool = SMTPSenderPool(smtp_server, smtp_port, smtp_username, smtp_password)
+        email_log = reminder_log()
+        
+        # Send and log one license (runs on the pool's worker threads)
+        def send_license_reminder(license):
             # Determine reminder type based on days until expiration
             days_left = license.get('days_until_expiration', 0)
             if days_left <= 10:
@@ -1289,44 +2195,20 @@ Best regards,
                     msg['Subject'] = email_subject
                     msg.attach(MIMEText(email_body, 'plain'))
                     
-                    with smtplib.SMTP(smtp_server, smtp_port) as server:
-                        server.starttls()
-                        server.login(smtp_username, smtp_password)
-                        server.send_message(msg)
+                    pool.send(msg)
                     
                     email_status = 'sent'
-                    sent_count += 1
                     logger.info(f"Email sent successfully for license {license['id']}")
                 else:
                     # SMTP not configured, but we'll still log it
                     logger.warning(f"SMTP not configured, marking email as failed for license {license['id']}")
-                    failed_count += 1
                     
             except Exception as e:
                 logger.error(f"Failed to send email for license {license['id']}: {e}")
-                failed_count += 1
             
             # Always log to EMAIL_REMINDERS table regardless of success/failure
             try:
-                query_oracle(f"""
-                    INSERT INTO "{schema}".EMAIL_REMINDERS (
-                        LICENSE_ID,
-                        REMINDER_TYPE,
-                        EMAIL_TO,
-                        EMAIL_SUBJECT,
-                        EMAIL_BODY,
-                        STATUS,
-                        SENT_DATE
-                    ) VALUES (
-                        :license_id,
-                        :reminder_type,
-                        :email_to,
-                        :email_subject,
-                        :email_body,
-                        :status,
-                        SYSDATE
-                    )
-                """, {
+                email_log.add({
                     'license_id': license['id'],
                     'reminder_type': reminder_type,
                     'email_to': email_to,
@@ -1334,9 +2216,25 @@ Best regards,
                     'email_body': email_body,
                     'status': email_status
                 })
-                logger.info(f"Email history logged for license {license['id']} with status: {email_status}")
             except Exception as e:
-                logger.error(f"Failed to log email history for license {license['id']}: {e}")
+                logger.error(f"Failed to log email history: {e}")
+            
+            return email_status == 'sent'
+        
+        # Each batch is logged before the next one is sent
+        results = []
+        with pool, email_log:
+            for start in range(0, len(licenses), REMINDER_LOG_FLUSH_SIZE):
+                batch = licenses[start:start + REMINDER_LOG_FLUSH_SIZE]
+                results.extend(pool.map(send_license_reminder, batch))
+                email_log.flush()
+        logger.info(f"Email history logged for {email_log.written} licenses "
+                    f"in {email_log.flushes} batch(es)")
+        
+        sent_count = sum(results)
+        failed_count = len(results) - sent_count
+        
+        invalidate_caches()
         
         return jsonify({
             'success': True,
@@ -1398,7 +2296,7 @@ def main():
     logger.info(f"Oracle Schema: {ORACLE_CONFIG['schema']}")
     
     try:
-        # Test Oracle connection
+        # Test Oracle connection (also warms up the pool)
         conn = get_oracle_connection()
         conn.close()
         logger.info("✓ Oracle connection successful")
@@ -0,0 +1,287 @@
+"""
+Reusable SMTP transport for reminder batches
+Shared by the web app, the cron job and the CLI reminder systems
+"""
+
+import os
+import time
+import smtplib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Messages sent over one session before reconnecting (many relays cap this)
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', 100))
+SMTP_TIMEOUT = int(os.getenv('SMTP_TIMEOUT', 30))
+
+# Parallel sending (SMTPSenderPool)
+SMTP_WORKERS = int(os.getenv('SMTP_WORKERS', 4))
+# Messages per second across all workers of a pool (0 = unlimited)
+SMTP_RATE_LIMIT = float(os.getenv('SMTP_RATE_LIMIT', 5))
+# Open sessions allowed to one relay from this process
+SMTP_MAX_CONNECTIONS_PER_RELAY = int(os.getenv('SMTP_MAX_CONNECTIONS_PER_RELAY', 4))
+# Retries after a 4xx (try again later) reply, waiting SMTP_BACKOFF_SECONDS, then double
+SMTP_MAX_RETRIES = int(os.getenv('SMTP_MAX_RETRIES', 3))
+SMTP_BACKOFF_SECONDS = float(os.getenv('SMTP_BACKOFF_SECONDS', 2))
+
+# Connection slots per (host, port), shared by every pool in the process
+_relay_slots = {}
+_relay_slots_lock = threading.Lock()
+
+
+def is_connection_error(error):
+    """True if a send failed because the session is gone, not because of the message"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        # 421: the server is closing the connection
+        return error.smtp_code == 421
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+def is_throttling_error(error):
+    """True for 4xx replies, where the relay asks us to slow down and try again later"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+
+def get_relay_slots(host, port, limit=SMTP_MAX_CONNECTIONS_PER_RELAY):
+    """Semaphore bounding the open sessions to one relay"""
+    with _relay_slots_lock:
+        key = (host, port)
+        if key not in _relay_slots:
+            _relay_slots[key] = threading.BoundedSemaphore(limit)
+        return _relay_slots[key]
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` acquisitions per second.
+
+    slow_down() halves the rate after a throttling reply and speed_up()
+    wins it back a step per successful send, so a pool settles just under
+    whatever the relay will accept.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = rate / 16
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        if self.max_rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def speed_up(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def within(self, seconds):
+        """Acquisitions that fit in `seconds` at the current rate (None when unlimited)"""
+        if self.max_rate <= 0:
+            return None
+        with self.lock:
+            return int(max(0, seconds) * self.rate)
+
+
+class SMTPTransport:
+    """One authenticated SMTP session reused for many messages.
+
+    The session is opened on the first send and kept until close(). It is
+    reopened after max_messages sends, or once when a send fails because the
+    connection dropped; message-level errors such as refused recipients are
+    raised to the caller. Use as a context manager around a batch:
+
+        with SMTPTransport(server, port, username, password) as transport:
+            for msg in messages:
+                transport.send(msg)
+    """
+
+    def __init__(self, host, port, username, password,
+                 max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION, timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.server = None
+        self.sent_on_connection = 0
+        self.connections = 0
+        self.messages_sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def connect(self):
+        """Open a new session: connect, STARTTLS and log in"""
+        self.close()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.starttls()
+            server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.sent_on_connection = 0
+        self.connections += 1
+
+    def close(self):
+        """End the session if one is open"""
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        finally:
+            self.server = None
+
+    def send(self, msg, from_addr=None, to_addrs=None):
+        """Send an email.message.Message over the shared session"""
+        if self.server is None or self.sent_on_connection >= self.max_messages:
+            self.connect()
+
+        try:
+            self.server.send_message(msg, from_addr, to_addrs)
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            logger.info(f"SMTP connection lost ({e}); reconnecting")
+            self.connect()
+            self.server.send_message(msg, from_addr, to_addrs)
+
+        self.sent_on_connection += 1
+        self.messages_sent += 1
+
+
+class SMTPSenderPool:
+    """Send a reminder batch over several SMTP sessions in parallel.
+
+    map() runs a per-item function on up to `workers` threads; inside it,
+    send() delivers over that thread's own SMTPTransport. Sends from all
+    threads share one TokenBucket, and each session holds one of the
+    relay's connection slots until close(). A 4xx reply slows the bucket
+    down and the message is retried with exponential backoff:
+
+        with SMTPSenderPool(server, port, username, password) as pool:
+            results = list(pool.map(send_reminder, licenses))
+    """
+
+    def __init__(self, host, port, username, password, workers=SMTP_WORKERS,
+                 rate=SMTP_RATE_LIMIT, relay_limit=SMTP_MAX_CONNECTIONS_PER_RELAY,
+                 max_retries=SMTP_MAX_RETRIES, backoff=SMTP_BACKOFF_SECONDS):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        # More workers than relay slots would leave threads waiting on each other
+        self.workers = max(1, min(workers, relay_limit))
+        self.relay_slots = get_relay_slots(host, port, relay_limit)
+        self.bucket = TokenBucket(rate, capacity=self.workers)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.executor = None
+        self.local = threading.local()
+        self.transports = []
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages_sent = 0
+        self.throttled = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def sends_within(self, seconds):
+        """Messages the rate limit lets through in `seconds` (None when unlimited)"""
+        return self.bucket.within(seconds)
+
+    def map(self, func, items):
+        """Run func over items on the worker threads; results come back in order"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='smtp-sender')
+        return self.executor.map(func, items)
+
+    def transport(self):
+        """The calling thread's SMTP session, taking a relay slot the first time"""
+        transport = getattr(self.local, 'transport', None)
+        if transport is None:
+            self.relay_slots.acquire()
+            transport = SMTPTransport(self.host, self.port, self.username, self.password)
+            self.local.transport = transport
+            with self.lock:
+                self.transports.append(transport)
+        return transport
+
+    def send(self, msg, from_addr=None, to_addrs=None):
+        """Send an email.message.Message, backing off and retrying on 4xx replies"""
+        transport = self.transport()
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                transport.send(msg, from_addr, to_addrs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_throttling_error(e):
+                    raise
+                self.bucket.slow_down()
+                delay = self.backoff * 2 ** attempt
+                attempt += 1
+                with self.lock:
+                    self.throttled += 1
+                logger.warning(f"SMTP relay throttled ({e}); retry {attempt} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self.bucket.speed_up()
+            return
+
+    def close(self):
+        """Wait for running work, then end every session and free its relay slot"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        with self.lock:
+            transports, self.transports = self.transports, []
+        for transport in transports:
+            transport.close()
+            self.relay_slots.release()
+            self.connections += transport.connections
+            self.messages_sent += transport.messages_sent
+        # Threads that outlive this batch must not reuse a closed session's slot
+        self.local = threading.local()
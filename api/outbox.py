@@ -0,0 +1,405 @@
+"""
+Durable email outbox for reminder delivery
+Selection enqueues rendered reminders in EMAIL_OUTBOX; drain workers (the cron
+routes and the Oracle CLI) claim rows with FOR UPDATE SKIP LOCKED, send them
+and record the result, so a run cut off partway leaves the rest queued
+"""
+
+import os
+import time
+import logging
+import oracledb
+from email.utils import getaddresses
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+from api.reminder_log import insert_reminder_rows
+
+logger = logging.getLogger(__name__)
+
+# Rows claimed per drain round (each round is sent in parallel by the SMTP pool)
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))
+# Send attempts before a message is marked failed, and the wait between attempts
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 3))
+OUTBOX_RETRY_SECONDS = int(os.getenv('OUTBOX_RETRY_SECONDS', 300))
+# A row left 'sending' this long belonged to a worker that died; it is claimed again
+OUTBOX_CLAIM_TIMEOUT = int(os.getenv('OUTBOX_CLAIM_TIMEOUT', 900))
+# Time a cron invocation spends draining. The cron functions get maxDuration 60 in
+# vercel.json; this plus one SMTP_TIMEOUT (a send started just before the deadline)
+# and the selection query must stay under it
+OUTBOX_DRAIN_SECONDS = int(os.getenv('OUTBOX_DRAIN_SECONDS', 25))
+
+# Digest mode: one email per recipient listing every license due for them
+EMAIL_DIGEST = os.getenv('EMAIL_DIGEST', 'False').lower() == 'true'
+# Rows claimed per round in digest mode (larger rounds collapse more reminders)
+OUTBOX_DIGEST_BATCH_SIZE = int(os.getenv('OUTBOX_DIGEST_BATCH_SIZE', 1000))
+COMPANY_NAME = os.getenv('COMPANY_NAME', 'MSMM Engineering')
+
+
+def enqueue_messages(cursor, schema, messages, table='LICENSES'):
+    """Queue rendered reminders in one array-DML round trip; returns the number added.
+
+    messages are dicts with license_id, reminder_type, reminder_date
+    ('YYYY-MM-DD', the NEXT_REMINDER_DATE being served), email_from,
+    email_to, email_subject, email_body and body_type ('plain' or 'html').
+    A reminder already queued for the same license, type and date is left
+    alone, so running selection again never queues a second copy; one that
+    was cancelled as stale is queued again with the new rendering. Each row
+    keeps the license's EXPIRATION_DATE as of queueing, so claim_messages
+    can tell when the body it was rendered with has gone stale.
+    """
+    if not messages:
+        return 0
+
+    cursor.setinputsizes(email_body=oracledb.DB_TYPE_CLOB)
+    cursor.executemany(f"""
+        MERGE INTO "{schema}".EMAIL_OUTBOX o
+        USING (
+            SELECT
+                :license_id AS LICENSE_ID,
+                :reminder_type AS REMINDER_TYPE,
+                TO_DATE(:reminder_date, 'YYYY-MM-DD') AS REMINDER_DATE,
+                (SELECT l.EXPIRATION_DATE FROM "{schema}".{table} l
+                 WHERE l.LIC_ID = :license_id) AS EXPIRATION_DATE
+            FROM DUAL
+        ) s
+        ON (
+            o.LICENSE_ID = s.LICENSE_ID
+            AND o.REMINDER_TYPE = s.REMINDER_TYPE
+            AND o.REMINDER_DATE = s.REMINDER_DATE
+        )
+        WHEN MATCHED THEN UPDATE SET
+            o.EXPIRATION_DATE = s.EXPIRATION_DATE,
+            o.EMAIL_FROM = :email_from,
+            o.EMAIL_TO = :email_to,
+            o.EMAIL_SUBJECT = :email_subject,
+            o.EMAIL_BODY = :email_body,
+            o.BODY_TYPE = :body_type,
+            o.STATUS = 'pending',
+            o.ATTEMPTS = 0,
+            o.AVAILABLE_AT = SYSTIMESTAMP,
+            o.CLAIMED_AT = NULL,
+            o.LAST_ERROR = NULL
+        WHERE o.STATUS = 'cancelled'
+        WHEN NOT MATCHED THEN INSERT (
+            LICENSE_ID, REMINDER_TYPE, REMINDER_DATE, EXPIRATION_DATE, EMAIL_FROM,
+            EMAIL_TO, EMAIL_SUBJECT, EMAIL_BODY, BODY_TYPE
+        ) VALUES (
+            s.LICENSE_ID, s.REMINDER_TYPE, s.REMINDER_DATE, s.EXPIRATION_DATE, :email_from,
+            :email_to, :email_subject, :email_body, :body_type
+        )
+    """, [
+        {
+            'license_id': message['license_id'],
+            'reminder_type': message['reminder_type'],
+            'reminder_date': message['reminder_date'],
+            'email_from': message['email_from'],
+            'email_to': message['email_to'],
+            'email_subject': message['email_subject'],
+            'email_body': message['email_body'],
+            'body_type': message.get('body_type', 'plain')
+        }
+        for message in messages
+    ], arraydmlrowcounts=True)
+    return sum(cursor.getarraydmlrowcounts())
+
+
+def claim_messages(cursor, schema, limit=OUTBOX_BATCH_SIZE, claim_timeout=OUTBOX_CLAIM_TIMEOUT,
+                   table='LICENSES'):
+    """Lock up to `limit` sendable rows, mark them 'sending' and return them.
+
+    Rows another worker holds are skipped instead of waited on. Run this in
+    its own short transaction: the commit releases the row locks, and the
+    'sending' status keeps other workers off the rows from then on. Each
+    row comes with its license's current details for digest rendering.
+    Queued rows that no longer match their license are marked 'cancelled'
+    instead of being sent: the license was deleted or had reminders switched
+    off, its NEXT_REMINDER_DATE / NEXT_REMINDER_TYPE moved on (an edit, a
+    renewal or a later offset superseded the queued reminder), or its
+    EXPIRATION_DATE changed, which makes the rendered body wrong.
+    """
+    cursor.execute(f"""
+        UPDATE "{schema}".EMAIL_OUTBOX o
+        SET STATUS = 'cancelled',
+            LAST_ERROR = 'License deleted, reminders disabled or reminder superseded'
+        WHERE o.STATUS IN ('pending', 'sending')
+        AND NOT EXISTS (
+            SELECT 1 FROM "{schema}".{table} l
+            WHERE l.LIC_ID = o.LICENSE_ID
+            AND NVL(l.EMAIL_ENABLED, 1) = 1
+            AND l.NEXT_REMINDER_DATE = o.REMINDER_DATE
+            AND l.NEXT_REMINDER_TYPE = o.REMINDER_TYPE
+            AND (o.EXPIRATION_DATE IS NULL OR l.EXPIRATION_DATE = o.EXPIRATION_DATE)
+        )
+        AND (o.STATUS = 'pending'
+             OR o.CLAIMED_AT < SYSTIMESTAMP - NUMTODSINTERVAL(:claim_timeout, 'SECOND'))
+    """, {'claim_timeout': claim_timeout})
+    if cursor.rowcount:
+        logger.info(f"Outbox: cancelled {cursor.rowcount} stale reminder(s) "
+                    f"(license deleted, disabled or rescheduled)")
+
+    # Only fetched rows are locked, so fetch exactly one batch
+    cursor.arraysize = limit
+    cursor.prefetchrows = limit
+    cursor.execute(f"""
+        SELECT o.ID, o.LICENSE_ID, o.REMINDER_TYPE, o.EMAIL_FROM, o.EMAIL_TO,
+               o.EMAIL_SUBJECT, o.EMAIL_BODY, o.BODY_TYPE, o.ATTEMPTS,
+               l.LIC_NAME, l.LIC_TYPE, l.LIC_STATE, l.LIC_NO,
+               TO_CHAR(l.EXPIRATION_DATE, 'YYYY-MM-DD') AS EXPIRATION_DATE,
+               TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) AS DAYS_UNTIL_EXPIRATION
+        FROM "{schema}".EMAIL_OUTBOX o
+        JOIN "{schema}".{table} l ON l.LIC_ID = o.LICENSE_ID
+        WHERE NVL(l.EMAIL_ENABLED, 1) = 1
+        AND ((o.STATUS = 'pending' AND o.AVAILABLE_AT <= SYSTIMESTAMP)
+             OR (o.STATUS = 'sending'
+                 AND o.CLAIMED_AT < SYSTIMESTAMP - NUMTODSINTERVAL(:claim_timeout, 'SECOND')))
+        ORDER BY o.ID
+        FOR UPDATE OF o.STATUS SKIP LOCKED
+    """, {'claim_timeout': claim_timeout})
+
+    columns = [col[0].lower() for col in cursor.description]
+    messages = []
+    for row in cursor.fetchmany(limit):
+        message = dict(zip(columns, row))
+        if hasattr(message['email_body'], 'read'):
+            message['email_body'] = message['email_body'].read()
+        message['attempts'] += 1
+        messages.append(message)
+
+    if messages:
+        cursor.executemany(f"""
+            UPDATE "{schema}".EMAIL_OUTBOX
+            SET STATUS = 'sending', CLAIMED_AT = SYSTIMESTAMP, ATTEMPTS = ATTEMPTS + 1
+            WHERE ID = :id
+        """, [{'id': message['id']} for message in messages])
+
+    return messages
+
+
+def delivery_status(message, error=None, max_attempts=OUTBOX_MAX_ATTEMPTS):
+    """New status of a claimed row after a send: 'sent', 'pending' (retry) or 'failed'"""
+    if error is None:
+        return 'sent'
+    if message['attempts'] >= max_attempts:
+        return 'failed'
+    return 'pending'
+
+
+def record_deliveries(cursor, schema, results, table='LICENSES',
+                      retry_seconds=OUTBOX_RETRY_SECONDS):
+    """Store the outcomes of a batch of sends with array-bound statements.
+
+    results are (message, error) pairs for claimed rows. Failed sends go back
+    to 'pending' until OUTBOX_MAX_ATTEMPTS is reached; the row's EMAIL_TO is
+    rewritten from the message, so a retry can go to just the recipients
+    that failed. Final outcomes ('sent' or 'failed') are also logged to
+    EMAIL_REMINDERS and their licenses' next reminders rescheduled, all in
+    the caller's transaction.
+    """
+    statuses = [delivery_status(message, error) for message, error in results]
+
+    cursor.executemany(f"""
+        UPDATE "{schema}".EMAIL_OUTBOX
+        SET STATUS = :status,
+            EMAIL_TO = :email_to,
+            SENT_AT = CASE WHEN :status = 'sent' THEN SYSTIMESTAMP END,
+            AVAILABLE_AT = SYSTIMESTAMP + NUMTODSINTERVAL(:retry_seconds * ATTEMPTS, 'SECOND'),
+            LAST_ERROR = :error
+        WHERE ID = :id
+    """, [
+        {
+            'status': status,
+            'email_to': message['email_to'],
+            'retry_seconds': retry_seconds,
+            'error': error[:1000] if error else None,
+            'id': message['id']
+        }
+        for (message, error), status in zip(results, statuses)
+    ])
+
+    insert_reminder_rows(cursor, schema, [
+        {
+            'license_id': message['license_id'],
+            'reminder_type': message['reminder_type'],
+            'email_to': message['email_to'],
+            'email_subject': message['email_subject'],
+            'email_body': message['email_body'],
+            'status': status
+        }
+        for (message, _), status in zip(results, statuses)
+        if status != 'pending'
+    ], table)
+
+
+def build_message(message):
+    """MIME message for a claimed outbox row"""
+    msg = MIMEMultipart('alternative' if message['body_type'] == 'html' else 'mixed')
+    msg['From'] = message['email_from']
+    msg['To'] = message['email_to']
+    msg['Subject'] = message['email_subject']
+    msg.attach(MIMEText(message['email_body'], message['body_type']))
+    return msg
+
+
+def group_by_recipient(messages):
+    """Map each normalized recipient address to the claimed rows addressed to it"""
+    groups = {}
+    for message in messages:
+        for _, address in getaddresses([(message['email_to'] or '').replace(';', ',')]):
+            address = address.strip().lower()
+            if address:
+                groups.setdefault(address, {})[message['id']] = message
+    return {address: list(rows.values()) for address, rows in groups.items()}
+
+
+def build_digest(address, messages):
+    """One email to `address` listing every license in `messages`, most urgent first.
+
+    A recipient with a single license gets that license's own message.
+    """
+    if len(messages) == 1:
+        msg = build_message(messages[0])
+        msg.replace_header('To', address)
+        return msg
+
+    def urgency(message):
+        days = message['days_until_expiration']
+        return (days if days is not None else float('inf'), message['lic_name'] or '')
+
+    lines = []
+    for message in sorted(messages, key=urgency):
+        days = message['days_until_expiration']
+        if days is None:
+            due = 'no expiration date on file'
+        elif days < 0:
+            due = f"expired {message['expiration_date']} ({-int(days)} days ago)"
+        else:
+            due = f"expires {message['expiration_date']} ({int(days)} days remaining)"
+        details = ', '.join(
+            str(value) for value in (message['lic_type'], message['lic_state'], message['lic_no'])
+            if value
+        )
+        lines.append(f"- {message['lic_name'] or message['license_id']}"
+                     f"{f' ({details})' if details else ''}: {due}")
+
+    body = f"""
+Dear License Administrator,
+
+This is an automated reminder that the following {len(messages)} licenses need attention, most urgent first:
+
+{chr(10).join(lines)}
+
+Please take appropriate action to renew these licenses before they expire.
+
+Best regards,
+{COMPANY_NAME}
+    """
+
+    msg = MIMEMultipart()
+    msg['From'] = messages[0]['email_from']
+    msg['To'] = address
+    msg['Subject'] = f"License Renewal Reminders: {len(messages)} licenses need attention"
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+def send_digests(pool, messages):
+    """Send one digest per recipient over `pool`; returns (message, error) pairs.
+
+    Delivery is tracked per row and recipient. A row is sent once all of its
+    recipients' digests went out. When only some failed, the row comes back
+    with email_to narrowed to the failed addresses, so its retry reaches only
+    those recipients.
+    """
+    groups = group_by_recipient(messages)
+    recipients = {message['id']: [] for message in messages}
+    for address, rows in groups.items():
+        for message in rows:
+            recipients[message['id']].append(address)
+
+    def send(address):
+        try:
+            pool.send(build_digest(address, groups[address]))
+        except Exception as e:
+            logger.error(f"Outbox: failed to send digest to {address}: {e}")
+            return address, str(e)
+        return address, None
+
+    errors = dict(pool.map(send, list(groups)))
+
+    results = []
+    for message in messages:
+        addresses = recipients[message['id']]
+        if not addresses:
+            results.append((message, 'No valid recipient address'))
+            continue
+        failed = [address for address in addresses if errors[address]]
+        if not failed:
+            results.append((message, None))
+            continue
+        if len(failed) < len(addresses):
+            message = dict(message, email_to=', '.join(failed))
+        results.append((message, '; '.join(f"{address}: {errors[address]}" for address in failed)))
+
+    logger.info(f"Outbox: {len(messages)} reminders sent as {len(groups)} digest(s)")
+    return results
+
+
+def drain_outbox(open_cursor, schema, pool, table='LICENSES', batch_size=None,
+                 deadline=None, digest=EMAIL_DIGEST):
+    """Send queued reminders until none are ready or `deadline` (time.monotonic()) is reached.
+
+    open_cursor() is a context manager yielding a cursor in a transaction of
+    its own that commits on exit. Each batch is claimed in one transaction
+    and, once sent, all of its results are recorded in another with
+    array-bound statements before the next batch is claimed. A worker
+    stopped partway therefore leaves only the batch it was sending, which
+    is reclaimed after OUTBOX_CLAIM_TIMEOUT. Messages are sent over `pool`
+    (an SMTPSenderPool), which is closed on return. With a deadline, each
+    claim is cut to what the pool's rate limit can send in the time left,
+    and draining stops once not even one message fits, so rows are not
+    claimed only to sit in 'sending' past the deadline. Returns counts by
+    resulting status.
+
+    With digest=True each batch goes out as one email per recipient (see
+    build_digest); every license still gets its own EMAIL_REMINDERS row.
+    """
+    batch_size = batch_size or (OUTBOX_DIGEST_BATCH_SIZE if digest else OUTBOX_BATCH_SIZE)
+    totals = {'sent': 0, 'failed': 0, 'pending': 0}
+
+    def deliver(message):
+        try:
+            pool.send(build_message(message))
+        except Exception as e:
+            logger.error(f"Outbox: failed to send message {message['id']} "
+                         f"(attempt {message['attempts']}): {e}")
+            return message, str(e)
+        return message, None
+
+    with pool:
+        while True:
+            limit = batch_size
+            if deadline is not None:
+                fits = pool.sends_within(deadline - time.monotonic())
+                if fits is not None:
+                    limit = min(limit, fits)
+                if limit < 1 or time.monotonic() >= deadline:
+                    break
+            with open_cursor() as cursor:
+                messages = claim_messages(cursor, schema, limit, table=table)
+            if not messages:
+                break
+            if digest:
+                results = send_digests(pool, messages)
+            else:
+                results = list(pool.map(deliver, messages))
+
+            # The whole batch's outcomes commit before anything else is claimed
+            with open_cursor() as cursor:
+                record_deliveries(cursor, schema, results, table)
+            for message, error in results:
+                totals[delivery_status(message, error)] += 1
+
+    logger.info(f"Outbox drained: {totals['sent']} sent, {totals['failed']} failed, "
+                f"{totals['pending']} to retry")
+    return totals
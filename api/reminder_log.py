@@ -0,0 +1,135 @@
+"""
+Batched EMAIL_REMINDERS logging
+Send results are buffered and written with array-bound executemany calls, one
+transaction per flush, instead of one connection and commit per email
+"""
+
+import os
+import time
+import logging
+import threading
+import oracledb
+
+from api.reminder_schedule import next_reminder_update_sql
+
+logger = logging.getLogger(__name__)
+
+# Results held in memory before they are written (bounds what a crash can lose)
+REMINDER_LOG_FLUSH_SIZE = int(os.getenv('REMINDER_LOG_FLUSH_SIZE', 50))
+# Attempts flush() makes before giving up (the items stay buffered)
+REMINDER_LOG_FLUSH_ATTEMPTS = 3
+
+
+def insert_reminder_rows(cursor, schema, rows, table='LICENSES'):
+    """Log sent reminders and reschedule their licenses in two array-DML round trips.
+
+    rows are dicts with license_id, reminder_type, email_to, email_subject,
+    email_body and status.
+    """
+    if not rows:
+        return
+
+    cursor.setinputsizes(email_body=oracledb.DB_TYPE_CLOB)
+    cursor.executemany(f"""
+        INSERT INTO "{schema}".EMAIL_REMINDERS (
+            LICENSE_ID, REMINDER_TYPE, EMAIL_TO,
+            EMAIL_SUBJECT, EMAIL_BODY, STATUS, SENT_DATE
+        ) VALUES (
+            :license_id, :reminder_type, :email_to,
+            :email_subject, :email_body, :status, SYSDATE
+        )
+    """, [
+        {
+            'license_id': row['license_id'],
+            'reminder_type': row['reminder_type'],
+            'email_to': row['email_to'],
+            'email_subject': row['email_subject'],
+            'email_body': row['email_body'],
+            'status': row['status']
+        }
+        for row in rows
+    ])
+
+    # The next reminder is computed from the rows just logged
+    license_ids = list(dict.fromkeys(row['license_id'] for row in rows))
+    cursor.executemany(
+        next_reminder_update_sql(schema, table, where='l.LIC_ID = :lic_id'),
+        [{'lic_id': license_id} for license_id in license_ids]
+    )
+
+
+class ReminderLogBuffer:
+    """Thread-safe bounded buffer of send results.
+
+    add() queues one item; every flush_size items the batch is handed to
+    write(cursor, items) inside open_cursor(), a context manager yielding a
+    cursor in its own transaction. A write that fails puts its items back,
+    so nothing is dropped: add() logs the error and carries on (it runs on
+    sender threads), while flush() retries and then raises. Use as a
+    context manager around a send run and call flush() after each send
+    batch; leaving the block flushes what is left, even when the run fails.
+
+        with ReminderLogBuffer(open_cursor, write) as log:
+            for batch in batches:
+                for license in batch:
+                    log.add(send(license))
+                log.flush()
+    """
+
+    def __init__(self, open_cursor, write, flush_size=REMINDER_LOG_FLUSH_SIZE):
+        self.open_cursor = open_cursor
+        self.write = write
+        self.flush_size = max(1, flush_size)
+        self.items = []
+        self.lock = threading.Lock()
+        self.flushes = 0
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
+
+    def add(self, item):
+        """Queue an item, writing the buffer once it reaches flush_size"""
+        with self.lock:
+            self.items.append(item)
+            if len(self.items) < self.flush_size:
+                return
+            items, self.items = self.items, []
+        try:
+            self._write(items)
+        except Exception as e:
+            logger.error(f"Reminder log write failed, keeping {len(items)} rows buffered: {e}")
+
+    def flush(self, attempts=REMINDER_LOG_FLUSH_ATTEMPTS):
+        """Write whatever is buffered, retrying; raises if every attempt fails"""
+        for attempt in range(1, attempts + 1):
+            with self.lock:
+                items, self.items = self.items, []
+            if not items:
+                return
+            try:
+                self._write(items)
+                return
+            except Exception as e:
+                if attempt == attempts:
+                    raise
+                logger.warning(f"Reminder log write failed (attempt {attempt}), retrying: {e}")
+                time.sleep(attempt)
+
+    def _write(self, items):
+        # Written outside the lock so other senders keep queueing meanwhile
+        try:
+            with self.open_cursor() as cursor:
+                self.write(cursor, items)
+        except Exception:
+            # Put the batch back ahead of anything queued since
+            with self.lock:
+                self.items[:0] = items
+            raise
+        with self.lock:
+            self.flushes += 1
+            self.written += len(items)
@@ -0,0 +1,74 @@
+"""
+Reminder schedule for license expirations
+Shared by the web app, the cron job, the Oracle CLI and the setup script
+"""
+
+# Reminder offsets (days before expiration) and their reminder types, earliest first
+REMINDER_OFFSETS = [
+    (30, '30_days'),
+    (15, '15_days'),
+    (10, '10_days'),
+    (7, '7_days'),
+    (1, '1_day'),
+]
+
+# Expired licenses get an overdue reminder once per interval
+OVERDUE_REMINDER_TYPE = 'overdue'
+OVERDUE_INTERVAL_DAYS = 7
+
+
+def next_reminder_update_sql(schema, table='LICENSES', where=None):
+    """Return an UPDATE that recomputes NEXT_REMINDER_DATE / NEXT_REMINDER_TYPE.
+
+    The next reminder is the earliest scheduled day that is on or after today
+    and after the last reminder successfully sent (EMAIL_REMINDERS rows with
+    STATUS 'sent'; failed deliveries don't count) for the license, so
+    the same statement is correct after an insert, an edit, an import or a send.
+    Once every offset has passed the license is overdue, and the overdue
+    reminder repeats every OVERDUE_INTERVAL_DAYS.
+
+    where is an optional condition on the LICENSES alias l (all rows if None).
+    """
+    expiration = "TRUNC(l.EXPIRATION_DATE)"
+
+    # First day a reminder may go out: today, or the day after the last one sent
+    last_sent = "MAX(CASE WHEN er.STATUS = 'sent' THEN er.SENT_DATE END)"
+    earliest = f"GREATEST(TRUNC(SYSDATE), NVL(TRUNC({last_sent}) + 1, TRUNC(SYSDATE)))"
+
+    last_overdue = (
+        f"MAX(CASE WHEN er.STATUS = 'sent' AND er.REMINDER_TYPE = '{OVERDUE_REMINDER_TYPE}' "
+        f"THEN er.SENT_DATE END)"
+    )
+    overdue_date = (
+        f"GREATEST({expiration} + 1, {earliest}, "
+        f"NVL(TRUNC({last_overdue}) + {OVERDUE_INTERVAL_DAYS}, TRUNC(SYSDATE)))"
+    )
+
+    date_branches = "".join(
+        f"\n                    WHEN {expiration} - {days} >= {earliest} THEN {expiration} - {days}"
+        for days, _ in REMINDER_OFFSETS
+    )
+    type_branches = "".join(
+        f"\n                    WHEN {expiration} - {days} >= {earliest} THEN '{reminder_type}'"
+        for days, reminder_type in REMINDER_OFFSETS
+    )
+
+    sql = f"""
+        UPDATE "{schema}".{table} l
+        SET (NEXT_REMINDER_DATE, NEXT_REMINDER_TYPE) = (
+            SELECT
+                CASE
+                    WHEN l.EXPIRATION_DATE IS NULL THEN NULL{date_branches}
+                    ELSE {overdue_date}
+                END,
+                CASE
+                    WHEN l.EXPIRATION_DATE IS NULL THEN NULL{type_branches}
+                    ELSE '{OVERDUE_REMINDER_TYPE}'
+                END
+            FROM "{schema}".EMAIL_REMINDERS er
+            WHERE er.LICENSE_ID = l.LIC_ID
+        )
+    """
+    if where:
+        sql += f"WHERE {where}\n"
+    return sql
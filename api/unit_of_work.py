@@ -0,0 +1,83 @@
+"""
+Unit of work over a pooled Oracle connection
+Shared by the web app and the Oracle dashboard, which each bind it to their own pool
+"""
+
+from datetime import datetime
+
+
+class UnitOfWork:
+    """One pooled connection for several statements, committed once.
+
+    Use as a context manager; the transaction commits when the block exits
+    normally and rolls back if it raises, and the connection is always
+    returned to the pool:
+
+        with UnitOfWork() as uow:
+            uow.execute('DELETE ... WHERE LICENSE_ID = :id', {'id': license_id})
+            uow.execute('DELETE ... WHERE LIC_ID = :id', {'id': license_id})
+
+    Each app subclasses it and implements connect() to check a connection
+    out of its own pool.
+    """
+
+    def connect(self):
+        """Return a connection from the app's pool"""
+        raise NotImplementedError
+
+    def __enter__(self):
+        self.connection = self.connect()
+        self.cursor = self.connection.cursor()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        finally:
+            self.cursor.close()
+            self.connection.close()
+        return False
+
+    def execute(self, query, params=None):
+        """Run a DML statement and return the affected row count"""
+        if params:
+            self.cursor.execute(query, params)
+        else:
+            self.cursor.execute(query)
+        return self.cursor.rowcount
+
+    def executemany(self, query, rows):
+        """Run a DML statement once per bind row in a single round trip.
+
+        Returns the affected row count for each bind row, in order.
+        """
+        self.cursor.executemany(query, rows, arraydmlrowcounts=True)
+        return self.cursor.getarraydmlrowcounts()
+
+    def query(self, query, params=None):
+        """Run a SELECT and return results as list of dictionaries"""
+        if params:
+            self.cursor.execute(query, params)
+        else:
+            self.cursor.execute(query)
+
+        columns = [col[0].lower() for col in self.cursor.description]
+        results = []
+
+        for row in self.cursor:
+            result_dict = {}
+            for i, col in enumerate(columns):
+                value = row[i]
+                # Convert Oracle datetime to Python datetime string for JSON serialization
+                if isinstance(value, datetime):
+                    value = value.isoformat()
+                # Handle CLOB fields
+                elif hasattr(value, 'read'):
+                    value = value.read() if value else None
+                result_dict[col] = value
+            results.append(result_dict)
+
+        return results
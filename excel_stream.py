@@ -0,0 +1,212 @@
+"""
+Streaming Excel reader for license imports
+Yields fixed-size DataFrame chunks so large workbooks are never fully in memory,
+and caches the cleaned, typed import frames as Parquet by workbook content hash
+so unchanged files are neither re-parsed nor re-cleaned
+"""
+
+import os
+import glob
+import shutil
+import hashlib
+import logging
+import pandas as pd
+from openpyxl import load_workbook
+
+logger = logging.getLogger(__name__)
+
+# Rows per chunk when the caller doesn't choose
+DEFAULT_CHUNK_SIZE = int(os.getenv('EXCEL_CHUNK_SIZE', 5000))
+
+# Formats openpyxl can open in read_only mode; anything else goes through pd.read_excel
+STREAMING_EXTENSIONS = ('.xlsx', '.xlsm', '.xltx', '.xltm')
+
+# Cleaned-frame cache (set EXCEL_CACHE_DIR to an empty value to disable)
+CACHE_DIR = os.getenv(
+    'EXCEL_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'license-reminder', 'excel')
+)
+CACHE_MAX_FILES = int(os.getenv('EXCEL_CACHE_MAX_FILES', 5))
+# Bump when parsing changes so older cache files are ignored
+CACHE_VERSION = 2
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_excel_chunks(excel_path, chunk_size=None):
+    """Yield the first sheet of a workbook as DataFrames of up to chunk_size rows
+
+    Column names come from the header row, as with pd.read_excel(). Each
+    chunk is indexed by the row's position under the header (0 for Excel
+    row 2), so index + 2 is always the Excel row number. Fully blank rows are
+    skipped. The next chunk is only parsed once the caller has finished with
+    the current one, so each batch is written while the rest of the sheet is
+    still unread.
+    """
+    yield from parse_excel_chunks(excel_path, chunk_size or DEFAULT_CHUNK_SIZE)
+
+
+def iter_cleaned_chunks(excel_path, clean, cleaner_version, chunk_size=None, use_cache=True):
+    """Yield (rows_read, frame, errors) for the first sheet, cleaned chunk by chunk
+
+    clean(df) turns a raw chunk from iter_excel_chunks() into (frame, errors):
+    a typed DataFrame indexed by Excel row and a list of tuples whose first
+    item is the Excel row of a rejected row. rows_read counts the sheet rows
+    the chunk covers (kept plus rejected).
+
+    Cleaned chunks are written as Parquet files to a cache directory named
+    by the workbook's content hash and cleaner_version (bump it whenever
+    clean() changes) as they are yielded. Later reads of the same bytes load
+    those files one at a time, skipping both parsing and cleaning, in the
+    chunk sizes they were written with. Parquet holds plain typed columns
+    only, so unlike pickle nothing in the cache directory is ever executed.
+    """
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+
+    def cleaned():
+        for df in iter_excel_chunks(excel_path, chunk_size):
+            frame, errors = clean(df)
+            yield len(df), frame, errors
+
+    if not (use_cache and CACHE_DIR):
+        yield from cleaned()
+        return
+
+    cache_path = os.path.join(
+        CACHE_DIR, f'{file_digest(excel_path)}.{cleaner_version}.v{CACHE_VERSION}'
+    )
+    if os.path.isdir(cache_path):
+        logger.info(f"Reading {excel_path} from cleaned-frame cache {cache_path}")
+        yield from read_cached_chunks(cache_path)
+        return
+
+    yield from cache_chunks(cleaned(), cache_path)
+
+
+def parse_excel_chunks(excel_path, chunk_size):
+    """Parse the first sheet of a workbook into DataFrame chunks (no cache)"""
+    if not excel_path.lower().endswith(STREAMING_EXTENSIONS):
+        # Legacy .xls and other formats: no streaming reader, load and slice
+        df = pd.read_excel(excel_path)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        columns = [
+            str(name).strip() if name is not None else f'Unnamed: {position}'
+            for position, name in enumerate(header)
+        ]
+        width = len(columns)
+
+        chunk = []
+        index = []
+        for position, row in enumerate(rows):
+            if all(value is None for value in row):
+                continue
+            # read_only rows can be shorter or longer than the header
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            chunk.append(row)
+            index.append(position)
+
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=columns, index=index)
+                chunk = []
+                index = []
+
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, index=index)
+    finally:
+        workbook.close()
+
+
+def cache_chunks(chunks, cache_path):
+    """Pass (rows_read, frame, errors) chunks through while writing each to cache_path
+
+    Every chunk becomes a numbered pair of Parquet files (frame and errors)
+    in a temporary directory, which is only renamed into place once the
+    whole sheet has been read, so an interrupted import never leaves a
+    partial cache behind. Without a Parquet engine (pyarrow) or a writable
+    cache directory the chunks still pass through, uncached.
+    """
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    writing = True
+    try:
+        os.makedirs(temp_path, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Excel cleaned-frame cache disabled: {e}")
+        writing = False
+
+    complete = False
+    try:
+        for number, (rows_read, frame, errors) in enumerate(chunks):
+            if writing:
+                try:
+                    write_cached_chunk(os.path.join(temp_path, f'{number:05d}'), frame, errors)
+                except (ImportError, OSError, ValueError, TypeError) as e:
+                    logger.warning(f"Excel cleaned-frame cache disabled: {e}")
+                    writing = False
+            yield rows_read, frame, errors
+        if writing:
+            os.replace(temp_path, cache_path)
+            complete = True
+            prune_cache()
+    finally:
+        if not complete and os.path.isdir(temp_path):
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+
+def write_cached_chunk(path, frame, errors):
+    """Write one cleaned chunk as <path>.frame.parquet and <path>.errors.parquet"""
+    frame.to_parquet(f'{path}.frame.parquet')
+    pd.DataFrame(
+        [(int(error[0]), None if error[1] is None else str(error[1]), str(error[2]))
+         for error in errors],
+        columns=['excel_row', 'lic_id', 'message']
+    ).to_parquet(f'{path}.errors.parquet', index=False)
+
+
+def read_cached_chunks(cache_path):
+    """Yield the cached (rows_read, frame, errors) chunks in order, one file pair at a time
+
+    Parquet reads date columns back as datetime64 with NaT; they are turned
+    back into Timestamps and None, as clean() produced them.
+    """
+    for frame_path in sorted(glob.glob(os.path.join(cache_path, '*.frame.parquet'))):
+        frame = pd.read_parquet(frame_path)
+        for column in frame.columns:
+            if pd.api.types.is_datetime64_any_dtype(frame[column]):
+                frame[column] = frame[column].astype(object).where(frame[column].notna(), None)
+        errors_path = frame_path[:-len('.frame.parquet')] + '.errors.parquet'
+        errors = list(pd.read_parquet(errors_path).itertuples(index=False, name=None))
+        yield len(frame) + len(errors), frame, errors
+
+
+def prune_cache():
+    """Keep only the CACHE_MAX_FILES most recently written cache entries"""
+    entries = sorted(
+        (path for path in glob.glob(os.path.join(CACHE_DIR, '*.v*'))
+         if os.path.isdir(path) and not path.endswith('.tmp')),
+        key=os.path.getmtime, reverse=True
+    )
+    for stale in entries[CACHE_MAX_FILES:]:
+        shutil.rmtree(stale, ignore_errors=True)
+    # Earlier versions pickled raw chunks; those files are removed unread
+    for stale in glob.glob(os.path.join(CACHE_DIR, '*.pkl')):
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
@@ -6,6 +6,7 @@ Uses EmailJS free service for sending emails
 
 import os
 import sys
+import numpy as np
 import pandas as pd
 import requests
 import schedule
@@ -17,6 +18,8 @@ from supabase import create_client, Client
 from typing import List, Dict, Optional
 import logging
 
+from excel_stream import iter_excel_chunks
+
 # Load environment variables
 load_dotenv()
 
@@ -44,6 +47,7 @@ class LicenseReminderSystemEmailJS:
         self.emailjs_private_key = os.getenv('EMAILJS_PRIVATE_KEY')  # Optional for security
         
         self.excel_file_path = os.getenv('EXCEL_FILE_PATH', 'licenses.xlsx')
+        self.upsert_chunk_size = int(os.getenv('SUPABASE_UPSERT_CHUNK_SIZE', '500'))
         self.company_name = os.getenv('COMPANY_NAME', 'MSMM Engineering')
         self.company_website = os.getenv('COMPANY_WEBSITE', 'https://www.msmmeng.com')
         self.support_email = os.getenv('SUPPORT_EMAIL', 'support@msmmeng.com')
@@ -67,67 +71,72 @@ class LicenseReminderSystemEmailJS:
             logger.error(f"Failed to initialize Supabase client: {e}")
             raise
 
+    def clean_excel_chunk(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Clean one chunk of Excel rows into license columns for Supabase"""
+        # Clean and prepare data
+        df = df.dropna(subset=['LIC_ID'])  # Remove rows without license ID (but we won't store LIC_ID)
+        
+        # Convert dates to string format for Supabase
+        date_columns = ['FIRST_ISSUE_DATE', 'EXPIRATION_DATE']
+        for col in date_columns:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
+        
+        # Convert column names to lowercase for database
+        df.columns = df.columns.str.lower()
+        
+        # Remove lic_id column since we'll use database auto-generated id instead
+        if 'lic_id' in df.columns:
+            df = df.drop('lic_id', axis=1)
+        
+        # Handle NaN, NaT and inf values
+        df = df.replace([np.inf, -np.inf], np.nan).astype(object)
+        df = df.where(pd.notna(df), None)
+        
+        # Since we removed lic_id, we'll use lic_name as a unique identifier for updates
+        # Last row wins when a name repeats (one upsert can't touch a row twice)
+        return df[df['lic_name'].isna() | ~df['lic_name'].duplicated(keep='last')]
+
     def upload_excel_to_supabase(self) -> bool:
         """Upload Excel data to Supabase"""
         try:
             logger.info(f"Reading Excel file: {self.excel_file_path}")
-            df = pd.read_excel(self.excel_file_path)
-            
-            # Clean and prepare data
-            df = df.dropna(subset=['LIC_ID'])  # Remove rows without license ID (but we won't store LIC_ID)
-            
-            # Convert dates to string format for Supabase
-            date_columns = ['FIRST_ISSUE_DATE', 'EXPIRATION_DATE']
-            for col in date_columns:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-                    df[col] = df[col].dt.strftime('%Y-%m-%d')
-                    df[col] = df[col].replace('NaT', None)
-            
-            # Convert column names to lowercase for database
-            df.columns = df.columns.str.lower()
             
-            # Remove lic_id column since we'll use database auto-generated id instead
-            if 'lic_id' in df.columns:
-                df = df.drop('lic_id', axis=1)
-            
-            # Handle NaN values
-            df = df.where(pd.notna(df), None)
-            
-            # Convert DataFrame to list of dictionaries
-            records = df.to_dict('records')
-            
-            logger.info(f"Uploading {len(records)} records to Supabase")
-            
-            # Since we removed lic_id, we'll use lic_name as a unique identifier for updates
             # First, get existing records to check for duplicates by name
             existing_result = self.supabase.table('licenses').select('id, lic_name').execute()
             existing_names = {row['lic_name']: row['id'] for row in existing_result.data}
             
-            # Separate new records from existing ones based on lic_name
-            new_records = []
-            existing_records = []
+            inserted = 0
+            updated = 0
             
-            for record in records:
-                if record.get('lic_name') in existing_names:
-                    record['id'] = existing_names[record['lic_name']]
-                    existing_records.append(record)
-                else:
-                    new_records.append(record)
+            # Stream the sheet a chunk at a time; each chunk is at most one insert
+            # and one upsert request
+            for df in iter_excel_chunks(self.excel_file_path, self.upsert_chunk_size):
+                df = self.clean_excel_chunk(df)
+                
+                # Separate new records from existing ones based on lic_name
+                ids = df['lic_name'].map(existing_names)
+                new_records = df[ids.isna()].to_dict('records')
+                existing_records = df[ids.notna()].assign(id=ids[ids.notna()].astype(int)).to_dict('records')
+                
+                if new_records:
+                    result = self.supabase.table('licenses').insert(new_records).execute()
+                    # Names inserted here are updates if a later chunk repeats them
+                    existing_names.update({row['lic_name']: row['id'] for row in result.data})
+                    inserted += len(new_records)
+                
+                # Update existing records by id
+                if existing_records:
+                    self.supabase.table('licenses').upsert(existing_records, on_conflict='id').execute()
+                    updated += len(existing_records)
             
-            if new_records:
-                result = self.supabase.table('licenses').insert(new_records).execute()
-                logger.info(f"Successfully uploaded {len(new_records)} new records")
+            if inserted:
+                logger.info(f"Successfully uploaded {inserted} new records")
             else:
                 logger.info("No new records to upload")
-                
-            # Update existing records if needed
-            for record in existing_records:
-                record_id = record.pop('id')  # Remove id from update data
-                self.supabase.table('licenses').update(record).eq('id', record_id).execute()
             
-            if existing_records:
-                logger.info(f"Updated {len(existing_records)} existing records")
+            if updated:
+                logger.info(f"Updated {updated} existing records")
             
             return True
             
@@ -5,18 +5,23 @@ Automated email reminders for license expirations using Oracle DB
 
 import os
 import sys
+import hashlib
 import logging
 import schedule
 import time
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 import oracledb
 import pandas as pd
 
+from api.reminder_schedule import next_reminder_update_sql
+from api.mail_transport import SMTPSenderPool
+from api.outbox import enqueue_messages, drain_outbox, EMAIL_DIGEST
+from run_oracle_setup import sync_license_id_sequence
+from excel_stream import iter_cleaned_chunks
+
 # Load environment variables
 load_dotenv()
 
@@ -31,6 +36,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Excel columns loaded into LICENSES alongside LIC_ID
+IMPORT_TEXT_COLUMNS = ['LIC_NAME', 'LIC_STATE', 'LIC_TYPE', 'LIC_NO', 'ASCEM_NO', 'LIC_NOTIFY_NAMES']
+IMPORT_DATE_COLUMNS = ['FIRST_ISSUE_DATE', 'EXPIRATION_DATE']
+# Bump when prepare_import_frame changes so cached cleaned frames are not reused
+IMPORT_CLEANER_VERSION = 'import1'
+
 
 class LicenseReminderOracleSystem:
     """Oracle-based License Reminder System"""
@@ -64,7 +75,9 @@ class LicenseReminderOracleSystem:
             'user': os.getenv('ORACLE_USER', 'SYS'),
             'password': os.getenv('ORACLE_PASSWORD'),
             'schema': os.getenv('ORACLE_SCHEMA'),
-            'table': os.getenv('ORACLE_TABLE')
+            'table': os.getenv('ORACLE_TABLE'),
+            # Rows per executemany() round trip when importing Excel data
+            'import_batch_size': int(os.getenv('ORACLE_IMPORT_BATCH_SIZE', 5000))
         }
         logger.info("Oracle connection parameters configured")
     
@@ -79,6 +92,14 @@ class LicenseReminderOracleSystem:
             'from_name': os.getenv('FROM_NAME', 'License Reminder System')
         }
         
+        # Parallel SMTP sessions opened on the first send and closed after each reminder run
+        self.mail_pool = SMTPSenderPool(
+            self.email_config['smtp_server'],
+            self.email_config['smtp_port'],
+            self.email_config['username'],
+            self.email_config['password']
+        )
+        
         # Company information for email templates
         self.company_info = {
             'name': os.getenv('COMPANY_NAME', 'MSMM Engineering'),
@@ -108,130 +129,326 @@ class LicenseReminderOracleSystem:
             logger.error(f"Oracle connection error: {e}")
             raise
     
-    def upload_excel_data(self, excel_path: str = None):
-        """Upload license data from Excel to Oracle database"""
+    @contextmanager
+    def unit_of_work(self):
+        """Yield a cursor on one connection; commit once on success, roll back on error"""
+        connection = self.get_oracle_connection()
+        cursor = connection.cursor()
+        try:
+            yield cursor
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def prepare_import_frame(self, df: pd.DataFrame):
+        """Clean an Excel sheet column by column into bind rows for the import MERGE
+        
+        Returns (frame, errors). The frame has one lowercase column per bind
+        variable plus row_hash, the SHA-1 of the cleaned values, and is indexed
+        by the Excel row number; errors lists (excel_row, lic_id, message) for
+        rows that cannot be loaded.
+        """
+        df = df.reindex(columns=['LIC_ID'] + IMPORT_TEXT_COLUMNS + IMPORT_DATE_COLUMNS)
+        # Header is Excel row 1
+        excel_rows = df.index + 2
+        
+        frame = pd.DataFrame(index=excel_rows)
+        problems = pd.Series('', index=excel_rows)
+        # Cleaned values as text, joined with a unit separator, for the row hash
+        content = pd.Series('', index=excel_rows)
+        
+        lic_ids = pd.to_numeric(df['LIC_ID'], errors='coerce').set_axis(excel_rows)
+        bad_ids = lic_ids.isna() | (lic_ids % 1 != 0)
+        problems[bad_ids] = 'missing or non-numeric LIC_ID'
+        frame['lic_id'] = lic_ids
+        
+        for column in IMPORT_TEXT_COLUMNS:
+            values = df[column].set_axis(excel_rows)
+            # Numbers typed into text columns (e.g. LIC_NO 12345.0) load as '12345'
+            numbers = pd.to_numeric(values, errors='coerce')
+            whole = numbers.notna() & (numbers % 1 == 0)
+            text = values.astype(str).str.strip()
+            text[whole] = numbers[whole].astype('int64').astype(str)
+            keep = values.notna() & (text != '')
+            frame[column.lower()] = text.astype(object).where(keep, None)
+            content = content + '\x1f' + text.where(keep, '')
+        
+        for column in IMPORT_DATE_COLUMNS:
+            values = df[column].set_axis(excel_rows)
+            # format='mixed' parses each cell on its own, like per-cell pd.to_datetime
+            dates = pd.to_datetime(values, errors='coerce', format='mixed')
+            bad_dates = dates.isna() & values.notna() & (values.astype(str).str.strip() != '')
+            problems[bad_dates & (problems == '')] = f'invalid {column}'
+            frame[column.lower()] = dates.astype(object).where(dates.notna(), None)
+            content = content + '\x1f' + dates.dt.strftime('%Y-%m-%d %H:%M:%S').fillna('')
+        
+        failed = problems != ''
+        raw_ids = df['LIC_ID'].set_axis(excel_rows)
+        errors = [
+            (excel_row, None if pd.isna(lic_id) else lic_id, message)
+            for excel_row, lic_id, message in zip(
+                excel_rows[failed], raw_ids[failed], problems[failed]
+            )
+        ]
+        
+        frame['row_hash'] = content.map(lambda text: hashlib.sha1(text.encode('utf-8')).hexdigest())
+        frame = frame[~failed]
+        frame['lic_id'] = frame['lic_id'].astype('int64')
+        return frame, errors
+    
+    def merge_license_batches(self, cursor, frame: pd.DataFrame, existing_hashes: dict,
+                              dry_run: bool = False):
+        """MERGE prepared rows into LICENSES with array binds, one batch at a time
+        
+        Rows the database rejects are skipped (batch errors) instead of failing
+        the batch. existing_hashes maps LIC_ID to ROW_HASH and is updated as
+        rows are merged. With dry_run nothing is sent to the database. Returns
+        (inserted_ids, updated_ids, errors) with errors as
+        (excel_row, lic_id, message).
+        """
+        schema = self.oracle_config['schema']
+        table = self.oracle_config['table']
+        batch_size = self.oracle_config['import_batch_size']
+        
+        merge_sql = f"""
+            MERGE INTO "{schema}".{table} t
+            USING (
+                SELECT :lic_id AS LIC_ID, :lic_name AS LIC_NAME, :lic_state AS LIC_STATE,
+                       :lic_type AS LIC_TYPE, :lic_no AS LIC_NO, :ascem_no AS ASCEM_NO,
+                       :first_issue_date AS FIRST_ISSUE_DATE, :expiration_date AS EXPIRATION_DATE,
+                       :lic_notify_names AS LIC_NOTIFY_NAMES, :row_hash AS ROW_HASH
+                FROM DUAL
+            ) s
+            ON (t.LIC_ID = s.LIC_ID)
+            WHEN MATCHED THEN UPDATE SET
+                t.LIC_NAME = s.LIC_NAME,
+                t.LIC_STATE = s.LIC_STATE,
+                t.LIC_TYPE = s.LIC_TYPE,
+                t.LIC_NO = s.LIC_NO,
+                t.ASCEM_NO = s.ASCEM_NO,
+                t.FIRST_ISSUE_DATE = s.FIRST_ISSUE_DATE,
+                t.EXPIRATION_DATE = s.EXPIRATION_DATE,
+                t.LIC_NOTIFY_NAMES = s.LIC_NOTIFY_NAMES,
+                t.ROW_HASH = s.ROW_HASH,
+                t.UPDATED_AT = SYSDATE
+            WHEN NOT MATCHED THEN INSERT (
+                LIC_ID, LIC_NAME, LIC_STATE, LIC_TYPE, LIC_NO,
+                ASCEM_NO, FIRST_ISSUE_DATE, EXPIRATION_DATE,
+                LIC_NOTIFY_NAMES, ROW_HASH, CREATED_AT, UPDATED_AT
+            ) VALUES (
+                s.LIC_ID, s.LIC_NAME, s.LIC_STATE, s.LIC_TYPE, s.LIC_NO,
+                s.ASCEM_NO, s.FIRST_ISSUE_DATE, s.EXPIRATION_DATE,
+                s.LIC_NOTIFY_NAMES, s.ROW_HASH, SYSDATE, SYSDATE
+            )
+        """
+        
+        inserted_ids = []
+        updated_ids = []
+        errors = []
+        
+        for start in range(0, len(frame), batch_size):
+            batch = frame.iloc[start:start + batch_size]
+            rows = batch.to_dict('records')
+            
+            rejected = set()
+            if not dry_run:
+                # Fix bind types up front so leading NULLs don't decide them
+                cursor.setinputsizes(
+                    lic_id=oracledb.DB_TYPE_NUMBER,
+                    first_issue_date=oracledb.DB_TYPE_DATE,
+                    expiration_date=oracledb.DB_TYPE_DATE
+                )
+                cursor.executemany(merge_sql, rows, batcherrors=True)
+                
+                for error in cursor.getbatcherrors():
+                    rejected.add(error.offset)
+                    errors.append((batch.index[error.offset], rows[error.offset]['lic_id'], error.message))
+            
+            for offset, row in enumerate(rows):
+                if offset in rejected:
+                    continue
+                if row['lic_id'] in existing_hashes:
+                    updated_ids.append(row['lic_id'])
+                else:
+                    inserted_ids.append(row['lic_id'])
+                existing_hashes[row['lic_id']] = row['row_hash']
+            
+            logger.info(f"Merged Excel rows {batch.index[0]}-{batch.index[-1]}")
+        
+        return inserted_ids, updated_ids, errors
+    
+    def delete_licenses(self, cursor, lic_ids: List[int]):
+        """Delete licenses, their reminder history and queued emails with array binds"""
+        schema = self.oracle_config['schema']
+        table = self.oracle_config['table']
+        batch_size = self.oracle_config['import_batch_size']
+        
+        for start in range(0, len(lic_ids), batch_size):
+            rows = [{'lic_id': lic_id} for lic_id in lic_ids[start:start + batch_size]]
+            cursor.executemany(f"""
+                DELETE FROM "{schema}".EMAIL_REMINDERS
+                WHERE LICENSE_ID = :lic_id
+            """, rows)
+            cursor.executemany(f"""
+                DELETE FROM "{schema}".EMAIL_OUTBOX
+                WHERE LICENSE_ID = :lic_id
+            """, rows)
+            cursor.executemany(f"""
+                DELETE FROM "{schema}".{table}
+                WHERE LIC_ID = :lic_id
+            """, rows)
+    
+    def upload_excel_data(self, excel_path: str = None, dry_run: bool = False,
+                          prune: bool = False) -> Optional[Dict[str, Any]]:
+        """Upload license data from Excel to Oracle database
+        
+        Only rows whose content hash differs from the stored ROW_HASH are
+        written; unchanged rows keep their UPDATED_AT. Licenses missing from
+        the sheet are reported as removed and deleted only with prune. With
+        dry_run the changes are computed and reported but nothing is written.
+        Returns a summary of the changes, or None if the import failed.
+        """
         if not excel_path:
             excel_path = os.getenv('EXCEL_FILE_PATH', 'licenses.xlsx')
         
         if not os.path.exists(excel_path):
             logger.error(f"Excel file not found: {excel_path}")
-            return False
+            return None
         
         try:
-            # Read Excel file
-            df = pd.read_excel(excel_path)
-            logger.info(f"Read {len(df)} rows from Excel file")
-            
-            # Connect to Oracle
-            connection = self.get_oracle_connection()
-            cursor = connection.cursor()
-            
             schema = self.oracle_config['schema']
             table = self.oracle_config['table']
             
-            # Process each row
-            inserted = 0
-            updated = 0
-            
-            for _, row in df.iterrows():
-                try:
-                    # Check if license exists
-                    cursor.execute(f"""
-                        SELECT COUNT(*) FROM "{schema}".{table}
-                        WHERE LIC_ID = :lic_id
-                    """, lic_id=row.get('LIC_ID'))
+            summary = {
+                'dry_run': dry_run,
+                'rows_read': 0,
+                'inserted': [],
+                'changed': [],
+                'unchanged': 0,
+                'removed': [],
+                'deleted': 0,
+                'rejected': 0
+            }
+            seen_ids = set()
+            
+            # All rows and the reminder recompute commit together
+            with self.unit_of_work() as cursor:
+                # Stored hashes tell inserts, changes and unchanged rows apart in bulk
+                cursor.arraysize = self.oracle_config['import_batch_size']
+                cursor.execute(f'SELECT LIC_ID, ROW_HASH FROM "{schema}".{table}')
+                existing_hashes = {lic_id: row_hash for lic_id, row_hash in cursor}
+                
+                # Stream the cleaned sheet (cached by content hash); each chunk is
+                # merged before the next is read
+                for rows_read, frame, errors in iter_cleaned_chunks(
+                    excel_path, self.prepare_import_frame, IMPORT_CLEANER_VERSION,
+                    self.oracle_config['import_batch_size']
+                ):
+                    summary['rows_read'] += rows_read
+                    # Rejected rows still name their license, so they are not "removed"
+                    seen_ids.update(frame['lic_id'].tolist())
+                    seen_ids.update(
+                        int(lic_id) for lic_id in pd.to_numeric(
+                            pd.Series([error[1] for error in errors], dtype=object), errors='coerce'
+                        ).dropna()
+                    )
+                    
+                    # New IDs map to NaN, so they never equal their hash
+                    stored = frame['lic_id'].map(existing_hashes)
+                    pending = frame[frame['row_hash'] != stored]
+                    summary['unchanged'] += len(frame) - len(pending)
                     
-                    exists = cursor.fetchone()[0] > 0
+                    inserted_ids, changed_ids, merge_errors = self.merge_license_batches(
+                        cursor, pending, existing_hashes, dry_run
+                    )
+                    summary['inserted'].extend(inserted_ids)
+                    summary['changed'].extend(changed_ids)
+                    errors.extend(merge_errors)
+                    summary['rejected'] += len(errors)
                     
-                    if exists:
-                        # Update existing record
-                        cursor.execute(f"""
-                            UPDATE "{schema}".{table}
-                            SET LIC_NAME = :lic_name,
-                                LIC_STATE = :lic_state,
-                                LIC_TYPE = :lic_type,
-                                LIC_NO = :lic_no,
-                                ASCEM_NO = :ascem_no,
-                                FIRST_ISSUE_DATE = :first_issue_date,
-                                EXPIRATION_DATE = :expiration_date,
-                                LIC_NOTIFY_NAMES = :lic_notify_names,
-                                UPDATED_AT = SYSDATE
-                            WHERE LIC_ID = :lic_id
-                        """, {
-                            'lic_id': row.get('LIC_ID'),
-                            'lic_name': row.get('LIC_NAME'),
-                            'lic_state': row.get('LIC_STATE'),
-                            'lic_type': row.get('LIC_TYPE'),
-                            'lic_no': row.get('LIC_NO'),
-                            'ascem_no': row.get('ASCEM_NO'),
-                            'first_issue_date': pd.to_datetime(row.get('FIRST_ISSUE_DATE')) if pd.notna(row.get('FIRST_ISSUE_DATE')) else None,
-                            'expiration_date': pd.to_datetime(row.get('EXPIRATION_DATE')) if pd.notna(row.get('EXPIRATION_DATE')) else None,
-                            'lic_notify_names': row.get('LIC_NOTIFY_NAMES')
-                        })
-                        updated += 1
+                    for excel_row, lic_id, message in sorted(errors, key=lambda error: error[0]):
+                        logger.error(f"Error processing row {excel_row} (LIC_ID {lic_id}): {message}")
+                
+                logger.info(f"Read {summary['rows_read']} rows from Excel file")
+                
+                summary['removed'] = sorted(set(existing_hashes) - seen_ids)
+                if prune and summary['removed'] and not dry_run:
+                    if summary['rejected']:
+                        # A half-read sheet must not delete licenses
+                        logger.warning(f"Not pruning: {summary['rejected']} rows were rejected")
                     else:
-                        # Insert new record
-                        cursor.execute(f"""
-                            INSERT INTO "{schema}".{table} (
-                                LIC_ID, LIC_NAME, LIC_STATE, LIC_TYPE, LIC_NO,
-                                ASCEM_NO, FIRST_ISSUE_DATE, EXPIRATION_DATE,
-                                LIC_NOTIFY_NAMES, CREATED_AT, UPDATED_AT
-                            ) VALUES (
-                                :lic_id, :lic_name, :lic_state, :lic_type, :lic_no,
-                                :ascem_no, :first_issue_date, :expiration_date,
-                                :lic_notify_names, SYSDATE, SYSDATE
-                            )
-                        """, {
-                            'lic_id': row.get('LIC_ID'),
-                            'lic_name': row.get('LIC_NAME'),
-                            'lic_state': row.get('LIC_STATE'),
-                            'lic_type': row.get('LIC_TYPE'),
-                            'lic_no': row.get('LIC_NO'),
-                            'ascem_no': row.get('ASCEM_NO'),
-                            'first_issue_date': pd.to_datetime(row.get('FIRST_ISSUE_DATE')) if pd.notna(row.get('FIRST_ISSUE_DATE')) else None,
-                            'expiration_date': pd.to_datetime(row.get('EXPIRATION_DATE')) if pd.notna(row.get('EXPIRATION_DATE')) else None,
-                            'lic_notify_names': row.get('LIC_NOTIFY_NAMES')
-                        })
-                        inserted += 1
-                        
-                except Exception as e:
-                    logger.error(f"Error processing row {row.get('LIC_ID')}: {e}")
-                    continue
-            
-            connection.commit()
-            cursor.close()
-            connection.close()
-            
-            logger.info(f"Upload complete: {inserted} inserted, {updated} updated")
-            return True
+                        self.delete_licenses(cursor, summary['removed'])
+                        summary['deleted'] = len(summary['removed'])
+                
+                # Recompute the next due reminder for the licenses written
+                touched = summary['inserted'] + summary['changed']
+                if touched and not dry_run:
+                    cursor.executemany(
+                        next_reminder_update_sql(schema, table, where='l.LIC_ID = :lic_id'),
+                        [{'lic_id': lic_id} for lic_id in touched]
+                    )
+            
+            # Imported rows carry their own LIC_ID; keep the ID sequence ahead of them
+            if summary['inserted'] and not dry_run:
+                try:
+                    with self.unit_of_work() as cursor:
+                        sync_license_id_sequence(cursor, schema)
+                except oracledb.Error as e:
+                    logger.warning(f"Could not sync LICENSES_ID_SEQ (run run_oracle_setup.py): {e}")
+            
+            logger.info(
+                f"Upload {'preview' if dry_run else 'complete'}: "
+                f"{len(summary['inserted'])} inserted, {len(summary['changed'])} changed, "
+                f"{summary['unchanged']} unchanged, {len(summary['removed'])} removed "
+                f"({summary['deleted']} deleted), {summary['rejected']} rejected"
+            )
+            return summary
             
         except Exception as e:
             logger.error(f"Error uploading Excel data: {e}")
-            return False
+            return None
     
     def get_licenses_needing_reminders(self) -> List[Dict[str, Any]]:
-        """Get licenses that need reminders today from Oracle view"""
+        """Get licenses whose next reminder (NEXT_REMINDER_DATE) is due today"""
         try:
-            connection = self.get_oracle_connection()
-            cursor = connection.cursor()
             schema = self.oracle_config['schema']
-            
-            # Query the view that filters licenses needing reminders
-            cursor.execute(f"""
-                SELECT id, lic_name, lic_type, lic_state, expiration_date,
-                       lic_notify_names, days_until_expiration, reminder_type
-                FROM "{schema}".LICENSES_NEEDING_REMINDERS
-            """)
-            
-            columns = [col[0].lower() for col in cursor.description]
-            licenses = []
-            
-            for row in cursor:
-                license_dict = dict(zip(columns, row))
-                licenses.append(license_dict)
-            
-            cursor.close()
-            connection.close()
+            table = self.oracle_config['table']
+            eligible = """l.LIC_NOTIFY_NAMES IS NOT NULL
+                AND LENGTH(TRIM(l.LIC_NOTIFY_NAMES)) > 0
+                AND NVL(l.EMAIL_ENABLED, 1) = 1"""
+            
+            with self.unit_of_work() as cursor:
+                # Move reminders whose day passed without a run on to the next one,
+                # and schedule licenses that have an expiration date but no reminder yet
+                cursor.execute(next_reminder_update_sql(
+                    schema, table, where=f"""(l.NEXT_REMINDER_DATE < TRUNC(SYSDATE)
+                           OR (l.NEXT_REMINDER_DATE IS NULL AND l.EXPIRATION_DATE IS NOT NULL))
+                    AND {eligible}"""
+                ))
+                
+                cursor.execute(f"""
+                    SELECT l.LIC_ID as id, l.LIC_NAME as lic_name, l.LIC_TYPE as lic_type,
+                           l.LIC_STATE as lic_state, l.LIC_NO as lic_no,
+                           l.EXPIRATION_DATE as expiration_date, l.LIC_NOTIFY_NAMES as lic_notify_names,
+                           TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) as days_until_expiration,
+                           l.NEXT_REMINDER_TYPE as reminder_type,
+                           TO_CHAR(l.NEXT_REMINDER_DATE, 'YYYY-MM-DD') as reminder_date
+                    FROM "{schema}".{table} l
+                    WHERE l.NEXT_REMINDER_DATE <= TRUNC(SYSDATE)
+                    AND {eligible}
+                    ORDER BY days_until_expiration, l.LIC_NAME
+                """)
+                
+                columns = [col[0].lower() for col in cursor.description]
+                licenses = []
+                
+                for row in cursor:
+                    license_dict = dict(zip(columns, row))
+                    licenses.append(license_dict)
             
             logger.info(f"Found {len(licenses)} licenses needing reminders")
             return licenses
@@ -243,25 +460,21 @@ class LicenseReminderOracleSystem:
     def get_upcoming_expirations(self, days: int = 90) -> List[Dict[str, Any]]:
         """Get licenses expiring in the next N days"""
         try:
-            connection = self.get_oracle_connection()
-            cursor = connection.cursor()
             schema = self.oracle_config['schema']
             
-            cursor.execute(f"""
-                SELECT * FROM "{schema}".UPCOMING_EXPIRATIONS
-                WHERE days_until_expiration <= :days
-                ORDER BY expiration_date
-            """, days=days)
-            
-            columns = [col[0].lower() for col in cursor.description]
-            licenses = []
-            
-            for row in cursor:
-                license_dict = dict(zip(columns, row))
-                licenses.append(license_dict)
-            
-            cursor.close()
-            connection.close()
+            with self.unit_of_work() as cursor:
+                cursor.execute(f"""
+                    SELECT * FROM "{schema}".UPCOMING_EXPIRATIONS
+                    WHERE days_until_expiration <= :days
+                    ORDER BY expiration_date
+                """, days=days)
+                
+                columns = [col[0].lower() for col in cursor.description]
+                licenses = []
+                
+                for row in cursor:
+                    license_dict = dict(zip(columns, row))
+                    licenses.append(license_dict)
             
             return licenses
             
@@ -269,8 +482,8 @@ class LicenseReminderOracleSystem:
             logger.error(f"Error fetching upcoming expirations: {e}")
             return []
     
-    def send_reminder_email(self, license_data: Dict[str, Any]) -> bool:
-        """Send reminder email for a license"""
+    def render_reminder_email(self, license_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Render a license's reminder as an EMAIL_OUTBOX message (None when it can't be sent)"""
         try:
             # Parse email addresses
             email_list = []
@@ -280,24 +493,22 @@ class LicenseReminderOracleSystem:
             
             if not email_list:
                 logger.warning(f"No email addresses for license {license_data.get('id')}")
-                return False
-            
-            # Prepare email content
-            subject = self.get_email_subject(license_data)
-            body = self.get_email_body(license_data)
-            
-            # Send email
-            success = self.send_email(email_list, subject, body)
-            
-            if success:
-                # Record the sent reminder in database
-                self.record_email_reminder(license_data, email_list, subject, body)
-            
-            return success
+                return None
+            
+            return {
+                'license_id': license_data['id'],
+                'reminder_type': license_data['reminder_type'],
+                'reminder_date': license_data['reminder_date'],
+                'email_from': f"{self.email_config['from_name']} <{self.email_config['from_email']}>",
+                'email_to': ', '.join(email_list),
+                'email_subject': self.get_email_subject(license_data),
+                'email_body': self.get_email_body(license_data),
+                'body_type': 'html'
+            }
             
         except Exception as e:
-            logger.error(f"Error sending reminder email: {e}")
-            return False
+            logger.error(f"Error rendering reminder email: {e}")
+            return None
     
     def get_email_subject(self, license_data: Dict[str, Any]) -> str:
         """Generate email subject based on reminder type"""
@@ -384,82 +595,56 @@ class LicenseReminderOracleSystem:
         
         return html_body
     
-    def send_email(self, recipients: List[str], subject: str, body: str) -> bool:
-        """Send email using SMTP"""
-        try:
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{self.email_config['from_name']} <{self.email_config['from_email']}>"
-            msg['To'] = ', '.join(recipients)
-            msg['Subject'] = subject
-            
-            msg.attach(MIMEText(body, 'html'))
-            
-            with smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port']) as server:
-                server.starttls()
-                server.login(self.email_config['username'], self.email_config['password'])
-                server.send_message(msg)
-            
-            logger.info(f"Email sent successfully to {', '.join(recipients)}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send email: {e}")
-            return False
-    
-    def record_email_reminder(self, license_data: Dict[str, Any], recipients: List[str], 
-                             subject: str, body: str):
-        """Record sent email reminder in Oracle database"""
+    def repair_next_reminders(self) -> int:
+        """Recompute NEXT_REMINDER_DATE / NEXT_REMINDER_TYPE for every license"""
         try:
-            connection = self.get_oracle_connection()
-            cursor = connection.cursor()
-            schema = self.oracle_config['schema']
-            
-            cursor.execute(f"""
-                INSERT INTO "{schema}".EMAIL_REMINDERS (
-                    LICENSE_ID, REMINDER_TYPE, EMAIL_TO, 
-                    EMAIL_SUBJECT, EMAIL_BODY, STATUS
-                ) VALUES (
-                    :license_id, :reminder_type, :email_to,
-                    :email_subject, :email_body, :status
-                )
-            """, {
-                'license_id': license_data.get('id'),
-                'reminder_type': license_data.get('reminder_type'),
-                'email_to': ', '.join(recipients),
-                'email_subject': subject,
-                'email_body': body,
-                'status': 'sent'
-            })
-            
-            connection.commit()
-            cursor.close()
-            connection.close()
+            with self.unit_of_work() as cursor:
+                cursor.execute(next_reminder_update_sql(
+                    self.oracle_config['schema'], self.oracle_config['table']
+                ))
+                repaired = cursor.rowcount
             
-            logger.info(f"Reminder recorded for license {license_data.get('id')}")
+            logger.info(f"Recomputed next reminder for {repaired} licenses")
+            return repaired
             
         except Exception as e:
-            logger.error(f"Error recording email reminder: {e}")
+            logger.error(f"Error repairing next reminders: {e}")
+            return -1
     
-    def check_and_send_reminders(self):
-        """Check for licenses needing reminders and send emails"""
+    def check_and_send_reminders(self) -> Dict[str, int]:
+        """Queue due reminders in EMAIL_OUTBOX and send them, as the web cron does
+        
+        Delivery, retries and EMAIL_REMINDERS logging all go through the
+        outbox, so a run cut off partway leaves the rest queued for the next.
+        """
         logger.info("Starting reminder check...")
         
         licenses = self.get_licenses_needing_reminders()
+        messages = [message for message in map(self.render_reminder_email, licenses) if message]
         
-        if not licenses:
+        if messages:
+            with self.unit_of_work() as cursor:
+                queued = enqueue_messages(cursor, self.oracle_config['schema'], messages,
+                                          table=self.oracle_config['table'])
+            logger.info(f"Queued {queued} new reminder(s) ({len(messages) - queued} already queued)")
+        else:
             logger.info("No licenses need reminders today")
-            return
         
-        sent_count = 0
-        failed_count = 0
+        # Drain even when nothing new was queued: earlier retries may be due
+        connections_before = self.mail_pool.connections
+        totals = self.drain_email_outbox()
         
-        for license_data in licenses:
-            if self.send_reminder_email(license_data):
-                sent_count += 1
-            else:
-                failed_count += 1
-        
-        logger.info(f"Reminder check complete: {sent_count} sent, {failed_count} failed")
+        logger.info(f"Reminder check complete: {totals['sent']} sent, {totals['failed']} failed, "
+                    f"{totals['pending']} to retry over "
+                    f"{self.mail_pool.connections - connections_before} SMTP connection(s)")
+        return totals
+    
+    def drain_email_outbox(self, digest: bool = EMAIL_DIGEST) -> Dict[str, int]:
+        """Send reminders queued in EMAIL_OUTBOX by `check` or the web app's cron routes
+        (digest=True sends one email per recipient covering all their licenses)"""
+        logger.info("Draining email outbox...")
+        return drain_outbox(self.unit_of_work, self.oracle_config['schema'], self.mail_pool,
+                            table=self.oracle_config['table'], digest=digest)
     
     def run_scheduler(self):
         """Run the scheduler for daily checks"""
@@ -508,7 +693,7 @@ class LicenseReminderOracleSystem:
             # Reminders sent today
             cursor.execute(f"""
                 SELECT COUNT(*) FROM "{schema}".EMAIL_REMINDERS
-                WHERE TRUNC(SENT_DATE) = TRUNC(SYSDATE)
+                WHERE SENT_DATE >= TRUNC(SYSDATE) AND SENT_DATE < TRUNC(SYSDATE) + 1
             """)
             stats['reminders_sent_today'] = cursor.fetchone()[0]
             
@@ -526,10 +711,33 @@ class LicenseReminderOracleSystem:
             return {}
 
 
+def print_import_summary(summary: Dict[str, Any], sample: int = 20):
+    """Print the change summary returned by upload_excel_data"""
+    def ids(lic_ids):
+        shown = ', '.join(str(lic_id) for lic_id in lic_ids[:sample])
+        more = f" ... (+{len(lic_ids) - sample} more)" if len(lic_ids) > sample else ''
+        return f" [{shown}{more}]" if lic_ids else ''
+    
+    print("=" * 50)
+    print(f"Rows read: {summary['rows_read']}")
+    print(f"Inserted: {len(summary['inserted'])}{ids(summary['inserted'])}")
+    print(f"Changed: {len(summary['changed'])}{ids(summary['changed'])}")
+    print(f"Unchanged: {summary['unchanged']}")
+    print(f"Removed from sheet: {len(summary['removed'])}{ids(summary['removed'])}")
+    if summary['deleted']:
+        print(f"Deleted: {summary['deleted']}")
+    elif summary['removed'] and not summary['dry_run']:
+        print("  (kept; run with --prune to delete them)")
+    print(f"Rejected: {summary['rejected']}")
+    print("=" * 50)
+
+
 def main():
     """Main entry point"""
     if len(sys.argv) < 2:
-        print("Usage: python license_reminder_oracle.py [upload|check|schedule|stats]")
+        print("Usage: python license_reminder_oracle.py [upload|check|drain|schedule|stats|repair]")
+        print("       python license_reminder_oracle.py upload [excel_path] [--dry-run] [--prune]")
+        print("       python license_reminder_oracle.py drain [--digest]")
         sys.exit(1)
     
     command = sys.argv[1].lower()
@@ -538,16 +746,31 @@ def main():
         system = LicenseReminderOracleSystem()
         
         if command == 'upload':
-            print("Uploading Excel data to Oracle...")
-            if system.upload_excel_data():
-                print("✅ Upload successful!")
+            options = [arg for arg in sys.argv[2:] if arg.startswith('--')]
+            paths = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+            dry_run = '--dry-run' in options
+            
+            print("Previewing Excel import (dry run)..." if dry_run else "Uploading Excel data to Oracle...")
+            summary = system.upload_excel_data(
+                paths[0] if paths else None, dry_run=dry_run, prune='--prune' in options
+            )
+            if summary:
+                print_import_summary(summary)
+                print("✅ Dry run complete, nothing written." if dry_run else "✅ Upload successful!")
             else:
                 print("❌ Upload failed. Check logs for details.")
         
         elif command == 'check':
             print("Checking for licenses needing reminders...")
-            system.check_and_send_reminders()
-            print("✅ Reminder check complete!")
+            totals = system.check_and_send_reminders()
+            print(f"✅ Reminder check complete: {totals['sent']} sent, {totals['failed']} failed, "
+                  f"{totals['pending']} to retry")
+        
+        elif command == 'drain':
+            print("Sending queued reminders from EMAIL_OUTBOX...")
+            totals = system.drain_email_outbox(digest=EMAIL_DIGEST or '--digest' in sys.argv[2:])
+            print(f"✅ Outbox drained: {totals['sent']} sent, {totals['failed']} failed, "
+                  f"{totals['pending']} to retry")
         
         elif command == 'schedule':
             print("Starting scheduler...")
@@ -561,9 +784,17 @@ def main():
                 print(f"{key.replace('_', ' ').title()}: {value}")
             print("=" * 50)
         
+        elif command == 'repair':
+            print("Recomputing next reminder dates...")
+            repaired = system.repair_next_reminders()
+            if repaired >= 0:
+                print(f"✅ Next reminder recomputed for {repaired} licenses")
+            else:
+                print("❌ Repair failed. Check logs for details.")
+        
         else:
             print(f"Unknown command: {command}")
-            print("Available commands: upload, check, schedule, stats")
+            print("Available commands: upload, check, drain, schedule, stats, repair")
             sys.exit(1)
             
     except Exception as e:
@@ -7,8 +7,8 @@ Uploads Excel data to Supabase and sends automated email reminders
 
 import os
 import sys
+import numpy as np
 import pandas as pd
-import smtplib
 import schedule
 import time
 from datetime import datetime, timedelta
@@ -19,6 +19,9 @@ from supabase import create_client, Client
 from typing import List, Dict, Optional
 import logging
 
+from excel_stream import iter_excel_chunks
+from api.mail_transport import SMTPSenderPool
+
 # Load environment variables
 load_dotenv()
 
@@ -45,6 +48,7 @@ class LicenseReminderSystem:
         self.from_email = os.getenv('FROM_EMAIL')
         self.from_name = os.getenv('FROM_NAME', 'License Reminder System')
         self.excel_file_path = os.getenv('EXCEL_FILE_PATH', 'licenses.xlsx')
+        self.upsert_chunk_size = int(os.getenv('SUPABASE_UPSERT_CHUNK_SIZE', '500'))
         self.company_name = os.getenv('COMPANY_NAME', 'MSMM Engineering')
         self.company_website = os.getenv('COMPANY_WEBSITE', 'https://www.msmmeng.com')
         self.support_email = os.getenv('SUPPORT_EMAIL', 'support@msmmeng.com')
@@ -56,82 +60,61 @@ class LicenseReminderSystem:
         
         # Initialize Supabase client
         self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
+        
+        # Parallel SMTP sessions opened on the first send and closed after each reminder run
+        self.mail_pool = SMTPSenderPool(self.smtp_server, self.smtp_port,
+                                        self.email_username, self.email_password)
         logger.info("License Reminder System initialized successfully")
 
+    def clean_excel_records(self, df: pd.DataFrame) -> List[Dict]:
+        """Clean one chunk of Excel rows into license records for Supabase"""
+        # Clean and prepare data
+        df = df.dropna(subset=['LIC_ID'])  # Remove rows without license ID (LIC_ID used for data validation only)
+        
+        # Convert dates to string format for Supabase
+        date_columns = ['FIRST_ISSUE_DATE', 'EXPIRATION_DATE']
+        for col in date_columns:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
+        
+        # Convert column names to lowercase for database
+        df.columns = df.columns.str.lower()
+        
+        # Numeric columns: whole numbers, anything unparseable becomes None
+        for col in ['lic_id', 'ascem_no']:
+            if col in df.columns:
+                numbers = pd.to_numeric(df[col], errors='coerce')
+                numbers = numbers.where(np.isfinite(numbers))
+                df[col] = np.trunc(numbers).astype('Int64')
+        
+        # Replace all NaN, NaT, inf and -inf (and text cells reading 'nan') with None
+        df = df.replace([np.inf, -np.inf], np.nan).astype(object)
+        missing = df.isna() | (df.astype(str).apply(lambda col: col.str.lower()) == 'nan')
+        df = df.where(~missing, None)
+        
+        df = df.dropna(subset=['lic_id'])
+        # Last row wins when a LIC_ID repeats (one upsert can't touch a row twice)
+        df = df.drop_duplicates(subset=['lic_id'], keep='last')
+        
+        # Convert DataFrame to list of dictionaries
+        return df.to_dict('records')
+
     def upload_excel_to_supabase(self) -> bool:
         """Upload Excel data to Supabase"""
         try:
             logger.info(f"Reading Excel file: {self.excel_file_path}")
-            df = pd.read_excel(self.excel_file_path)
-            
-            # Clean and prepare data
-            df = df.dropna(subset=['LIC_ID'])  # Remove rows without license ID (LIC_ID used for data validation only)
-            
-            # Convert dates to string format for Supabase
-            date_columns = ['FIRST_ISSUE_DATE', 'EXPIRATION_DATE']
-            for col in date_columns:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-                    df[col] = df[col].dt.strftime('%Y-%m-%d')
-                    df[col] = df[col].replace('NaT', None)
-            
-            # Convert column names to lowercase for database
-            df.columns = df.columns.str.lower()
-            
-            # Handle NaN values more thoroughly
-            # Replace all NaN, inf, -inf with None
-            df = df.replace([float('inf'), float('-inf')], None)
-            df = df.where(pd.notna(df), None)
-            
-            # Convert DataFrame to list of dictionaries
-            records = df.to_dict('records')
-            
-            # Additional cleaning for each record
-            cleaned_records = []
-            for record in records:
-                cleaned_record = {}
-                for key, value in record.items():
-                    # Handle different types of invalid values
-                    if pd.isna(value) or value == 'nan' or str(value).lower() == 'nan':
-                        cleaned_record[key] = None
-                    elif isinstance(value, float) and (value != value):  # Check for NaN
-                        cleaned_record[key] = None
-                    else:
-                        # Special handling for numeric columns
-                        if key in ['lic_id', 'ascem_no'] and value is not None:
-                            try:
-                                # Convert to int if it's a valid number
-                                cleaned_record[key] = int(float(value))
-                            except (ValueError, TypeError):
-                                cleaned_record[key] = None
-                        else:
-                            cleaned_record[key] = value
-                cleaned_records.append(cleaned_record)
-            
-            logger.info(f"Uploading {len(cleaned_records)} records to Supabase")
-            
-            # Clear existing data and insert new data
-            # First, get existing records to avoid duplicates
-            existing_result = self.supabase.table('licenses').select('lic_id').execute()
-            existing_lic_ids = {row['lic_id'] for row in existing_result.data}
-            
-            # Filter out existing records
-            new_records = [record for record in cleaned_records if record['lic_id'] not in existing_lic_ids]
-            
-            if new_records:
-                result = self.supabase.table('licenses').insert(new_records).execute()
-                logger.info(f"Successfully uploaded {len(new_records)} new records")
-            else:
-                logger.info("No new records to upload")
-                
-            # Update existing records if needed
-            existing_records = [record for record in cleaned_records if record['lic_id'] in existing_lic_ids]
-            for record in existing_records:
-                self.supabase.table('licenses').update(record).eq('lic_id', record['lic_id']).execute()
+            uploaded = 0
             
-            if existing_records:
-                logger.info(f"Updated {len(existing_records)} existing records")
+            # Stream the sheet a chunk at a time: clean it, then insert new licenses
+            # and update existing ones with one upsert request per chunk
+            for df in iter_excel_chunks(self.excel_file_path, self.upsert_chunk_size):
+                records = self.clean_excel_records(df)
+                if records:
+                    self.supabase.table('licenses').upsert(records, on_conflict='lic_id').execute()
+                    uploaded += len(records)
+                    logger.info(f"Upserted {uploaded} records so far")
             
+            logger.info(f"Uploaded {uploaded} records to Supabase")
             return True
             
         except Exception as e:
@@ -269,15 +252,8 @@ RECOMMENDED ACTIONS:
             # Add body to email
             msg.attach(MIMEText(body, 'plain'))
             
-            # Setup SMTP server
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_username, self.email_password)
-            
-            # Send email
-            text = msg.as_string()
-            server.sendmail(self.from_email, to_emails, text)
-            server.quit()
+            # Send email over this worker's SMTP session
+            self.mail_pool.send(msg, self.from_email, to_emails)
             
             logger.info(f"Email sent successfully to: {', '.join(to_emails)}")
             return True
@@ -317,6 +293,43 @@ RECOMMENDED ACTIONS:
             logger.error(f"Error recording reminder: {str(e)}")
             return False
 
+    def process_reminder(self, license_data: Dict) -> bool:
+        """Send and record the reminder for one license"""
+        try:
+            # Parse email addresses
+            email_addresses = self.parse_email_addresses(license_data.get('lic_notify_names'))
+            
+            if not email_addresses:
+                logger.warning(f"No valid email addresses for license {license_data['lic_id']}")
+                return False
+            
+            # Create email content
+            subject, body = self.create_email_content(license_data, license_data['reminder_type'])
+            
+            # Send email
+            email_sent = self.send_email(email_addresses, subject, body)
+            
+            # Record the reminder attempt
+            self.record_reminder_sent(
+                license_data['id'],
+                license_data['reminder_type'],
+                email_addresses,
+                subject,
+                body,
+                'sent' if email_sent else 'failed'
+            )
+            
+            if email_sent:
+                logger.info(f"Reminder sent for {license_data['lic_name']} - {license_data['reminder_type']}")
+            else:
+                logger.error(f"Failed to send reminder for {license_data['lic_name']}")
+            
+            return email_sent
+            
+        except Exception as e:
+            logger.error(f"Error processing reminder for license {license_data.get('lic_id')}: {str(e)}")
+            return False
+
     def process_reminders(self):
         """Process and send all pending reminders"""
         logger.info("Starting reminder processing...")
@@ -330,40 +343,12 @@ RECOMMENDED ACTIONS:
         
         logger.info(f"Found {len(licenses)} licenses needing reminders")
         
-        for license_data in licenses:
-            try:
-                # Parse email addresses
-                email_addresses = self.parse_email_addresses(license_data.get('lic_notify_names'))
-                
-                if not email_addresses:
-                    logger.warning(f"No valid email addresses for license {license_data['lic_id']}")
-                    continue
-                
-                # Create email content
-                subject, body = self.create_email_content(license_data, license_data['reminder_type'])
-                
-                # Send email
-                email_sent = self.send_email(email_addresses, subject, body)
-                
-                # Record the reminder attempt
-                self.record_reminder_sent(
-                    license_data['id'],
-                    license_data['reminder_type'],
-                    email_addresses,
-                    subject,
-                    body,
-                    'sent' if email_sent else 'failed'
-                )
-                
-                if email_sent:
-                    logger.info(f"Reminder sent for {license_data['lic_name']} - {license_data['reminder_type']}")
-                else:
-                    logger.error(f"Failed to send reminder for {license_data['lic_name']}")
-                
-            except Exception as e:
-                logger.error(f"Error processing reminder for license {license_data.get('lic_id')}: {str(e)}")
+        # Reminders are sent (and recorded) on the pool's worker threads
+        with self.mail_pool:
+            results = list(self.mail_pool.map(self.process_reminder, licenses))
         
-        logger.info("Reminder processing completed")
+        logger.info(f"Reminder processing completed: {sum(results)} sent, "
+                    f"{len(results) - sum(results)} failed over {self.mail_pool.connections} SMTP connection(s)")
 
     def run_daily_check(self):
         """Run daily check for reminders"""
@@ -18,10 +18,87 @@ CREATE TABLE "MSMM DASHBOARD".EMAIL_REMINDERS (
 -- (Uncomment if needed)
 -- ALTER TABLE "MSMM DASHBOARD".LICENSES ADD EMAIL_ENABLED NUMBER(1) DEFAULT 1;
 
+-- Precomputed next due reminder, maintained by the application
+-- (run "python license_reminder_oracle.py repair" after adding to fill it)
+ALTER TABLE "MSMM DASHBOARD".LICENSES ADD (NEXT_REMINDER_DATE DATE, NEXT_REMINDER_TYPE VARCHAR2(50));
+CREATE INDEX "MSMM DASHBOARD".IDX_LICENSES_NEXT_REMINDER ON "MSMM DASHBOARD".LICENSES(NEXT_REMINDER_DATE);
+
+-- Content hash of the imported Excel columns; unchanged rows are skipped on re-import
+-- (cleared by the web app's edits so the next upload rewrites those rows)
+ALTER TABLE "MSMM DASHBOARD".LICENSES ADD ROW_HASH VARCHAR2(40);
+
+-- Rendered reminders waiting to be sent; drain workers claim rows with FOR UPDATE SKIP LOCKED
+-- (one row per license, reminder type and reminder date, so re-running selection never queues twice)
+CREATE TABLE "MSMM DASHBOARD".EMAIL_OUTBOX (
+    ID NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    LICENSE_ID NUMBER NOT NULL,
+    REMINDER_TYPE VARCHAR2(50) NOT NULL,
+    REMINDER_DATE DATE NOT NULL,
+    EXPIRATION_DATE DATE,
+    EMAIL_FROM VARCHAR2(500),
+    EMAIL_TO VARCHAR2(500),
+    EMAIL_SUBJECT VARCHAR2(500),
+    EMAIL_BODY CLOB,
+    BODY_TYPE VARCHAR2(10) DEFAULT 'plain',
+    STATUS VARCHAR2(20) DEFAULT 'pending' NOT NULL,
+    ATTEMPTS NUMBER DEFAULT 0 NOT NULL,
+    AVAILABLE_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    CLAIMED_AT TIMESTAMP,
+    SENT_AT TIMESTAMP,
+    LAST_ERROR VARCHAR2(1000),
+    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT UQ_EMAIL_OUTBOX_REMINDER UNIQUE (LICENSE_ID, REMINDER_TYPE, REMINDER_DATE)
+);
+CREATE INDEX "MSMM DASHBOARD".IDX_EMAIL_OUTBOX_STATUS ON "MSMM DASHBOARD".EMAIL_OUTBOX(STATUS, AVAILABLE_AT);
+
+-- Change counters behind the API ETags: every write statement on a table bumps its row
+CREATE TABLE "MSMM DASHBOARD".DATA_VERSIONS (
+    TABLE_NAME VARCHAR2(128) PRIMARY KEY,
+    VERSION NUMBER DEFAULT 0 NOT NULL,
+    CHANGED_AT DATE DEFAULT SYSDATE NOT NULL
+);
+INSERT INTO "MSMM DASHBOARD".DATA_VERSIONS (TABLE_NAME) VALUES ('LICENSES');
+INSERT INTO "MSMM DASHBOARD".DATA_VERSIONS (TABLE_NAME) VALUES ('EMAIL_REMINDERS');
+
+CREATE OR REPLACE TRIGGER "MSMM DASHBOARD".TRG_LICENSES_VERSION
+AFTER INSERT OR UPDATE OR DELETE ON "MSMM DASHBOARD".LICENSES
+BEGIN
+    UPDATE "MSMM DASHBOARD".DATA_VERSIONS
+    SET VERSION = VERSION + 1, CHANGED_AT = SYSDATE
+    WHERE TABLE_NAME = 'LICENSES';
+END;
+/
+
+CREATE OR REPLACE TRIGGER "MSMM DASHBOARD".TRG_EMAIL_REMINDERS_VERSION
+AFTER INSERT OR UPDATE OR DELETE ON "MSMM DASHBOARD".EMAIL_REMINDERS
+BEGIN
+    UPDATE "MSMM DASHBOARD".DATA_VERSIONS
+    SET VERSION = VERSION + 1, CHANGED_AT = SYSDATE
+    WHERE TABLE_NAME = 'EMAIL_REMINDERS';
+END;
+/
+
+-- Allocate LIC_ID from a sequence (set START WITH above the current MAX(LIC_ID))
+-- CREATE SEQUENCE "MSMM DASHBOARD".LICENSES_ID_SEQ START WITH 1;
+-- ALTER TABLE "MSMM DASHBOARD".LICENSES MODIFY LIC_ID DEFAULT "MSMM DASHBOARD".LICENSES_ID_SEQ.NEXTVAL;
+
 -- Create index for better query performance
 CREATE INDEX IDX_EMAIL_REMINDERS_LICENSE_ID ON "MSMM DASHBOARD".EMAIL_REMINDERS(LICENSE_ID);
 CREATE INDEX IDX_EMAIL_REMINDERS_SENT_DATE ON "MSMM DASHBOARD".EMAIL_REMINDERS(SENT_DATE);
 
+-- Composite index so the reminder dedupe NOT EXISTS checks are answered from the index alone
+CREATE INDEX "MSMM DASHBOARD".IDX_EMAIL_REM_DEDUPE ON "MSMM DASHBOARD".EMAIL_REMINDERS(LICENSE_ID, REMINDER_TYPE, SENT_DATE);
+
+-- Index for the EXPIRATION_DATE range predicates used by the views and reminder checks
+CREATE INDEX "MSMM DASHBOARD".IDX_LICENSES_EXPIRATION_DATE ON "MSMM DASHBOARD".LICENSES(EXPIRATION_DATE);
+
+-- Composite (sort column, id) indexes so each keyset-paginated page is one index range scan
+CREATE INDEX "MSMM DASHBOARD".IDX_LICENSES_EXP_ID ON "MSMM DASHBOARD".LICENSES(EXPIRATION_DATE, LIC_ID);
+CREATE INDEX "MSMM DASHBOARD".IDX_LICENSES_NAME_ID ON "MSMM DASHBOARD".LICENSES(LIC_NAME, LIC_ID);
+CREATE INDEX "MSMM DASHBOARD".IDX_LICENSES_TYPE_ID ON "MSMM DASHBOARD".LICENSES(LIC_TYPE, LIC_ID);
+CREATE INDEX "MSMM DASHBOARD".IDX_LICENSES_STATE_ID ON "MSMM DASHBOARD".LICENSES(LIC_STATE, LIC_ID);
+CREATE INDEX "MSMM DASHBOARD".IDX_EMAIL_REM_SENT_ID ON "MSMM DASHBOARD".EMAIL_REMINDERS(SENT_DATE, ID);
+
 -- Create view: licenses_needing_reminders
 CREATE OR REPLACE VIEW "MSMM DASHBOARD".LICENSES_NEEDING_REMINDERS AS
 WITH reminder_status AS (
@@ -49,7 +126,11 @@ WITH reminder_status AS (
         AND LENGTH(TRIM(l.LIC_NOTIFY_NAMES)) > 0
         AND NVL(l.EMAIL_ENABLED, 1) = 1
         AND (
-            TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) IN (60, 30, 15, 7, 1)
+            (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 60 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 61)
+            OR (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 30 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 31)
+            OR (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 15 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 16)
+            OR (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 7 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 8)
+            OR (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 1 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 2)
             OR l.EXPIRATION_DATE < SYSDATE
         )
 ),
@@ -59,7 +140,7 @@ recent_reminders AS (
         er.REMINDER_TYPE,
         MAX(er.SENT_DATE) as last_sent_date
     FROM "MSMM DASHBOARD".EMAIL_REMINDERS er
-    WHERE TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
+    WHERE er.SENT_DATE >= TRUNC(SYSDATE) - 7
     GROUP BY er.LICENSE_ID, er.REMINDER_TYPE
 )
 SELECT 
@@ -78,10 +159,10 @@ LEFT JOIN recent_reminders rr
     AND rs.reminder_type = rr.REMINDER_TYPE
     AND (
         (rs.reminder_type IN ('60_days', '30_days', '15_days', '7_days', '1_day') 
-         AND TRUNC(rr.last_sent_date) = TRUNC(SYSDATE))
+         AND rr.last_sent_date >= TRUNC(SYSDATE))
         OR 
         (rs.reminder_type = 'overdue_daily' 
-         AND TRUNC(rr.last_sent_date) = TRUNC(SYSDATE))
+         AND rr.last_sent_date >= TRUNC(SYSDATE))
     )
 WHERE rr.LICENSE_ID IS NULL
 ORDER BY rs.days_until_expiration, rs.lic_name;
@@ -139,6 +220,7 @@ ORDER BY l.EXPIRATION_DATE;
 -- GRANT SELECT ON "MSMM DASHBOARD".OVERDUE_LICENSES TO your_app_user;
 -- GRANT SELECT ON "MSMM DASHBOARD".UPCOMING_EXPIRATIONS TO your_app_user;
 -- GRANT ALL ON "MSMM DASHBOARD".EMAIL_REMINDERS TO your_app_user;
+-- GRANT ALL ON "MSMM DASHBOARD".EMAIL_OUTBOX TO your_app_user;
 
 -- Verify the setup
 SELECT 'LICENSES table row count:' as info, COUNT(*) as count FROM "MSMM DASHBOARD".LICENSES
@@ -7,9 +7,80 @@ import os
 from dotenv import load_dotenv
 import oracledb
 
+from api.reminder_schedule import next_reminder_update_sql
+
 # Load environment variables
 load_dotenv()
 
+# Execution plans captured before and after setup are written here
+PLAN_OUTPUT_FILE = os.getenv('ORACLE_PLAN_OUTPUT', 'oracle_setup_plans.txt')
+
+# Tables whose writes are counted in DATA_VERSIONS (see get_data_fingerprint in api/index.py)
+VERSIONED_TABLES = ('LICENSES', 'EMAIL_REMINDERS')
+
+# Composite (sort column, id) indexes serving the keyset-paginated lists in api/index.py
+KEYSET_INDEXES = {
+    'IDX_LICENSES_EXP_ID': ('LICENSES', 'EXPIRATION_DATE, LIC_ID'),
+    'IDX_LICENSES_NAME_ID': ('LICENSES', 'LIC_NAME, LIC_ID'),
+    'IDX_LICENSES_TYPE_ID': ('LICENSES', 'LIC_TYPE, LIC_ID'),
+    'IDX_LICENSES_STATE_ID': ('LICENSES', 'LIC_STATE, LIC_ID'),
+    'IDX_EMAIL_REM_SENT_ID': ('EMAIL_REMINDERS', 'SENT_DATE, ID'),
+}
+
+# Queries whose plans are compared before and after setup
+PLAN_QUERIES = {
+    'LICENSES_NEEDING_REMINDERS': 'SELECT * FROM "{schema}".LICENSES_NEEDING_REMINDERS',
+    'OVERDUE_LICENSES': 'SELECT * FROM "{schema}".OVERDUE_LICENSES',
+    'UPCOMING_EXPIRATIONS': 'SELECT * FROM "{schema}".UPCOMING_EXPIRATIONS',
+    'REMINDER_DEDUPE': """
+        SELECT 1 FROM "{schema}".EMAIL_REMINDERS er
+        WHERE er.LICENSE_ID = 0
+        AND er.REMINDER_TYPE = '30_days'
+        AND er.SENT_DATE >= TRUNC(SYSDATE) - 7
+    """,
+}
+
+
+def sync_license_id_sequence(cursor, schema):
+    """Move LICENSES_ID_SEQ past the highest LIC_ID.
+    
+    Needed whenever rows were inserted with explicit IDs (e.g. an Excel import),
+    so the next sequence-allocated ID cannot collide with them.
+    """
+    cursor.execute(f'SELECT NVL(MAX(LIC_ID), 0) FROM "{schema}".LICENSES')
+    max_id = cursor.fetchone()[0]
+    cursor.execute(f'SELECT "{schema}".LICENSES_ID_SEQ.NEXTVAL FROM DUAL')
+    next_value = cursor.fetchone()[0]
+    
+    if next_value <= max_id:
+        cursor.execute(f'ALTER SEQUENCE "{schema}".LICENSES_ID_SEQ INCREMENT BY {max_id - next_value + 1}')
+        cursor.execute(f'SELECT "{schema}".LICENSES_ID_SEQ.NEXTVAL FROM DUAL')
+        cursor.execute(f'ALTER SEQUENCE "{schema}".LICENSES_ID_SEQ INCREMENT BY 1')
+        return True
+    return False
+
+
+def capture_plans(cursor, schema, label):
+    """Return the EXPLAIN PLAN output for each of PLAN_QUERIES as text"""
+    sections = []
+    for name, query in PLAN_QUERIES.items():
+        statement_id = f"{label}_{name}"[:30]
+        sections.append(f"---- {name} ({label}) ----")
+        try:
+            cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {query.format(schema=schema)}")
+            cursor.execute(
+                "SELECT PLAN_TABLE_OUTPUT FROM TABLE(DBMS_XPLAN.DISPLAY(NULL, :statement_id, 'TYPICAL'))",
+                {'statement_id': statement_id}
+            )
+            sections.extend(row[0] for row in cursor.fetchall())
+            cursor.execute("DELETE FROM PLAN_TABLE WHERE STATEMENT_ID = :statement_id",
+                           {'statement_id': statement_id})
+        except oracledb.Error as e:
+            # The view may not exist yet on a fresh database
+            sections.append(f"(no plan: {e})")
+        sections.append("")
+    return "\n".join(sections)
+
 
 def setup_oracle_database():
     """Create necessary tables and views in Oracle"""
@@ -36,6 +107,8 @@ def setup_oracle_database():
         cursor = connection.cursor()
         print("✓ Connected to Oracle as SYS")
         
+        plans_before = capture_plans(cursor, schema, 'before')
+        
         # Check if EMAIL_REMINDERS table exists
         cursor.execute(f"""
             SELECT COUNT(*) FROM ALL_TABLES 
@@ -74,6 +147,23 @@ def setup_oracle_database():
         else:
             print("✓ EMAIL_REMINDERS table already exists")
         
+        # Check if the composite dedupe index exists (NOT EXISTS checks in the reminder queries)
+        cursor.execute("""
+            SELECT COUNT(*) FROM ALL_INDEXES 
+            WHERE OWNER = :owner AND INDEX_NAME = 'IDX_EMAIL_REM_DEDUPE'
+        """, {'owner': schema})
+        dedupe_index_exists = cursor.fetchone()[0]
+        
+        if not dedupe_index_exists:
+            print("\nCreating (LICENSE_ID, REMINDER_TYPE, SENT_DATE) index on EMAIL_REMINDERS...")
+            cursor.execute(f"""
+                CREATE INDEX "{schema}".IDX_EMAIL_REM_DEDUPE 
+                ON "{schema}".EMAIL_REMINDERS(LICENSE_ID, REMINDER_TYPE, SENT_DATE)
+            """)
+            print("✓ IDX_EMAIL_REM_DEDUPE index created")
+        else:
+            print("✓ IDX_EMAIL_REM_DEDUPE index already exists")
+        
         # Check if EMAIL_ENABLED column exists in LICENSES table
         cursor.execute(f"""
             SELECT COUNT(*) FROM ALL_TAB_COLUMNS 
@@ -94,6 +184,206 @@ def setup_oracle_database():
         else:
             print("✓ EMAIL_ENABLED column already exists")
         
+        # Check if the NEXT_REMINDER_DATE / NEXT_REMINDER_TYPE columns exist
+        cursor.execute("""
+            SELECT COUNT(*) FROM ALL_TAB_COLUMNS 
+            WHERE OWNER = :owner 
+            AND TABLE_NAME = 'LICENSES' 
+            AND COLUMN_NAME = 'NEXT_REMINDER_DATE'
+        """, {'owner': schema})
+        next_reminder_exists = cursor.fetchone()[0]
+        
+        if not next_reminder_exists:
+            print("\nAdding NEXT_REMINDER_DATE / NEXT_REMINDER_TYPE columns to LICENSES table...")
+            cursor.execute(f"""
+                ALTER TABLE "{schema}".LICENSES 
+                ADD (NEXT_REMINDER_DATE DATE, NEXT_REMINDER_TYPE VARCHAR2(50))
+            """)
+            cursor.execute(f"""
+                CREATE INDEX "{schema}".IDX_LICENSES_NEXT_REMINDER 
+                ON "{schema}".LICENSES(NEXT_REMINDER_DATE)
+            """)
+            cursor.execute(next_reminder_update_sql(schema))
+            print(f"✓ NEXT_REMINDER columns added and computed for {cursor.rowcount} licenses")
+            connection.commit()
+        else:
+            print("✓ NEXT_REMINDER columns already exist")
+        
+        # Check if the ROW_HASH column exists (incremental Excel imports)
+        cursor.execute("""
+            SELECT COUNT(*) FROM ALL_TAB_COLUMNS 
+            WHERE OWNER = :owner 
+            AND TABLE_NAME = 'LICENSES' 
+            AND COLUMN_NAME = 'ROW_HASH'
+        """, {'owner': schema})
+        row_hash_exists = cursor.fetchone()[0]
+        
+        if not row_hash_exists:
+            print("\nAdding ROW_HASH column to LICENSES table...")
+            cursor.execute(f"""
+                ALTER TABLE "{schema}".LICENSES 
+                ADD ROW_HASH VARCHAR2(40)
+            """)
+            print("✓ ROW_HASH column added (filled by the next upload)")
+        else:
+            print("✓ ROW_HASH column already exists")
+        
+        # Check if the EMAIL_OUTBOX table exists (queued reminders, see api/outbox.py)
+        cursor.execute("""
+            SELECT COUNT(*) FROM ALL_TABLES 
+            WHERE OWNER = :owner AND TABLE_NAME = 'EMAIL_OUTBOX'
+        """, {'owner': schema})
+        outbox_exists = cursor.fetchone()[0]
+        
+        if not outbox_exists:
+            print("\nCreating EMAIL_OUTBOX table...")
+            cursor.execute(f"""
+                CREATE TABLE "{schema}".EMAIL_OUTBOX (
+                    ID NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    LICENSE_ID NUMBER NOT NULL,
+                    REMINDER_TYPE VARCHAR2(50) NOT NULL,
+                    REMINDER_DATE DATE NOT NULL,
+                    EXPIRATION_DATE DATE,
+                    EMAIL_FROM VARCHAR2(500),
+                    EMAIL_TO VARCHAR2(500),
+                    EMAIL_SUBJECT VARCHAR2(500),
+                    EMAIL_BODY CLOB,
+                    BODY_TYPE VARCHAR2(10) DEFAULT 'plain',
+                    STATUS VARCHAR2(20) DEFAULT 'pending' NOT NULL,
+                    ATTEMPTS NUMBER DEFAULT 0 NOT NULL,
+                    AVAILABLE_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                    CLAIMED_AT TIMESTAMP,
+                    SENT_AT TIMESTAMP,
+                    LAST_ERROR VARCHAR2(1000),
+                    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    CONSTRAINT UQ_EMAIL_OUTBOX_REMINDER UNIQUE (LICENSE_ID, REMINDER_TYPE, REMINDER_DATE)
+                )
+            """)
+            cursor.execute(f"""
+                CREATE INDEX "{schema}".IDX_EMAIL_OUTBOX_STATUS 
+                ON "{schema}".EMAIL_OUTBOX(STATUS, AVAILABLE_AT)
+            """)
+            print("✓ EMAIL_OUTBOX table created")
+        else:
+            print("✓ EMAIL_OUTBOX table already exists")
+            
+            # Check if the EXPIRATION_DATE snapshot column exists (stale reminder detection)
+            cursor.execute("""
+                SELECT COUNT(*) FROM ALL_TAB_COLUMNS 
+                WHERE OWNER = :owner 
+                AND TABLE_NAME = 'EMAIL_OUTBOX' 
+                AND COLUMN_NAME = 'EXPIRATION_DATE'
+            """, {'owner': schema})
+            outbox_expiration_exists = cursor.fetchone()[0]
+            
+            if not outbox_expiration_exists:
+                print("\nAdding EXPIRATION_DATE column to EMAIL_OUTBOX table...")
+                cursor.execute(f"""
+                    ALTER TABLE "{schema}".EMAIL_OUTBOX 
+                    ADD EXPIRATION_DATE DATE
+                """)
+                print("✓ EXPIRATION_DATE column added")
+            else:
+                print("✓ EMAIL_OUTBOX EXPIRATION_DATE column already exists")
+        
+        # Check if the DATA_VERSIONS table exists (change counters behind the API ETags)
+        cursor.execute("""
+            SELECT COUNT(*) FROM ALL_TABLES 
+            WHERE OWNER = :owner AND TABLE_NAME = 'DATA_VERSIONS'
+        """, {'owner': schema})
+        versions_exists = cursor.fetchone()[0]
+        
+        if not versions_exists:
+            print("\nCreating DATA_VERSIONS table...")
+            cursor.execute(f"""
+                CREATE TABLE "{schema}".DATA_VERSIONS (
+                    TABLE_NAME VARCHAR2(128) PRIMARY KEY,
+                    VERSION NUMBER DEFAULT 0 NOT NULL,
+                    CHANGED_AT DATE DEFAULT SYSDATE NOT NULL
+                )
+            """)
+            print("✓ DATA_VERSIONS table created")
+        else:
+            print("✓ DATA_VERSIONS table already exists")
+        
+        # Every write statement on a versioned table bumps its counter, whichever app ran it
+        for table_name in VERSIONED_TABLES:
+            cursor.execute(f"""
+                MERGE INTO "{schema}".DATA_VERSIONS v
+                USING (SELECT :table_name AS TABLE_NAME FROM DUAL) s
+                ON (v.TABLE_NAME = s.TABLE_NAME)
+                WHEN NOT MATCHED THEN INSERT (TABLE_NAME) VALUES (s.TABLE_NAME)
+            """, {'table_name': table_name})
+            cursor.execute(f"""
+                CREATE OR REPLACE TRIGGER "{schema}".TRG_{table_name}_VERSION
+                AFTER INSERT OR UPDATE OR DELETE ON "{schema}".{table_name}
+                BEGIN
+                    UPDATE "{schema}".DATA_VERSIONS
+                    SET VERSION = VERSION + 1, CHANGED_AT = SYSDATE
+                    WHERE TABLE_NAME = '{table_name}';
+                END;
+            """)
+        print(f"✓ Change counter triggers created on {', '.join(VERSIONED_TABLES)}")
+        
+        # Check if LIC_ID is allocated from a sequence
+        cursor.execute("""
+            SELECT COUNT(*) FROM ALL_SEQUENCES 
+            WHERE SEQUENCE_OWNER = :owner AND SEQUENCE_NAME = 'LICENSES_ID_SEQ'
+        """, {'owner': schema})
+        sequence_exists = cursor.fetchone()[0]
+        
+        if not sequence_exists:
+            print("\nCreating LICENSES_ID_SEQ sequence for LIC_ID...")
+            cursor.execute(f'SELECT NVL(MAX(LIC_ID), 0) + 1 FROM "{schema}".LICENSES')
+            start_with = cursor.fetchone()[0]
+            cursor.execute(f'CREATE SEQUENCE "{schema}".LICENSES_ID_SEQ START WITH {start_with}')
+            cursor.execute(f"""
+                ALTER TABLE "{schema}".LICENSES 
+                MODIFY LIC_ID DEFAULT "{schema}".LICENSES_ID_SEQ.NEXTVAL
+            """)
+            print(f"✓ LICENSES_ID_SEQ created starting at {start_with} and set as LIC_ID default")
+        elif sync_license_id_sequence(cursor, schema):
+            print("✓ LICENSES_ID_SEQ advanced past existing LIC_ID values")
+        else:
+            print("✓ LICENSES_ID_SEQ already exists")
+        
+        # Check if EXPIRATION_DATE is indexed (reminder and dashboard range predicates)
+        cursor.execute("""
+            SELECT COUNT(*) FROM ALL_IND_COLUMNS 
+            WHERE TABLE_OWNER = :owner 
+            AND TABLE_NAME = 'LICENSES' 
+            AND COLUMN_NAME = 'EXPIRATION_DATE'
+            AND COLUMN_POSITION = 1
+        """, {'owner': schema})
+        index_exists = cursor.fetchone()[0]
+        
+        if not index_exists:
+            print("\nCreating EXPIRATION_DATE index on LICENSES table...")
+            cursor.execute(f"""
+                CREATE INDEX "{schema}".IDX_LICENSES_EXPIRATION_DATE 
+                ON "{schema}".LICENSES(EXPIRATION_DATE)
+            """)
+            print("✓ IDX_LICENSES_EXPIRATION_DATE index created")
+        else:
+            print("✓ EXPIRATION_DATE index already exists")
+        
+        # Check the keyset pagination indexes (one range scan per page, whatever the table size)
+        for index_name, (table_name, columns) in KEYSET_INDEXES.items():
+            cursor.execute("""
+                SELECT COUNT(*) FROM ALL_INDEXES 
+                WHERE OWNER = :owner AND INDEX_NAME = :index_name
+            """, {'owner': schema, 'index_name': index_name})
+            if cursor.fetchone()[0]:
+                print(f"✓ {index_name} index already exists")
+                continue
+            
+            print(f"\nCreating {index_name} index on {table_name}({columns})...")
+            cursor.execute(f"""
+                CREATE INDEX "{schema}".{index_name} 
+                ON "{schema}".{table_name}({columns})
+            """)
+            print(f"✓ {index_name} index created")
+        
         # Create or replace views
         print("\nCreating/updating views...")
         
@@ -125,7 +415,11 @@ def setup_oracle_database():
                     AND LENGTH(TRIM(l.LIC_NOTIFY_NAMES)) > 0
                     AND NVL(l.EMAIL_ENABLED, 1) = 1
                     AND (
-                        TRUNC(l.EXPIRATION_DATE) - TRUNC(SYSDATE) IN (60, 30, 15, 7, 1)
+                        (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 60 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 61)
+                        OR (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 30 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 31)
+                        OR (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 15 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 16)
+                        OR (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 7 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 8)
+                        OR (l.EXPIRATION_DATE >= TRUNC(SYSDATE) + 1 AND l.EXPIRATION_DATE < TRUNC(SYSDATE) + 2)
                         OR l.EXPIRATION_DATE < SYSDATE
                     )
             ),
@@ -135,7 +429,7 @@ def setup_oracle_database():
                     er.REMINDER_TYPE,
                     MAX(er.SENT_DATE) as last_sent_date
                 FROM "{schema}".EMAIL_REMINDERS er
-                WHERE TRUNC(er.SENT_DATE) >= TRUNC(SYSDATE) - 7
+                WHERE er.SENT_DATE >= TRUNC(SYSDATE) - 7
                 GROUP BY er.LICENSE_ID, er.REMINDER_TYPE
             )
             SELECT 
@@ -154,10 +448,10 @@ def setup_oracle_database():
                 AND rs.reminder_type = rr.REMINDER_TYPE
                 AND (
                     (rs.reminder_type IN ('60_days', '30_days', '15_days', '7_days', '1_day') 
-                     AND TRUNC(rr.last_sent_date) = TRUNC(SYSDATE))
+                     AND rr.last_sent_date >= TRUNC(SYSDATE))
                     OR 
                     (rs.reminder_type = 'overdue_daily' 
-                     AND TRUNC(rr.last_sent_date) = TRUNC(SYSDATE))
+                     AND rr.last_sent_date >= TRUNC(SYSDATE))
                 )
             WHERE rr.LICENSE_ID IS NULL
             ORDER BY rs.days_until_expiration, rs.lic_name
@@ -238,6 +532,15 @@ def setup_oracle_database():
             count = cursor.fetchone()[0]
             print(f"✓ {view}: {count} rows")
         
+        # Record execution plans so the effect of the setup can be compared
+        plans_after = capture_plans(cursor, schema, 'after')
+        with open(PLAN_OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            f.write("==== Execution plans BEFORE setup ====\n\n")
+            f.write(plans_before)
+            f.write("\n==== Execution plans AFTER setup ====\n\n")
+            f.write(plans_after)
+        print(f"✓ Execution plans (before/after) written to {PLAN_OUTPUT_FILE}")
+        
         cursor.close()
         connection.close()
         
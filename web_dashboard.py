@@ -5,6 +5,8 @@ Flask-based web UI for viewing upcoming license expirations
 """
 
 import os
+import json
+import base64
 from flask import Flask, render_template, jsonify, request, flash, redirect, url_for
 from dotenv import load_dotenv
 from supabase import create_client, Client
@@ -32,6 +34,18 @@ if not supabase_url or not supabase_key:
 
 supabase: Client = create_client(supabase_url, supabase_key)
 
+# Keyset pagination for the licenses list
+PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE', 100))
+PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 500))
+
+# Allowed sort keys and their columns; 'id' is always the tie-breaker
+LICENSE_SORTS = {
+    'expiration': 'expiration_date',
+    'name': 'lic_name',
+    'type': 'lic_type',
+    'state': 'lic_state'
+}
+
 @app.context_processor
 def inject_current_date():
     """Make current date available to all templates"""
@@ -160,14 +174,83 @@ def get_license_statistics_filtered(upcoming_days=35, critical_days=10, warning_
             'past_due_count': 0
         }
 
-def get_all_licenses():
-    """Get all licenses"""
+def encode_cursor(sort, order, value, row_id):
+    """Encode the last row of a page as an opaque keyset cursor"""
+    payload = json.dumps([sort, order, value, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token, sort, order):
+    """Decode a keyset cursor into (value, row_id), or raise ValueError"""
     try:
-        result = supabase.table('licenses').select('*').order('expiration_date').execute()
+        cursor_sort, cursor_order, value, row_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except Exception:
+        raise ValueError("Invalid page cursor")
+    
+    if cursor_sort != sort or cursor_order != order:
+        raise ValueError("Page cursor does not match the requested sort order")
+    
+    return value, row_id
+
+
+def postgrest_quote(value):
+    """Quote a value for use inside a PostgREST or=(...) filter"""
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def page_url(cursor):
+    """URL for the current view with the given page cursor (None for the first page)"""
+    args = request.args.to_dict()
+    args.pop('cursor', None)
+    if cursor:
+        args['cursor'] = cursor
+    return url_for(request.endpoint, **args)
+
+
+def get_all_licenses(page_size=PAGE_SIZE_DEFAULT, cursor=None, sort='expiration',
+                     order='asc', date_filters=None):
+    """Get one page of licenses ordered by (sort column, id).
+    
+    date_filters is a list of (operator, value) filters on expiration_date.
+    Returns (licenses, next_cursor); next_cursor is None on the last page.
+    """
+    try:
+        column = LICENSE_SORTS.get(sort, LICENSE_SORTS['expiration'])
+        desc = order == 'desc'
+        op = 'lt' if desc else 'gt'
+        
+        query = supabase.table('licenses').select('*')
+        
+        for date_op, value in date_filters or []:
+            query = query.filter('expiration_date', date_op, value)
+        
+        if cursor:
+            value, row_id = cursor
+            if value is None:
+                query = query.is_(column, 'null').filter('id', op, row_id)
+            else:
+                quoted = postgrest_quote(value)
+                query = query.or_(
+                    f"{column}.{op}.{quoted},"
+                    f"and({column}.eq.{quoted},id.{op}.{row_id}),"
+                    f"{column}.is.null"
+                )
+        
+        result = query.order(column, desc=desc, nullsfirst=False)\
+            .order('id', desc=desc)\
+            .limit(page_size + 1)\
+            .execute()
+        
+        rows = result.data
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(sort, order, rows[-1].get(column), rows[-1]['id'])
         
         # Add status calculation to each license
         licenses_with_status = []
-        for license in result.data:
+        for license in rows:
             license_copy = license.copy()
             
             if license_copy.get('expiration_date'):
@@ -197,10 +280,10 @@ def get_all_licenses():
             
             licenses_with_status.append(license_copy)
         
-        return licenses_with_status
+        return licenses_with_status, next_cursor
     except Exception as e:
         logger.error(f"Error fetching all licenses: {e}")
-        return []
+        return [], None
 
 def get_past_due_licenses():
     """Get all past due licenses"""
@@ -288,58 +371,56 @@ def licenses():
     critical_days = int(request.args.get('critical_days', 10))
     warning_days = int(request.args.get('warning_days', 30))
     
-    all_licenses = get_all_licenses()
+    # Get server-side sort and keyset pagination parameters
+    sort = request.args.get('sort', 'expiration')
+    if sort not in LICENSE_SORTS:
+        sort = 'expiration'
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+    page_size = max(1, min(request.args.get('page_size', PAGE_SIZE_DEFAULT, type=int) or PAGE_SIZE_DEFAULT,
+                           PAGE_SIZE_MAX))
+    cursor = None
+    if request.args.get('cursor'):
+        try:
+            cursor = decode_cursor(request.args['cursor'], sort, order)
+        except ValueError as e:
+            flash(f'{e}; showing the first page', 'warning')
     
-    # Apply filtering based on the filter parameter
+    # Translate the filter into expiration_date conditions so it is applied by
+    # the database before pagination
+    today = datetime.now().strftime('%Y-%m-%d')
     if filter_type == 'critical':
         # Show licenses expiring in next critical_days
-        from datetime import datetime, timedelta
         cutoff_date = (datetime.now() + timedelta(days=critical_days)).strftime('%Y-%m-%d')
-        today = datetime.now().strftime('%Y-%m-%d')
-        filtered_licenses = [
-            license for license in all_licenses 
-            if license.get('expiration_date') and license['expiration_date'] <= cutoff_date and license['expiration_date'] >= today
-        ]
+        date_filters = [('gte', today), ('lte', cutoff_date)]
         page_title = f"Critical Licenses (Expiring in {critical_days} Days)"
     elif filter_type == 'warning':
         # Show licenses expiring in next warning_days (but not critical)
-        from datetime import datetime, timedelta
         cutoff_date_warning = (datetime.now() + timedelta(days=warning_days)).strftime('%Y-%m-%d')
         cutoff_date_critical = (datetime.now() + timedelta(days=critical_days)).strftime('%Y-%m-%d')
-        today = datetime.now().strftime('%Y-%m-%d')
-        filtered_licenses = [
-            license for license in all_licenses 
-            if license.get('expiration_date') and license['expiration_date'] <= cutoff_date_warning and license['expiration_date'] > cutoff_date_critical and license['expiration_date'] >= today
-        ]
+        date_filters = [('gte', today), ('gt', cutoff_date_critical), ('lte', cutoff_date_warning)]
         page_title = f"Warning Licenses (Expiring in {critical_days+1}-{warning_days} Days)"
     elif filter_type == 'upcoming':
         # Show licenses expiring in next upcoming_days
-        from datetime import datetime, timedelta
         cutoff_date = (datetime.now() + timedelta(days=upcoming_days)).strftime('%Y-%m-%d')
-        today = datetime.now().strftime('%Y-%m-%d')
-        filtered_licenses = [
-            license for license in all_licenses 
-            if license.get('expiration_date') and license['expiration_date'] <= cutoff_date and license['expiration_date'] >= today
-        ]
+        date_filters = [('gte', today), ('lte', cutoff_date)]
         page_title = f"Upcoming Expirations (Next {upcoming_days} Days)"
     elif filter_type == 'past_due':
         # Show past due licenses
-        from datetime import datetime
-        today = datetime.now().strftime('%Y-%m-%d')
-        filtered_licenses = [
-            license for license in all_licenses 
-            if license.get('expiration_date') and license['expiration_date'] < today
-        ]
+        date_filters = [('lt', today)]
+        page_title = "Past Due Licenses (Expired)"
+    else:
+        date_filters = []
+        page_title = "All Licenses"
+    
+    filtered_licenses, next_cursor = get_all_licenses(page_size, cursor, sort, order, date_filters)
+    
+    if filter_type == 'past_due':
         # Add days overdue calculation
         for license in filtered_licenses:
             if license.get('expiration_date'):
                 exp_date = datetime.strptime(license['expiration_date'], '%Y-%m-%d')
                 days_overdue = (datetime.now() - exp_date).days
                 license['days_overdue'] = days_overdue
-        page_title = "Past Due Licenses (Expired)"
-    else:
-        filtered_licenses = all_licenses
-        page_title = "All Licenses"
     
     return render_template('licenses.html', 
                          licenses=filtered_licenses, 
@@ -347,7 +428,9 @@ def licenses():
                          page_title=page_title,
                          upcoming_days=upcoming_days,
                          critical_days=critical_days,
-                         warning_days=warning_days)
+                         warning_days=warning_days,
+                         next_page_url=page_url(next_cursor) if next_cursor else None,
+                         first_page_url=page_url(None) if cursor else None)
 
 @app.route('/reminders')
 def reminders():
@@ -355,6 +438,27 @@ def reminders():
     sent_reminders = get_sent_reminders()
     return render_template('reminders.html', reminders=sent_reminders)
 
+@app.route('/api/reminder/<int:reminder_id>/body')
+def api_reminder_body(reminder_id):
+    """API endpoint for the full content of a single sent reminder"""
+    try:
+        result = supabase.table('email_reminders')\
+            .select('id, email_subject, email_body')\
+            .eq('id', reminder_id)\
+            .execute()
+        if result.data:
+            reminder = result.data[0]
+            return jsonify({
+                'id': reminder['id'],
+                'subject': reminder.get('email_subject'),
+                'body': reminder.get('email_body')
+            })
+        else:
+            return jsonify({'error': 'Reminder not found'}), 404
+    except Exception as e:
+        logger.error(f"Error fetching reminder {reminder_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/upcoming')
 def api_upcoming():
     """API endpoint for upcoming expirations"""
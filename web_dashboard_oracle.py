@@ -4,7 +4,9 @@ Flask-based web interface for viewing and managing license data
 """
 
 import os
+import time
 import logging
+import threading
 from datetime import datetime, timedelta
 from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
 from dotenv import load_dotenv
@@ -14,6 +16,9 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import json
 
+from api.reminder_schedule import next_reminder_update_sql
+from api.unit_of_work import UnitOfWork as BaseUnitOfWork
+
 # Load environment variables
 load_dotenv()
 
@@ -51,21 +56,81 @@ COMPANY_INFO = {
 }
 
 
+# Connection pool configuration
+POOL_CONFIG = {
+    'min': int(os.getenv('ORACLE_POOL_MIN', 1)),
+    'max': int(os.getenv('ORACLE_POOL_MAX', 4)),
+    'increment': int(os.getenv('ORACLE_POOL_INCREMENT', 1)),
+    'ping_interval': int(os.getenv('ORACLE_POOL_PING_INTERVAL', 60)),
+    'wait_timeout': int(os.getenv('ORACLE_POOL_WAIT_TIMEOUT', 10000))
+}
+
+# Process-wide pool, created lazily on first checkout
+_oracle_pool = None
+_pool_lock = threading.Lock()
+_pool_wait_stats = {
+    'checkouts': 0,
+    'total_wait_ms': 0.0,
+    'max_wait_ms': 0.0
+}
+
+
+def get_oracle_pool():
+    """Create (once per process) and return the shared Oracle connection pool"""
+    global _oracle_pool
+    
+    if _oracle_pool is None:
+        with _pool_lock:
+            if _oracle_pool is None:
+                try:
+                    dsn = oracledb.makedsn(
+                        ORACLE_CONFIG['host'],
+                        ORACLE_CONFIG['port'],
+                        service_name=ORACLE_CONFIG['service']
+                    )
+                    
+                    # ping_interval makes acquire() ping connections that have been
+                    # idle longer than that many seconds, so dead sessions are
+                    # replaced transparently instead of failing the query
+                    _oracle_pool = oracledb.create_pool(
+                        user=ORACLE_CONFIG['user'],
+                        password=ORACLE_CONFIG['password'],
+                        dsn=dsn,
+                        mode=oracledb.AUTH_MODE_SYSDBA,
+                        min=POOL_CONFIG['min'],
+                        max=POOL_CONFIG['max'],
+                        increment=POOL_CONFIG['increment'],
+                        ping_interval=POOL_CONFIG['ping_interval'],
+                        getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                        wait_timeout=POOL_CONFIG['wait_timeout']
+                    )
+                    logger.info(
+                        f"Oracle pool created (min={POOL_CONFIG['min']}, "
+                        f"max={POOL_CONFIG['max']}, increment={POOL_CONFIG['increment']})"
+                    )
+                except oracledb.Error as e:
+                    logger.error(f"Oracle pool creation error: {e}")
+                    raise
+    
+    return _oracle_pool
+
+
 def get_oracle_connection():
-    """Create and return an Oracle database connection"""
+    """Check out a connection from the shared pool.
+    
+    Calling close() on the returned connection releases it back to the pool.
+    """
+    pool = get_oracle_pool()
+    
     try:
-        dsn = oracledb.makedsn(
-            ORACLE_CONFIG['host'],
-            ORACLE_CONFIG['port'],
-            service_name=ORACLE_CONFIG['service']
-        )
-        
-        connection = oracledb.connect(
-            user=ORACLE_CONFIG['user'],
-            password=ORACLE_CONFIG['password'],
-            dsn=dsn,
-            mode=oracledb.AUTH_MODE_SYSDBA
-        )
+        started = time.perf_counter()
+        connection = pool.acquire()
+        waited_ms = (time.perf_counter() - started) * 1000
+        
+        with _pool_lock:
+            _pool_wait_stats['checkouts'] += 1
+            _pool_wait_stats['total_wait_ms'] += waited_ms
+            _pool_wait_stats['max_wait_ms'] = max(_pool_wait_stats['max_wait_ms'], waited_ms)
         
         return connection
     except oracledb.Error as e:
@@ -73,54 +138,70 @@ def get_oracle_connection():
         raise
 
 
+def get_pool_stats():
+    """Return pool usage statistics, or None if the pool has not been created yet"""
+    if _oracle_pool is None:
+        return None
+    
+    with _pool_lock:
+        checkouts = _pool_wait_stats['checkouts']
+        total_wait_ms = _pool_wait_stats['total_wait_ms']
+        max_wait_ms = _pool_wait_stats['max_wait_ms']
+    
+    return {
+        'open': _oracle_pool.opened,
+        'busy': _oracle_pool.busy,
+        'min': _oracle_pool.min,
+        'max': _oracle_pool.max,
+        'checkouts': checkouts,
+        'avg_wait_ms': round(total_wait_ms / checkouts, 2) if checkouts else 0.0,
+        'max_wait_ms': round(max_wait_ms, 2)
+    }
+
+
+class UnitOfWork(BaseUnitOfWork):
+    """UnitOfWork on this app's connection pool"""
+    
+    def connect(self):
+        return get_oracle_connection()
+
+
 def query_oracle(query, params=None):
-    """Execute a query and return results as list of dictionaries"""
+    """Execute a single statement in its own unit of work.
+    
+    SELECTs return a list of dictionaries; INSERT, UPDATE and DELETE are
+    committed and return the affected row count.
+    """
     try:
-        connection = get_oracle_connection()
-        cursor = connection.cursor()
-        
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        
-        # Check if this is a SELECT query
-        if query.strip().upper().startswith('SELECT'):
-            columns = [col[0].lower() for col in cursor.description]
-            results = []
-            
-            for row in cursor:
-                result_dict = {}
-                for i, col in enumerate(columns):
-                    value = row[i]
-                    # Convert Oracle datetime to Python datetime string for JSON serialization
-                    if isinstance(value, datetime):
-                        value = value.isoformat()
-                    # Handle CLOB fields
-                    elif hasattr(value, 'read'):
-                        value = value.read() if value else None
-                    result_dict[col] = value
-                results.append(result_dict)
-            
-            cursor.close()
-            connection.close()
-            return results
-        else:
-            # For INSERT, UPDATE, DELETE
-            connection.commit()
-            affected_rows = cursor.rowcount
-            cursor.close()
-            connection.close()
-            return affected_rows
-        
+        with UnitOfWork() as uow:
+            # Check if this is a SELECT query
+            if query.strip().upper().startswith('SELECT'):
+                return uow.query(query, params)
+            return uow.execute(query, params)
     except Exception as e:
         logger.error(f"Query error: {e}")
-        if 'connection' in locals():
-            connection.rollback()
-            connection.close()
         raise
 
 
+def refresh_next_reminder(license_id, uow=None):
+    """Recompute NEXT_REMINDER_DATE / NEXT_REMINDER_TYPE for one license"""
+    schema = ORACLE_CONFIG['schema']
+    query = next_reminder_update_sql(schema, where='l.LIC_ID = :lic_id')
+    if uow is None:
+        return query_oracle(query, {'lic_id': license_id})
+    return uow.execute(query, {'lic_id': license_id})
+
+
+@app.route('/health')
+def health_check():
+    """Health check endpoint with connection pool statistics"""
+    return jsonify({
+        'status': 'healthy',
+        'oracle_configured': bool(ORACLE_CONFIG.get('host')),
+        'oracle_pool': get_pool_stats()
+    })
+
+
 @app.route('/')
 def dashboard():
     """Main dashboard page"""
@@ -201,7 +282,7 @@ def dashboard():
         # Reminders sent today
         result = query_oracle(f"""
             SELECT COUNT(*) as count FROM "{schema}".EMAIL_REMINDERS
-            WHERE TRUNC(SENT_DATE) = TRUNC(SYSDATE)
+            WHERE SENT_DATE >= TRUNC(SYSDATE) AND SENT_DATE < TRUNC(SYSDATE) + 1
         """)
         if result:
             stats['reminders_sent_today'] = result[0]['count']
@@ -542,25 +623,28 @@ def edit_license(license_id):
             expiration_date = request.form.get('expiration_date')
             lic_notify_names = request.form.get('lic_notify_names')
             
-            # Update query
-            affected = query_oracle(f"""
-                UPDATE "{schema}".LICENSES
-                SET LIC_NAME = :lic_name,
-                    LIC_STATE = :lic_state,
-                    LIC_TYPE = :lic_type,
-                    LIC_NO = :lic_no,
-                    EXPIRATION_DATE = TO_DATE(:expiration_date, 'YYYY-MM-DD'),
-                    LIC_NOTIFY_NAMES = :lic_notify_names
-                WHERE LIC_ID = :id
-            """, {
-                'lic_name': lic_name,
-                'lic_state': lic_state,
-                'lic_type': lic_type,
-                'lic_no': lic_no,
-                'expiration_date': expiration_date if expiration_date else None,
-                'lic_notify_names': lic_notify_names,
-                'id': license_id
-            })
+            # Update the license and reschedule its next reminder in one transaction
+            with UnitOfWork() as uow:
+                affected = uow.execute(f"""
+                    UPDATE "{schema}".LICENSES
+                    SET LIC_NAME = :lic_name,
+                        LIC_STATE = :lic_state,
+                        LIC_TYPE = :lic_type,
+                        LIC_NO = :lic_no,
+                        EXPIRATION_DATE = TO_DATE(:expiration_date, 'YYYY-MM-DD'),
+                        LIC_NOTIFY_NAMES = :lic_notify_names,
+                        ROW_HASH = NULL
+                    WHERE LIC_ID = :id
+                """, {
+                    'lic_name': lic_name,
+                    'lic_state': lic_state,
+                    'lic_type': lic_type,
+                    'lic_no': lic_no,
+                    'expiration_date': expiration_date if expiration_date else None,
+                    'lic_notify_names': lic_notify_names,
+                    'id': license_id
+                })
+                refresh_next_reminder(license_id, uow)
             
             flash('License updated successfully', 'success')
             return redirect(url_for('view_license', license_id=license_id))
@@ -577,17 +661,22 @@ def delete_license(license_id):
     try:
         schema = ORACLE_CONFIG['schema']
         
-        # First delete related email reminders
-        query_oracle(f"""
-            DELETE FROM "{schema}".EMAIL_REMINDERS
-            WHERE LICENSE_ID = :id
-        """, {'id': license_id})
-        
-        # Then delete the license
-        affected = query_oracle(f"""
-            DELETE FROM "{schema}".LICENSES
-            WHERE LIC_ID = :id
-        """, {'id': license_id})
+        with UnitOfWork() as uow:
+            # First delete related email reminders and queued emails
+            uow.execute(f"""
+                DELETE FROM "{schema}".EMAIL_REMINDERS
+                WHERE LICENSE_ID = :id
+            """, {'id': license_id})
+            uow.execute(f"""
+                DELETE FROM "{schema}".EMAIL_OUTBOX
+                WHERE LICENSE_ID = :id
+            """, {'id': license_id})
+            
+            # Then delete the license
+            affected = uow.execute(f"""
+                DELETE FROM "{schema}".LICENSES
+                WHERE LIC_ID = :id
+            """, {'id': license_id})
         
         if affected > 0:
             flash('License deleted successfully', 'success')
@@ -608,7 +697,8 @@ def reminders():
     try:
         schema = ORACLE_CONFIG['schema']
         
-        # Get reminder history with all necessary fields for the template
+        # Get reminder history for the template; bodies (CLOBs) are fetched
+        # on demand through /api/reminder/<id>/body when a row is expanded
         reminders = query_oracle(f"""
             SELECT 
                 er.ID as id,
@@ -620,7 +710,6 @@ def reminders():
                 er.SENT_DATE as sent_date,
                 er.EMAIL_TO as email_to,
                 er.EMAIL_SUBJECT as subject,
-                er.EMAIL_BODY as body,
                 er.STATUS as status,
                 NVL(l.EMAIL_ENABLED, 1) as email_enabled
             FROM "{schema}".EMAIL_REMINDERS er
@@ -647,6 +736,31 @@ def reminders():
                              company_info=COMPANY_INFO)
 
 
+@app.route('/api/reminder/<int:reminder_id>/body')
+def api_reminder_body(reminder_id):
+    """API endpoint for the full content of a single sent reminder"""
+    try:
+        schema = ORACLE_CONFIG['schema']
+        
+        result = query_oracle(f"""
+            SELECT 
+                ID as id,
+                EMAIL_SUBJECT as subject,
+                EMAIL_BODY as body
+            FROM "{schema}".EMAIL_REMINDERS
+            WHERE ID = :id
+        """, {'id': reminder_id})
+        
+        if result:
+            return jsonify(result[0])
+        else:
+            return jsonify({'error': 'Reminder not found'}), 404
+            
+    except Exception as e:
+        logger.error(f"API reminder body error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/stats')
 def api_stats():
     """API endpoint for dashboard statistics"""
@@ -678,7 +792,7 @@ def api_stats():
         # Reminders sent today
         result = query_oracle(f"""
             SELECT COUNT(*) as count FROM "{schema}".EMAIL_REMINDERS
-            WHERE TRUNC(SENT_DATE) = TRUNC(SYSDATE)
+            WHERE SENT_DATE >= TRUNC(SYSDATE) AND SENT_DATE < TRUNC(SYSDATE) + 1
         """)
         stats['reminders_sent_today'] = result[0]['count'] if result else 0
         
@@ -735,52 +849,49 @@ def api_create_license():
         schema = ORACLE_CONFIG['schema']
         data = request.get_json()
         
-        # Get the next license ID
-        result = query_oracle(f"""
-            SELECT NVL(MAX(LIC_ID), 0) + 1 as next_id 
-            FROM "{schema}".LICENSES
-        """)
-        next_id = result[0]['next_id'] if result else 1
-        
-        # Insert new license
-        query_oracle(f"""
-            INSERT INTO "{schema}".LICENSES (
-                LIC_ID,
-                LIC_NAME,
-                LIC_STATE,
-                LIC_TYPE,
-                LIC_NO,
-                ASCEM_NO,
-                FIRST_ISSUE_DATE,
-                EXPIRATION_DATE,
-                LIC_NOTIFY_NAMES,
-                LIC_COMMENTS,
-                EMAIL_ENABLED
-            ) VALUES (
-                :lic_id,
-                :lic_name,
-                :lic_state,
-                :lic_type,
-                :lic_no,
-                :ascem_no,
-                CASE WHEN :first_issue_date IS NOT NULL THEN TO_DATE(:first_issue_date, 'YYYY-MM-DD') ELSE NULL END,
-                CASE WHEN :expiration_date IS NOT NULL THEN TO_DATE(:expiration_date, 'YYYY-MM-DD') ELSE NULL END,
-                :lic_notify_names,
-                :lic_comments,
-                1
-            )
-        """, {
-            'lic_id': next_id,
-            'lic_name': data.get('lic_name'),
-            'lic_state': data.get('lic_state'),
-            'lic_type': data.get('lic_type'),
-            'lic_no': data.get('lic_no'),
-            'ascem_no': data.get('ascem_no'),
-            'first_issue_date': data.get('first_issue_date'),
-            'expiration_date': data.get('expiration_date'),
-            'lic_notify_names': data.get('lic_notify_names'),
-            'lic_comments': data.get('lic_comments')
-        })
+        # Insert the license and schedule its first reminder in one transaction.
+        # LIC_ID is allocated by LICENSES_ID_SEQ (the column default).
+        with UnitOfWork() as uow:
+            new_id = uow.cursor.var(int)
+            uow.execute(f"""
+                INSERT INTO "{schema}".LICENSES (
+                    LIC_NAME,
+                    LIC_STATE,
+                    LIC_TYPE,
+                    LIC_NO,
+                    ASCEM_NO,
+                    FIRST_ISSUE_DATE,
+                    EXPIRATION_DATE,
+                    LIC_NOTIFY_NAMES,
+                    LIC_COMMENTS,
+                    EMAIL_ENABLED
+                ) VALUES (
+                    :lic_name,
+                    :lic_state,
+                    :lic_type,
+                    :lic_no,
+                    :ascem_no,
+                    CASE WHEN :first_issue_date IS NOT NULL THEN TO_DATE(:first_issue_date, 'YYYY-MM-DD') ELSE NULL END,
+                    CASE WHEN :expiration_date IS NOT NULL THEN TO_DATE(:expiration_date, 'YYYY-MM-DD') ELSE NULL END,
+                    :lic_notify_names,
+                    :lic_comments,
+                    1
+                ) RETURNING LIC_ID INTO :new_id
+            """, {
+                'lic_name': data.get('lic_name'),
+                'lic_state': data.get('lic_state'),
+                'lic_type': data.get('lic_type'),
+                'lic_no': data.get('lic_no'),
+                'ascem_no': data.get('ascem_no'),
+                'first_issue_date': data.get('first_issue_date'),
+                'expiration_date': data.get('expiration_date'),
+                'lic_notify_names': data.get('lic_notify_names'),
+                'lic_comments': data.get('lic_comments'),
+                'new_id': new_id
+            })
+            # DML RETURNING yields one value per inserted row
+            next_id = new_id.getvalue()[0]
+            refresh_next_reminder(next_id, uow)
         
         return jsonify({'success': True, 'id': next_id})
         
@@ -826,30 +937,34 @@ def api_license(license_id):
         try:
             data = request.get_json()
             
-            affected = query_oracle(f"""
-                UPDATE "{schema}".LICENSES
-                SET LIC_NAME = :lic_name,
-                    LIC_STATE = :lic_state,
-                    LIC_TYPE = :lic_type,
-                    LIC_NO = :lic_no,
-                    ASCEM_NO = :ascem_no,
-                    FIRST_ISSUE_DATE = CASE WHEN :first_issue_date IS NOT NULL THEN TO_DATE(:first_issue_date, 'YYYY-MM-DD') ELSE NULL END,
-                    EXPIRATION_DATE = CASE WHEN :expiration_date IS NOT NULL THEN TO_DATE(:expiration_date, 'YYYY-MM-DD') ELSE NULL END,
-                    LIC_NOTIFY_NAMES = :lic_notify_names,
-                    LIC_COMMENTS = :lic_comments
-                WHERE LIC_ID = :id
-            """, {
-                'lic_name': data.get('lic_name'),
-                'lic_state': data.get('lic_state'),
-                'lic_type': data.get('lic_type'),
-                'lic_no': data.get('lic_no'),
-                'ascem_no': data.get('ascem_no'),
-                'first_issue_date': data.get('first_issue_date'),
-                'expiration_date': data.get('expiration_date'),
-                'lic_notify_names': data.get('lic_notify_names'),
-                'lic_comments': data.get('lic_comments'),
-                'id': license_id
-            })
+            # Update the license and reschedule its next reminder in one transaction
+            with UnitOfWork() as uow:
+                affected = uow.execute(f"""
+                    UPDATE "{schema}".LICENSES
+                    SET LIC_NAME = :lic_name,
+                        LIC_STATE = :lic_state,
+                        LIC_TYPE = :lic_type,
+                        LIC_NO = :lic_no,
+                        ASCEM_NO = :ascem_no,
+                        FIRST_ISSUE_DATE = CASE WHEN :first_issue_date IS NOT NULL THEN TO_DATE(:first_issue_date, 'YYYY-MM-DD') ELSE NULL END,
+                        EXPIRATION_DATE = CASE WHEN :expiration_date IS NOT NULL THEN TO_DATE(:expiration_date, 'YYYY-MM-DD') ELSE NULL END,
+                        LIC_NOTIFY_NAMES = :lic_notify_names,
+                        LIC_COMMENTS = :lic_comments,
+                        ROW_HASH = NULL
+                    WHERE LIC_ID = :id
+                """, {
+                    'lic_name': data.get('lic_name'),
+                    'lic_state': data.get('lic_state'),
+                    'lic_type': data.get('lic_type'),
+                    'lic_no': data.get('lic_no'),
+                    'ascem_no': data.get('ascem_no'),
+                    'first_issue_date': data.get('first_issue_date'),
+                    'expiration_date': data.get('expiration_date'),
+                    'lic_notify_names': data.get('lic_notify_names'),
+                    'lic_comments': data.get('lic_comments'),
+                    'id': license_id
+                })
+                refresh_next_reminder(license_id, uow)
             
             return jsonify({'success': True, 'affected': affected})
             
@@ -859,17 +974,22 @@ def api_license(license_id):
     
     elif request.method == 'DELETE':
         try:
-            # Delete related reminders first
-            query_oracle(f"""
-                DELETE FROM "{schema}".EMAIL_REMINDERS
-                WHERE LICENSE_ID = :id
-            """, {'id': license_id})
-            
-            # Delete the license
-            affected = query_oracle(f"""
-                DELETE FROM "{schema}".LICENSES
-                WHERE LIC_ID = :id
-            """, {'id': license_id})
+            with UnitOfWork() as uow:
+                # Delete related reminders and queued emails first
+                uow.execute(f"""
+                    DELETE FROM "{schema}".EMAIL_REMINDERS
+                    WHERE LICENSE_ID = :id
+                """, {'id': license_id})
+                uow.execute(f"""
+                    DELETE FROM "{schema}".EMAIL_OUTBOX
+                    WHERE LICENSE_ID = :id
+                """, {'id': license_id})
+                
+                # Delete the license
+                affected = uow.execute(f"""
+                    DELETE FROM "{schema}".LICENSES
+                    WHERE LIC_ID = :id
+                """, {'id': license_id})
             
             return jsonify({'success': True, 'affected': affected})
             
@@ -1069,32 +1189,35 @@ Best regards,
             
             # Always log to EMAIL_REMINDERS table regardless of success/failure
             try:
-                query_oracle(f"""
-                    INSERT INTO "{schema}".EMAIL_REMINDERS (
-                        LICENSE_ID,
-                        REMINDER_TYPE,
-                        EMAIL_TO,
-                        EMAIL_SUBJECT,
-                        EMAIL_BODY,
-                        STATUS,
-                        SENT_DATE
-                    ) VALUES (
-                        :license_id,
-                        :reminder_type,
-                        :email_to,
-                        :email_subject,
-                        :email_body,
-                        :status,
-                        SYSDATE
-                    )
-                """, {
-                    'license_id': license['id'],
-                    'reminder_type': reminder_type,
-                    'email_to': email_to,
-                    'email_subject': email_subject,
-                    'email_body': email_body,
-                    'status': email_status
-                })
+                # Log the attempt and reschedule the next reminder in one transaction
+                with UnitOfWork() as uow:
+                    uow.execute(f"""
+                        INSERT INTO "{schema}".EMAIL_REMINDERS (
+                            LICENSE_ID,
+                            REMINDER_TYPE,
+                            EMAIL_TO,
+                            EMAIL_SUBJECT,
+                            EMAIL_BODY,
+                            STATUS,
+                            SENT_DATE
+                        ) VALUES (
+                            :license_id,
+                            :reminder_type,
+                            :email_to,
+                            :email_subject,
+                            :email_body,
+                            :status,
+                            SYSDATE
+                        )
+                    """, {
+                        'license_id': license['id'],
+                        'reminder_type': reminder_type,
+                        'email_to': email_to,
+                        'email_subject': email_subject,
+                        'email_body': email_body,
+                        'status': email_status
+                    })
+                    refresh_next_reminder(license['id'], uow)
                 logger.info(f"Email history logged for license {license['id']} with status: {email_status}")
             except Exception as e:
                 logger.error(f"Failed to log email history for license {license['id']}: {e}")
@@ -1134,7 +1257,7 @@ def main():
     logger.info(f"Oracle Schema: {ORACLE_CONFIG['schema']}")
     
     try:
-        # Test Oracle connection
+        # Test Oracle connection (also warms up the pool)
         conn = get_oracle_connection()
         conn.close()
         logger.info("✓ Oracle connection successful")